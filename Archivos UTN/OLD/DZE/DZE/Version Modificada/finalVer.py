@@ -1,10 +1,14 @@
 import struct
 import time
 import threading
+from collections import deque
 import serial
 import numpy as np
 
 
+# Lecturas que se conservan (las más viejas se descartan)
+MAX_LECTURAS = 2000
+
 
 class DZETester:
     """
@@ -29,7 +33,7 @@ class DZETester:
         self.RPM = 0.0
         self.RMS = 0.0
         self.msg_gui = ""
-        self.lecturas = []  # almacena lecturas recibidas [(tipo, valor, timestamp), ...]
+        self.lecturas = deque(maxlen=MAX_LECTURAS)  # últimas lecturas recibidas [(tipo, valor, timestamp), ...]
 
         # Hilos
         self.thread_recv = threading.Thread(target=self._recibir_datos, daemon=True)
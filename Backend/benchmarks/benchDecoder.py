@@ -0,0 +1,93 @@
+"""
+Benchmark del decodificador de tramas de muestras (a93f0050).
+
+Compara el decodificador anterior (hex + np.append en bucle) con SampleDecoder
+(np.frombuffer + vistas con paso) sobre tramas de tamaño real.
+
+Uso (desde Backend/):
+    python -m benchmarks.benchDecoder
+    python -m benchmarks.benchDecoder --repeticiones 200
+"""
+import argparse
+import struct
+import time
+
+import numpy as np
+
+from engine.ProbadorHandler.frameParser import HEADER_MUESTRAS, longitud_trama
+from engine.ProbadorHandler.sampleDecoder import SampleDecoder
+
+
+def trama_sintetica(seed=0):
+    """Genera una trama a93f0050 con muestras senoidales + ruido."""
+    rng = np.random.default_rng(seed)
+    n_bytes = longitud_trama(HEADER_MUESTRAS) - 8
+    n = n_bytes // 2
+    t = np.arange(n // 2)
+    ia = 700 * np.sin(2 * np.pi * t / 40) + rng.normal(0, 20, len(t))
+    ib = 700 * np.sin(2 * np.pi * t / 40 - 2 * np.pi / 3) + rng.normal(0, 20, len(t))
+    muestras = np.empty(n, dtype='<i2')
+    muestras[0:2 * len(t):2] = ia
+    muestras[1:2 * len(t):2] = ib
+    if n % 2:
+        muestras[-1] = 0
+    return HEADER_MUESTRAS + b"\x00\x00\x00\x00" + muestras.tobytes()
+
+
+def hex_to_int16_array_anterior(hex_str):
+    """Implementación anterior de DZETester.hex_to_int16_array (referencia)."""
+    hex_str_data = hex_str[16::]
+    if len(hex_str_data) % 4 == 0:
+        chunks = [hex_str_data[i:i+4] for i in range(0, len(hex_str_data), 4)]
+        int16_array = np.array([], dtype=np.int16)
+        for chunk in chunks:
+            byte_data = bytes.fromhex(chunk)
+            value = struct.unpack('<h', byte_data)[0]
+            int16_array = np.append(int16_array, value)
+
+        ia_array = np.array([], dtype=np.int16)
+        ib_array = np.array([], dtype=np.int16)
+        for i in range(len(int16_array)//2):
+            ia_array = np.append(ia_array, int16_array[i*2])
+            ib_array = np.append(ib_array, int16_array[i*2+1])
+        ic_array = - (ia_array + ib_array)
+        return [ia_array, ib_array, ic_array]
+    return [0, 0, 0]
+
+
+def medir(funcion, repeticiones):
+    """Devuelve el tiempo medio por llamada en microsegundos (mejor de 3 rondas)."""
+    mejor = float("inf")
+    for _ in range(3):
+        t0 = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        mejor = min(mejor, (time.perf_counter() - t0) / repeticiones)
+    return mejor * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticiones", type=int, default=50, help="Tramas decodificadas por ronda")
+    args = parser.parse_args()
+
+    trama = trama_sintetica()
+    decoder = SampleDecoder()
+
+    # Verificar que ambos decodificadores coinciden
+    anterior = hex_to_int16_array_anterior(trama.hex())
+    nuevo = decoder.decodificar(trama)
+    for a, b in zip(anterior, nuevo):
+        assert np.array_equal(a, b), "Los decodificadores no coinciden"
+
+    t_anterior = medir(lambda: hex_to_int16_array_anterior(trama.hex()), args.repeticiones)
+    t_nuevo = medir(lambda: decoder.decodificar(trama), args.repeticiones * 100)
+
+    print(f"Trama de {len(trama)} bytes ({len(nuevo[0])} muestras por fase)")
+    print(f"Anterior (hex + np.append): {t_anterior:10.1f} us/trama")
+    print(f"SampleDecoder (frombuffer): {t_nuevo:10.1f} us/trama")
+    print(f"Mejora: x{t_anterior / t_nuevo:.0f}")
+
+
+if __name__ == "__main__":
+    main()
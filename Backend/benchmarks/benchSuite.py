@@ -0,0 +1,398 @@
+"""
+Suite de benchmarks del camino de adquisición, con salida JSON y comparación contra una base.
+
+Mide:
+- parser:      reensamblado de tramas (FrameParser.feed) sobre un flujo con cortes arbitrarios
+- decodificar: SampleDecoder.decodificar (equivalente a hex_to_int16_array) por trama
+- rms_avg:     RMS y valor medio de las tres fases de una trama
+- publicacion: SampleRing.agregar + MedicionCorrientes + CanalMediciones.publicar
+- pipeline:    DZETester._alimentar (parser + decodificación + publicación) por trama
+- emulador:    latencia RX extremo a extremo y RTT de ACK contra el emulador de placa (pty)
+- http:        ida y vuelta de POST /testregulator y su sobrecosto respecto del ensayo
+- virtual:     ensayo ProbarReguladorParalelo completo con reloj virtual
+- arranque:    import de main.py en un intérprete nuevo (sin testers ni placas)
+
+Cada métrica indica si es mejor menor o mayor y su umbral de regresión (fracción
+tolerada respecto de la base). Las bases dependen de la máquina: se guardan en la
+PC del banco y se comparan en la misma.
+
+Uso (desde Backend/):
+    python -m benchmarks.benchSuite
+    python -m benchmarks.benchSuite --solo parser,decodificar --json resultados.json
+    python -m benchmarks.benchSuite --guardar-base benchmarks/base-banco1.json
+    python -m benchmarks.benchSuite --base benchmarks/base-banco1.json      # sale con 1 si hay regresiones
+"""
+import io
+import os
+import sys
+import json
+import time
+import struct
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+import contextlib
+
+import numpy as np
+
+from benchmarks.benchDecoder import trama_sintetica, medir
+from engine.ProbadorHandler.frameParser import FrameParser, HEADER_ACK, HEADER_ESTADO, HEADER_MUESTRAS, longitud_trama
+from engine.ProbadorHandler.sampleDecoder import SampleDecoder
+from engine.ProbadorHandler.sampleRing import SampleRing
+from engine.ProbadorHandler.measurementSnapshot import CanalMediciones, MedicionCorrientes
+
+MENOR = "menor"     # mejor cuanto menor (tiempos, latencias)
+MAYOR = "mayor"     # mejor cuanto mayor (throughput)
+
+BENCHMARKS = {}
+
+
+def benchmark(nombre):
+    """Registra `funcion(args) -> [métricas]` en la suite."""
+    def registrar(funcion):
+        BENCHMARKS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def metrica(nombre, valor, unidad, mejor=MENOR, umbral=0.25):
+    return {"nombre": nombre, "valor": round(float(valor), 4), "unidad": unidad, "mejor": mejor, "umbral": umbral}
+
+
+def percentiles(valores_s):
+    """(p50, p95, max) en milisegundos de una lista de segundos."""
+    if not valores_s:
+        return float("nan"), float("nan"), float("nan")
+    arr = np.asarray(valores_s) * 1000.0
+    return float(np.percentile(arr, 50)), float(np.percentile(arr, 95)), float(arr.max())
+
+
+def flujo_sintetico(n_tramas, seed=0):
+    """Bytes como llegan del puerto: muestras con status y ACK intercalados, en trozos de 1 a 4096 bytes."""
+    rng = np.random.default_rng(seed)
+    estado = HEADER_ESTADO + bytes(longitud_trama(HEADER_ESTADO) - 4)
+    ack = HEADER_ACK + b"\x00"
+    tramas = []
+    for i in range(n_tramas):
+        tramas.append(trama_sintetica(seed=i % 8))
+        if i % 8 == 0:
+            tramas.append(estado)
+        if i % 5 == 0:
+            tramas.append(ack)
+    flujo = b"".join(tramas)
+    trozos = []
+    pos = 0
+    while pos < len(flujo):
+        largo = int(rng.integers(1, 4097))
+        trozos.append(flujo[pos:pos + largo])
+        pos += largo
+    return trozos, len(tramas)
+
+
+# ----------------------------
+# Micro-benchmarks (CPU)
+# ----------------------------
+@benchmark("parser")
+def bench_parser(args):
+    trozos, n_tramas = flujo_sintetico(200 if args.rapido else 2000)
+    total = sum(len(t) for t in trozos)
+
+    def alimentar():
+        parser = FrameParser()
+        for trozo in trozos:
+            parser.feed(trozo)
+    t_us = medir(alimentar, 1 if args.rapido else 3)
+    return [
+        metrica("parser_MBps", total / t_us, "MB/s", MAYOR),
+        metrica("parser_us_por_trama", t_us / n_tramas, "us"),
+    ]
+
+
+@benchmark("decodificar")
+def bench_decodificar(args):
+    trama = trama_sintetica()
+    decoder = SampleDecoder()
+    return [metrica("decodificar_us", medir(lambda: decoder.decodificar(trama), 500 if args.rapido else 5000), "us")]
+
+
+@benchmark("rms_avg")
+def bench_rms_avg(args):
+    decoder = SampleDecoder()
+    ia, ib, ic = decoder.decodificar(trama_sintetica())
+
+    def calcular():
+        for fase in (ia, ib, ic):
+            decoder.rms(fase)
+            decoder.avg(fase)
+    return [metrica("rms_avg_us", medir(calcular, 500 if args.rapido else 5000), "us")]
+
+
+@benchmark("publicacion")
+def bench_publicacion(args):
+    decoder = SampleDecoder()
+    ia, ib, ic = decoder.decodificar(trama_sintetica())
+    anillo = SampleRing()
+    canal = CanalMediciones()
+
+    def publicar():
+        seq = anillo.agregar(ia, ib, ic, 0.0)
+        canal.publicar(MedicionCorrientes(seq, 0.0, 1.0, 1.0, 1.0, 0.0, 0.0, 0.0))
+    return [metrica("publicacion_us", medir(publicar, 500 if args.rapido else 5000), "us")]
+
+
+@benchmark("pipeline")
+def bench_pipeline(args):
+    from engine.ProbadorHandler.mainOLD import DZETester
+    trozos, _ = flujo_sintetico(200 if args.rapido else 1000)
+    tester = DZETester()
+    muestras_antes = tester.muestras.seq
+
+    def alimentar():
+        for trozo in trozos:
+            tester._alimentar(trozo, 0.0)
+    alimentar()     # calentamiento y conteo de tramas de muestras del flujo
+    n = tester.muestras.seq - muestras_antes
+    t_us = medir(alimentar, 1)
+    return [metrica("alimentar_us_por_trama", t_us / max(n, 1), "us")]
+
+
+# ----------------------------
+# Contra el emulador de placa (pty, tiempo real)
+# ----------------------------
+@benchmark("emulador")
+def bench_emulador(args):
+    if not sys.platform.startswith("linux"):
+        return []
+    from engine.serialUtils.boardEmulator import BoardEmulator
+    from engine.ProbadorHandler.mainOLD import DZETester
+    from engine.ProbadorHandler.ackTracker import esperar_ack
+
+    emulador = BoardEmulator(tramas_por_segundo=100.0, seed=0)
+    escritas = {}
+    escribir_original = emulador._escribir
+
+    def escribir(datos):
+        if datos[:4] == HEADER_MUESTRAS:
+            escritas[struct.unpack_from("<I", datos, 4)[0]] = time.monotonic()
+        escribir_original(datos)
+    emulador._escribir = escribir
+
+    puerto = emulador.start()
+    tester = DZETester()
+    publicadas = []
+    publicar_original = tester.corrientes.publicar
+
+    def publicar(medicion):
+        publicadas.append((medicion.seq, medicion.t_rx, time.monotonic()))
+        publicar_original(medicion)
+    tester.corrientes.publicar = publicar
+
+    n = 100 if args.rapido else 400
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            tester.start(puerto)
+            esperar_ack(tester.SetearCorrientePruebaRegParalelo(1000, ack=True), 1)
+            esperar_ack(tester.send("290000E01900", "Comando Start", ack=True), 1)
+            tester.wait_for_frames(n, timeout=n / emulador.tramas_por_segundo * 3)
+            for _ in range(20):
+                esperar_ack(tester.send("290000E03900", "ACK Error previo", ack=True), 1)
+            esperar_ack(tester.send("290000E02100", "Comando Stop", ack=True), 1)
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            tester.stop()
+        emulador.stop()
+
+    puerto_s = [t_rx - escritas[seq] for seq, t_rx, _ in publicadas if seq in escritas]
+    extremo_s = [t_pub - escritas[seq] for seq, _, t_pub in publicadas if seq in escritas]
+    p50_rx, p95_rx, _ = percentiles(puerto_s)
+    p50_e2e, p95_e2e, max_e2e = percentiles(extremo_s)
+    p50_ack, p95_ack, _ = percentiles(list(tester.acks.rtt))
+    # Latencias con jitter del planificador del SO: umbral más amplio
+    return [
+        metrica("rx_puerto_p50_ms", p50_rx, "ms", umbral=1.0),
+        metrica("rx_puerto_p95_ms", p95_rx, "ms", umbral=1.0),
+        metrica("rx_publicacion_p50_ms", p50_e2e, "ms", umbral=1.0),
+        metrica("rx_publicacion_p95_ms", p95_e2e, "ms", umbral=1.0),
+        metrica("rx_publicacion_max_ms", max_e2e, "ms", umbral=2.0),
+        metrica("ack_rtt_p50_ms", p50_ack, "ms", umbral=1.0),
+        metrica("ack_rtt_p95_ms", p95_ack, "ms", umbral=1.0),
+        metrica("tramas_perdidas", len(escritas) - len(publicadas), "tramas", umbral=0.0),
+    ]
+
+
+# ----------------------------
+# HTTP y ensayo virtual
+# ----------------------------
+def _ensayo_virtual():
+    from engine.ProbadorHandler.virtualRunner import ensayo_emulado
+    return ensayo_emulado("old", seed=0)
+
+
+@benchmark("virtual")
+def bench_virtual(args):
+    repeticiones = 3 if args.rapido else 10
+    tiempos = [_ensayo_virtual()["segundos_reales"] for _ in range(repeticiones)]
+    return [metrica("ensayo_virtual_ms", min(tiempos) * 1000.0, "ms")]
+
+
+class _TesterResultadoFijo:
+    """Tester conectado que devuelve un resultado ya calculado: aísla el costo de la capa HTTP."""
+
+    def __init__(self, resultados):
+        from engine.ProbadorHandler.virtualRunner import PuertoVirtual
+        self.ser = PuertoVirtual(lambda datos: None)
+        self.resultados = resultados
+        self.msg_gui = ""
+
+    def ProbarReguladorParalelo(self):
+        return self.resultados
+
+
+@benchmark("http")
+def bench_http(args):
+    import logging
+    import http.client
+    from flask import Flask
+    from werkzeug.serving import make_server
+    from engine.ProbadorHandler.fixtureRegistry import FixtureRegistry
+    from engine.ProbadorHandler.logRing import AnilloLog
+    from engine.routes.routes import register_routes
+
+    resultados = json.loads(json.dumps(_ensayo_virtual()["resultados"], default=float))
+    tester = _TesterResultadoFijo(resultados)
+    fixtures = FixtureRegistry(lambda fixture_id: tester, seriales=["BENCH"])
+    app = Flask(__name__)
+    register_routes(app, tempfile.gettempdir(), fixtures, AnilloLog(), lambda: None)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)     # sin una línea de log por pedido
+    servidor = make_server("127.0.0.1", 0, app, threaded=True)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+
+    def post():
+        conexion = http.client.HTTPConnection("127.0.0.1", servidor.server_port, timeout=10)
+        conexion.request("POST", "/testregulator")
+        respuesta = conexion.getresponse()
+        respuesta.read()
+        conexion.close()
+        return respuesta.status
+
+    n = 50 if args.rapido else 300
+    tiempos = []
+    try:
+        post()      # calentamiento
+        for _ in range(n):
+            t0 = time.perf_counter()
+            post()
+            tiempos.append(time.perf_counter() - t0)
+    finally:
+        servidor.shutdown()
+        hilo.join(timeout=2)
+
+    p50, p95, _ = percentiles(tiempos)
+    return [
+        metrica("http_testregulator_p50_ms", p50, "ms", umbral=0.5),
+        metrica("http_testregulator_p95_ms", p95, "ms", umbral=1.0),
+    ]
+
+
+@benchmark("arranque")
+def bench_arranque(args):
+    """Intérprete nuevo que importa main.py, menos uno vacío: el costo de arranque propio del servidor."""
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    entorno = dict(os.environ, DZE_REGISTRO=os.path.join(tempfile.gettempdir(), "dze-bench.log"))
+
+    def correr(codigo):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", codigo], cwd=backend, env=entorno, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return time.perf_counter() - t0
+
+    repeticiones = 3 if args.rapido else 7
+    vacio = min(correr("pass") for _ in range(repeticiones))
+    importar = min(correr("import main") for _ in range(repeticiones))
+    return [metrica("arranque_import_main_ms", (importar - vacio) * 1000.0, "ms", umbral=0.5)]
+
+
+# ----------------------------
+# Comparación contra la base
+# ----------------------------
+def comparar(base, actual):
+    """Devuelve [(benchmark, métrica, base, actual, cambio, regresion)] para las métricas presentes en ambos."""
+    filas = []
+    for nombre, metricas in actual["resultados"].items():
+        for m in metricas:
+            previa = base.get("resultados", {}).get(nombre)
+            if previa is None:
+                continue
+            anterior = next((p for p in previa if p["nombre"] == m["nombre"]), None)
+            if anterior is None:
+                continue
+            a, b = anterior["valor"], m["valor"]
+            cambio = (b - a) / a if a else (0.0 if b == a else float("inf"))
+            if m["mejor"] == MENOR:
+                regresion = b > a * (1 + m["umbral"]) if a else b > a
+            else:
+                regresion = b < a * (1 - m["umbral"])
+            filas.append((nombre, m["nombre"], a, b, cambio, regresion))
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del camino de adquisición")
+    parser.add_argument("--solo", help=f"Benchmarks a correr, separados por coma ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--rapido", action="store_true", help="Menos repeticiones (prueba de humo)")
+    parser.add_argument("--json", help="Escribir los resultados en JSON ('-' para stdout)")
+    parser.add_argument("--guardar-base", help="Guardar los resultados como base de comparación")
+    parser.add_argument("--base", help="Comparar contra una base; sale con 1 si alguna métrica empeora más que su umbral")
+    parser.add_argument("--umbral", type=float, help="Umbral de regresión para todas las métricas (fracción, p. ej. 0.2)")
+    args = parser.parse_args()
+
+    nombres = args.solo.split(",") if args.solo else list(BENCHMARKS)
+    desconocidos = [n for n in nombres if n not in BENCHMARKS]
+    if desconocidos:
+        parser.error(f"Benchmarks desconocidos: {', '.join(desconocidos)}")
+
+    salida = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "maquina": {"plataforma": platform.platform(), "procesador": platform.processor() or platform.machine(),
+                    "python": platform.python_version(), "numpy": np.__version__},
+        "resultados": {},
+    }
+    for nombre in nombres:
+        t0 = time.perf_counter()
+        metricas = BENCHMARKS[nombre](args)
+        if args.umbral is not None:
+            for m in metricas:
+                m["umbral"] = args.umbral
+        salida["resultados"][nombre] = metricas
+        print(f"{nombre} ({time.perf_counter() - t0:.1f} s)", file=sys.stderr)
+        for m in metricas:
+            print(f"    {m['nombre']:<28} {m['valor']:>12.3f} {m['unidad']}", file=sys.stderr)
+
+    if args.json:
+        texto = json.dumps(salida, indent=2)
+        if args.json == "-":
+            print(texto)
+        else:
+            with open(args.json, "w") as f:
+                f.write(texto)
+    if args.guardar_base:
+        with open(args.guardar_base, "w") as f:
+            json.dump(salida, f, indent=2)
+
+    if args.base:
+        with open(args.base) as f:
+            base = json.load(f)
+        filas = comparar(base, salida)
+        regresiones = [f for f in filas if f[5]]
+        print(f"\nComparación contra {args.base} ({base.get('fecha', '?')}):", file=sys.stderr)
+        for nombre, metrica_, a, b, cambio, regresion in filas:
+            marca = "REGRESIÓN" if regresion else "ok"
+            print(f"    {nombre + '.' + metrica_:<40} {a:>12.3f} -> {b:>12.3f} ({cambio:+.1%}) {marca}", file=sys.stderr)
+        sys.exit(1 if regresiones else 0)
+
+
+if __name__ == "__main__":
+    main()
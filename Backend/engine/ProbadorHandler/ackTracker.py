@@ -0,0 +1,115 @@
+import threading
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+
+from engine.ProbadorHandler.virtualClock import RELOJ_REAL, FuturoACK
+from engine.ProbadorHandler.engineMetrics import Histograma, BUCKETS_RTT_ACK
+
+# Una entrada abandonada acepta su ACK tardío durante esta fracción del RTT mínimo
+# medido, contada desde que se la abandona: un comando escrito después no puede
+# haber sido respondido todavía, así que ese ACK no es suyo
+FRACCION_GRACIA_TARDIO = 0.5
+
+
+class ACKTracker:
+    """
+    Correlación de comandos con la respuesta "Comando recibido OK" (1a00002000).
+
+    El ACK no identifica al comando, así que se correlaciona por orden (FIFO):
+    cada comando que espera ACK se registra al escribirse con un vencimiento, y
+    cada ACK recibido corresponde al pendiente más antiguo que no haya vencido.
+    Los futuros resuelven True al recibir el ACK y False si el envío falló.
+
+    Si quien espera se cansa (ver `esperar_ack`) el futuro se cancela y su
+    entrada vence enseguida: solo consume un ACK que llegue antes de que el
+    comando siguiente pudiera haber sido respondido (FRACCION_GRACIA_TARDIO del
+    RTT mínimo medido). Así un ACK perdido cuesta un solo comando; si la entrada
+    abandonada esperara más, se quedaría con el ACK del siguiente, este con el
+    del otro, y así hasta el final de la secuencia.
+    """
+
+    def __init__(self, reloj=RELOJ_REAL):
+        self.reloj = reloj
+        self._pendientes = deque()
+        self._lock = threading.Lock()
+
+        # Diagnóstico
+        self.recibidos = 0
+        self.sin_correlacion = 0
+        self.vencidos = 0
+        self.tardios = 0                # ACK consumidos por un comando ya abandonado
+        self.rtt = deque(maxlen=256)   # segundos entre escritura y ACK
+        self.rtt_histograma = Histograma(BUCKETS_RTT_ACK)
+
+    def nuevo_futuro(self):
+        if self.reloj.virtual:
+            return FuturoACK(self.reloj)
+        return Future()
+
+    def registrar(self, futuro, timeout):
+        """Registra un comando recién escrito que espera ACK durante `timeout` segundos."""
+        ahora = self.reloj.perf_counter()
+        entrada = [ahora, ahora + timeout, futuro]     # escritura, vencimiento, futuro
+        with self._lock:
+            self._pendientes.append(entrada)
+        futuro.add_done_callback(lambda f: self._abandonado(entrada) if f.cancelled() else None)
+
+    def _abandonado(self, entrada):
+        # Quien esperaba se cansó: el vencimiento pasa a ser el período de gracia
+        ahora = self.reloj.perf_counter()
+        with self._lock:
+            gracia = min(self.rtt) * FRACCION_GRACIA_TARDIO if self.rtt else 0.0
+            entrada[1] = min(entrada[1], ahora + gracia)
+
+    def recibido(self):
+        """Llamar por cada trama ACK recibida."""
+        ahora = self.reloj.perf_counter()
+        with self._lock:
+            self.recibidos += 1
+            while self._pendientes:
+                t_envio, vence, futuro = self._pendientes.popleft()
+                if ahora > vence:
+                    # La placa no respondió a tiempo a este comando: el ACK es de uno posterior
+                    self.vencidos += 1
+                    continue
+                try:
+                    futuro.set_result(True)
+                except InvalidStateError:
+                    # Abandonado por timeout: el ACK es suyo, llegó tarde
+                    self.tardios += 1
+                    return
+                self.rtt.append(ahora - t_envio)
+                self.rtt_histograma.observar(ahora - t_envio)
+                return
+            self.sin_correlacion += 1
+
+    def cancelar_todos(self):
+        """Resuelve en False todos los pendientes (p. ej. al cerrar el puerto)."""
+        with self._lock:
+            while self._pendientes:
+                _, _, futuro = self._pendientes.popleft()
+                resolver(futuro, False)
+
+
+def resolver(futuro, resultado):
+    """set_result tolerante a futuros ya resueltos o cancelados."""
+    try:
+        futuro.set_result(resultado)
+    except InvalidStateError:
+        pass
+
+
+def esperar_ack(futuro, timeout):
+    """
+    Espera hasta `timeout` segundos el ACK de `futuro`. Devuelve True si llegó.
+    Si el envío falló se devuelve False de inmediato. Al vencer, el futuro se
+    cancela y su entrada en el ACKTracker vence (ver ACKTracker).
+    """
+    if futuro is None:
+        return False
+    try:
+        return futuro.result(timeout=timeout)
+    except FutureTimeoutError:
+        if futuro.cancel():
+            return False
+        return futuro.result()
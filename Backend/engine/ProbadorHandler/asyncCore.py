@@ -0,0 +1,293 @@
+import os
+import asyncio
+import threading
+import time
+
+import serial
+
+from engine.ProbadorHandler.mainOLD import (
+    DZETester, BAUD_RATE, MENSAJES_CONFIGURACION, MENSAJE_KEEP_ALIVE, COLOR_AZUL,
+    ESPERA_ARRANQUE_PLACA, INTERVALO_SONDEO_PLACA,
+)
+from engine.ProbadorHandler.serialReader import SerialReader, PlacaDesconectada
+from engine.ProbadorHandler.txScheduler import ComandoTX, PRIORIDAD_ENSAYO, PRIORIDAD_KEEP_ALIVE
+
+
+class DZETesterAsync(DZETester):
+    """
+    Variante de DZETester con núcleo asyncio.
+
+    Recepción, keep-alive, configuración y transmisión corren como corrutinas
+    sobre un único event loop (en un hilo propio), de modo que el puerto y el
+    estado medido solo se tocan desde ese hilo. Los métodos públicos son los
+    mismos que los de DZETester: `send` puede llamarse desde cualquier hilo y
+    usa la misma cola de prioridades/coalescencia (self.tx.cola), pero el
+    escritor es una corrutina en lugar del hilo de TXScheduler.
+
+    La secuencia de ensayo (ProbarReguladorParalelo) es la misma; se puede
+    ejecutar como siempre o con `probar_regulador_paralelo_async`, que admite
+    timeout y cancelación desde el loop: la secuencia se detiene en el paso
+    siguiente y envía el Stop (ver abortar_ensayo).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._loop = None
+        self._hilo_loop = None
+        self._hay_tx = None
+        self._detener = None
+
+    # ------------------------
+    # Ciclo de vida
+    # ------------------------
+    def start(self, PuertoSerie):
+        self.log.info("=== START INICIADO (núcleo asyncio) ===")
+        self.PuertoSerie = PuertoSerie
+        try:
+            self.log.info("Intentando abrir puerto serie %s a %d bps...", PuertoSerie, BAUD_RATE)
+            self.ser = serial.Serial(PuertoSerie, BAUD_RATE, timeout=2, write_timeout=2)
+            self.log.info("Puerto serie %s abierto correctamente.", PuertoSerie)
+        except serial.SerialException as e:
+            self.log.error("Error abriendo puerto serie: %s", e)
+            self.ser = None
+            return
+
+        self.parser.reset()
+        self.muestras.reset()
+        self.tensiones.reset()
+        self.corrientes.reset()
+        self.lecturas_tension.reset()
+        self.retirada = False
+        self.configurada.clear()
+        self.running = True
+        self._loop = asyncio.new_event_loop()
+        listo = threading.Event()
+        self._hilo_loop = threading.Thread(target=self._ejecutar_loop, args=(listo,), daemon=True)
+        self._hilo_loop.start()
+        listo.wait(timeout=2)
+        self.log.info("=== START FINALIZADO ===")
+
+    def stop(self):
+        """Detiene las corrutinas, el event loop y cierra el puerto serie."""
+        self.log.info("=== STOP INICIADO ===")
+        self.running = False
+        self.configurada.clear()
+        self.acks.cancelar_todos()
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._detener.set)
+        if self._hilo_loop is not None and self._hilo_loop.is_alive():
+            self._hilo_loop.join(timeout=1)
+        try:
+            if self.ser and self.ser.is_open:
+                self.ser.close()
+                self.log.info("Puerto serie cerrado correctamente.")
+        except Exception as e:
+            self.log.error("Error cerrando puerto serie: %s", e)
+        self.log.info("=== STOP FINALIZADO ===")
+
+    def _ejecutar_loop(self, listo):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._principal(listo))
+        finally:
+            self._loop.close()
+
+    async def _principal(self, listo):
+        self._hay_tx = asyncio.Event()
+        self._detener = asyncio.Event()
+        tareas = [
+            asyncio.create_task(self._rx()),
+            asyncio.create_task(self._tx()),
+            asyncio.create_task(self._configurar_y_mantener()),
+        ]
+        listo.set()
+        try:
+            await self._detener.wait()
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+            await asyncio.gather(*tareas, return_exceptions=True)
+
+    # ------------------------
+    # Recepción
+    # ------------------------
+    async def _rx(self):
+        if os.name == "posix" and hasattr(self.ser, "fileno"):
+            await self._rx_descriptor()
+        else:
+            await self._rx_executor()
+
+    async def _rx_descriptor(self):
+        """Recepción sin hilos: el loop avisa cuando el descriptor tiene datos."""
+        fd = self.ser.fileno()
+        desconectado = asyncio.Event()
+
+        def on_datos():
+            try:
+                datos = os.read(fd, 16384)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                self.log.error("Error al recibir datos: %s", e)
+                datos = b""
+            if not datos:
+                desconectado.set()
+                return
+            self._alimentar(datos, time.monotonic())
+
+        self._loop.add_reader(fd, on_datos)
+        try:
+            await desconectado.wait()
+            self.log.warning("Puerto serie desconectado.")
+        finally:
+            self._loop.remove_reader(fd)
+
+    async def _rx_executor(self):
+        """Recepción en plataformas sin add_reader para puertos serie (Windows)."""
+        lector = SerialReader(self.ser)
+        try:
+            while self.running:
+                try:
+                    datos = await self._loop.run_in_executor(None, lector.leer)
+                except serial.SerialException as e:
+                    self.log.error("Error al recibir datos: %s", e)
+                    break
+                self._alimentar(datos, time.monotonic())
+        finally:
+            lector.close()
+
+    # ------------------------
+    # Transmisión (único escritor del puerto)
+    # ------------------------
+    async def _tx(self):
+        cola = self.tx.cola
+        while True:
+            comando = cola.sacar()
+            if comando is None:
+                self._hay_tx.clear()
+                await self._hay_tx.wait()
+                continue
+            self.tx.preparar(comando)
+            ok = await self._escribir_async(comando.cmd, comando.descripcion)
+            self.tx.finalizar(comando, ok)
+            await asyncio.sleep(self.tx.pausa)
+
+    async def _escribir_async(self, cmd, description):
+        try:
+            if self.ser is None or not self.ser.is_open:
+                self.log.error("Error: puerto serie no inicializado o cerrado.")
+                return False
+            self.ser.write(bytes.fromhex(cmd[0:8]))
+            await asyncio.sleep(0.002)
+            self.ser.write(bytes.fromhex(cmd[8:]))
+            if self.grabador is not None:
+                self.grabador.tx(bytes.fromhex(cmd))
+            if not(description.startswith("NP:")):      #si la descripcion empieza con NP no la registro
+                self.log.tx(description, cmd)
+            return True
+        except serial.SerialException as e:
+            self.log.error("Error al enviar datos: %s", e, extra={"comando": description, "payload": cmd})
+            return False
+
+    def _encolar(self, cmd, description, prioridad, clave, ack=None, ack_timeout=1.0):
+        comando = self.tx.cola.encolar(ComandoTX(cmd, description, prioridad, clave, ack, ack_timeout))
+        if threading.current_thread() is self._hilo_loop:
+            self._hay_tx.set()
+        else:
+            self._loop.call_soon_threadsafe(self._hay_tx.set)
+        return comando
+
+    async def send_async(self, cmd, description="", prioridad=PRIORIDAD_ENSAYO, clave=None):
+        """Encola un comando y espera a que sea escrito en el puerto."""
+        comando = self._encolar(cmd, description, prioridad, clave)
+        futuro = self._loop.create_future()
+        comando.al_completar(lambda ok: futuro.done() or futuro.set_result(ok))
+        return await futuro
+
+    def send(self, cmd, description="", prioridad=PRIORIDAD_ENSAYO, clave=None, esperar=True,
+             ack=False, ack_timeout=1.0):
+        if self.retirada:
+            raise PlacaDesconectada(f"Placa retirada de {self.PuertoSerie}")
+        if self._loop is None or not self._loop.is_running():
+            self.log.error("Error: núcleo asyncio no iniciado.")
+            return False
+        futuro = self.acks.nuevo_futuro() if ack else None
+        comando = self._encolar(cmd, description, prioridad, clave, futuro, ack_timeout)
+        if ack:
+            return futuro       # propio aunque el comando se haya coalescido con uno previo
+        if not esperar:
+            return comando
+        if threading.current_thread() is self._hilo_loop:
+            raise RuntimeError("Desde el event loop usar 'await send_async(...)'")
+        return comando.esperar(timeout=5)
+
+    # ------------------------
+    # Configuración y keep-alive
+    # ------------------------
+    async def _configurar_y_mantener(self):
+        # El keep-alive empieza en cuanto termina la configuración
+        await self.configurar_placa_async()
+        await self.keep_alive_async()
+
+    async def _esperar_ack_async(self, m, timeout):
+        futuro = self.send(m, "NP:Configuración placa", ack=True)
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(futuro), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def esperar_placa_async(self, mensaje, timeout=ESPERA_ARRANQUE_PLACA, intervalo=INTERVALO_SONDEO_PLACA):
+        """Igual que esperar_placa, sin bloquear el loop."""
+        limite = self._loop.time() + timeout
+        intentos = 0
+        while True:
+            restante = limite - self._loop.time()
+            if restante <= 0:
+                return False
+            if intentos:
+                self.metricas.reintentos_tx += 1
+            intentos += 1
+            if await self._esperar_ack_async(mensaje, min(intervalo, restante)):
+                return True
+
+    async def configurar_placa_async(self):
+        pendientes = MENSAJES_CONFIGURACION
+        if await self.esperar_placa_async(pendientes[0]):
+            self.log.debug("Enviado: %s", pendientes[0], extra={"payload": pendientes[0], "color": COLOR_AZUL})
+            pendientes = pendientes[1:]
+        for m in pendientes:
+            # Se avanza al recibir el ACK; 50 ms como máximo
+            if await self._esperar_ack_async(m, 0.05):
+                self.log.debug("Enviado: %s", m, extra={"payload": m, "color": COLOR_AZUL})
+            else:
+                self.log.warning("Enviado (sin ACK): %s", m, extra={"payload": m})
+        self.log.color(COLOR_AZUL, "Enviado: PLACA CONECTADA")
+        self.msg_gui = "Placa configurada y conectada."
+        self.configurada.set()
+
+    async def keep_alive_async(self):
+        while self.running:
+            self._encolar(MENSAJE_KEEP_ALIVE, "NP:Lectura status", PRIORIDAD_KEEP_ALIVE, "keep_alive")
+            await asyncio.sleep(0.2)
+
+    # ------------------------
+    # Ensayo
+    # ------------------------
+    async def probar_regulador_paralelo_async(self, timeout=None):
+        """
+        Ejecuta ProbarReguladorParalelo desde el loop con timeout opcional.
+        Sus envíos pasan por la misma cola de transmisión que el keep-alive.
+
+        Al vencer `timeout` o cancelarse la tarea, se aborta la secuencia
+        (abortar_ensayo) y se espera a que envíe el Stop antes de propagar
+        TimeoutError/CancelledError: la placa no sigue recibiendo comandos.
+        """
+        self._iniciar_ensayo()      # un timeout antes de que arranque el ejecutor también aborta
+        ensayo = asyncio.get_running_loop().run_in_executor(None, self._correr_ensayo)
+        try:
+            return await asyncio.wait_for(asyncio.shield(ensayo), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self.abortar_ensayo()
+            await asyncio.gather(ensayo, return_exceptions=True)
+            raise
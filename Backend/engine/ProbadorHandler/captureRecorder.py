@@ -0,0 +1,237 @@
+import os
+import mmap
+import time
+import struct
+import threading
+from collections import deque
+
+import numpy as np
+
+from engine.ProbadorHandler.frameParser import longitud_trama
+
+# ----------------------------
+# Formato de captura
+# ----------------------------
+# Archivo .dzecap (solo se agrega al final):
+#   cabecera: MAGIA_CAPTURA + <dd (t0 monotónico, t0 epoch)
+#   registros: <BdQI (dirección, t monotónico, posición en el flujo de esa dirección, largo) + bytes
+# Archivo .idx (registros de tamaño fijo, se abre con mmap como arreglo numpy):
+#   cabecera: MAGIA_INDICE + <d (t0 monotónico)
+#   entradas: <QdIQ (posición de la trama en el flujo RX, t de recepción, cabecera como uint32,
+#             offset en el .dzecap del registro RX donde empieza la trama)
+MAGIA_CAPTURA = b"DZECAP\x01\x00"
+MAGIA_INDICE = b"DZEIDX\x01\x00"
+CABECERA_CAPTURA = struct.Struct("<8sdd")
+CABECERA_INDICE = struct.Struct("<8sd")
+REGISTRO = struct.Struct("<BdQI")
+ENTRADA_INDICE = np.dtype([("posicion", "<u8"), ("t", "<f8"), ("header", "<u4"), ("offset", "<u8")])
+
+DIR_RX = 0
+DIR_TX = 1
+
+
+class CaptureRecorder:
+    """
+    Grabador de los bytes crudos intercambiados con la placa.
+
+    El hilo RX solo encola (dirección, instante, bytes); un hilo propio escribe
+    con buffer grande, así la recepción a 1.8 Mbaud no espera al disco. Junto a
+    cada captura se escribe un índice de tramas para abrirla con mmap y saltar a
+    una trama o instante sin leer todo el archivo (ver CaptureReader). Al superar
+    `max_bytes` se rota a un archivo nuevo y se conservan los `max_archivos` últimos.
+    """
+
+    def __init__(self, ruta_base, max_bytes=64 * 1024 * 1024, max_archivos=10, periodo=0.05):
+        self.ruta_base = ruta_base
+        self.max_bytes = max_bytes
+        self.max_archivos = max_archivos
+        self.periodo = periodo
+        self._pendientes = deque()
+        self._hay_datos = threading.Event()
+        self._corriendo = False
+        self._hilo = None
+        self._captura = None
+        self._indice = None
+        self._archivos = []
+        self._pos_tx = 0
+        # Últimos registros RX del archivo actual: (posición inicial en el flujo, offset en el archivo)
+        self._registros_rx = deque(maxlen=64)
+        self.bytes_escritos = 0
+
+    # ------------------------
+    # API usada por el tester (cualquier hilo)
+    # ------------------------
+    def rx(self, datos, t, posicion):
+        """Bytes recibidos tal como salieron del puerto; `posicion` es su inicio en el flujo RX."""
+        if self._corriendo:
+            self._pendientes.append((DIR_RX, t, posicion, bytes(datos)))
+
+    def tx(self, datos, t=None):
+        if self._corriendo:
+            self._pendientes.append((DIR_TX, time.monotonic() if t is None else t, None, bytes(datos)))
+
+    def trama(self, posicion, t, header):
+        """Registra en el índice una trama completa que empieza en `posicion` del flujo RX."""
+        if self._corriendo:
+            self._pendientes.append((None, t, posicion, header))
+
+    # ------------------------
+    # Ciclo de vida
+    # ------------------------
+    def start(self):
+        if self._corriendo:
+            return
+        directorio = os.path.dirname(self.ruta_base)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._abrir()
+        self._corriendo = True
+        self._hilo = threading.Thread(target=self._ejecutar, daemon=True)
+        self._hilo.start()
+
+    def stop(self):
+        self._corriendo = False
+        self._hay_datos.set()
+        if self._hilo is not None and self._hilo.is_alive():
+            self._hilo.join(timeout=2)
+        self._vaciar()
+        self._cerrar()
+
+    @property
+    def archivo_actual(self):
+        return self._archivos[-1] if self._archivos else None
+
+    # ------------------------
+    # Escritura (hilo propio)
+    # ------------------------
+    def _abrir(self):
+        ruta = f"{self.ruta_base}-{time.strftime('%Y%m%d-%H%M%S')}-{len(self._archivos):03d}.dzecap"
+        t0 = time.monotonic()
+        self._captura = open(ruta, "wb", buffering=1024 * 1024)
+        self._captura.write(CABECERA_CAPTURA.pack(MAGIA_CAPTURA, t0, time.time()))
+        self._indice = open(ruta + ".idx", "wb", buffering=256 * 1024)
+        self._indice.write(CABECERA_INDICE.pack(MAGIA_INDICE, t0))
+        self._archivos.append(ruta)
+        self._registros_rx.clear()
+        while len(self._archivos) > self.max_archivos:
+            viejo = self._archivos.pop(0)
+            for r in (viejo, viejo + ".idx"):
+                try:
+                    os.remove(r)
+                except OSError:
+                    pass
+
+    def _cerrar(self):
+        for f in (self._captura, self._indice):
+            if f is not None:
+                f.close()
+        self._captura = self._indice = None
+
+    def _ejecutar(self):
+        while self._corriendo:
+            self._hay_datos.wait(self.periodo)
+            self._hay_datos.clear()
+            self._vaciar()
+
+    def _vaciar(self):
+        if self._captura is None:
+            return
+        pendientes = self._pendientes
+        while pendientes:
+            direccion, t, posicion, datos = pendientes.popleft()
+            if direccion is None:
+                # Entrada de índice: registro RX donde empieza la trama (el último escrito,
+                # o uno anterior si la trama quedó partida entre lecturas)
+                offset_rx = CABECERA_CAPTURA.size
+                for inicio_rx, offset_rx in reversed(self._registros_rx):
+                    if inicio_rx <= posicion:
+                        break
+                self._indice.write(struct.pack("<QdIQ", posicion, t, int.from_bytes(datos, "little"), offset_rx))
+                continue
+
+            if self._captura.tell() >= self.max_bytes:
+                self._cerrar()
+                self._abrir()
+
+            offset = self._captura.tell()
+            if direccion == DIR_TX:
+                posicion = self._pos_tx
+                self._pos_tx += len(datos)
+            else:
+                self._registros_rx.append((posicion, offset))
+            self._captura.write(REGISTRO.pack(direccion, t, posicion, len(datos)))
+            self._captura.write(datos)
+            self.bytes_escritos += REGISTRO.size + len(datos)
+        self._captura.flush()
+        self._indice.flush()
+
+
+class CaptureReader:
+    """
+    Lectura de una captura .dzecap con su índice, ambos con mmap.
+
+    `indice` es un arreglo numpy estructurado (posicion, t, header, offset) que
+    apunta directo al archivo .idx, así que abrir una captura grande no la lee.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._f = open(ruta, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magia, self.t0, self.t0_epoch = CABECERA_CAPTURA.unpack_from(self._mm, 0)
+        if magia != MAGIA_CAPTURA:
+            raise ValueError(f"{ruta} no es una captura DZE")
+
+        self._fi = open(ruta + ".idx", "rb")
+        self._mmi = mmap.mmap(self._fi.fileno(), 0, access=mmap.ACCESS_READ)
+        if CABECERA_INDICE.unpack_from(self._mmi, 0)[0] != MAGIA_INDICE:
+            raise ValueError(f"{ruta}.idx no es un índice de captura DZE")
+        n = (len(self._mmi) - CABECERA_INDICE.size) // ENTRADA_INDICE.itemsize
+        self.indice = np.frombuffer(self._mmi, dtype=ENTRADA_INDICE, count=n, offset=CABECERA_INDICE.size)
+
+    def __len__(self):
+        return len(self.indice)
+
+    def registros(self, offset=None):
+        """Itera (dirección, t, posición, datos) desde `offset` (por defecto, el primer registro)."""
+        offset = CABECERA_CAPTURA.size if offset is None else offset
+        fin = len(self._mm)
+        vista = memoryview(self._mm)
+        while offset + REGISTRO.size <= fin:
+            direccion, t, posicion, largo = REGISTRO.unpack_from(self._mm, offset)
+            offset += REGISTRO.size
+            if offset + largo > fin:
+                break       # registro truncado (captura cortada)
+            yield direccion, t, posicion, vista[offset:offset + largo]
+            offset += largo
+
+    def buscar(self, t):
+        """Índice de la primera trama recibida en o después del instante monotónico `t`."""
+        return int(np.searchsorted(self.indice["t"], t))
+
+    def trama(self, i):
+        """Devuelve (t, trama) de la entrada `i` del índice, o None si empieza en un archivo anterior."""
+        entrada = self.indice[i]
+        posicion = int(entrada["posicion"])
+        largo = longitud_trama(int(entrada["header"]).to_bytes(4, "little"))
+        partes = []
+        faltan = largo
+        for direccion, _, inicio, datos in self.registros(int(entrada["offset"])):
+            if direccion != DIR_RX:
+                continue
+            if inicio > posicion + largo - faltan:
+                return None     # hueco: la trama no está completa en este archivo
+            desde = posicion + largo - faltan - inicio
+            if desde >= len(datos):
+                continue
+            parte = datos[desde:desde + faltan]
+            partes.append(bytes(parte))
+            faltan -= len(parte)
+            if faltan == 0:
+                return float(entrada["t"]), b"".join(partes)
+        return None
+
+    def close(self):
+        self.indice = None
+        for obj in (self._mmi, self._fi, self._mm, self._f):
+            obj.close()
@@ -0,0 +1,264 @@
+import time
+from bisect import bisect_left
+from collections import deque
+
+from engine.ProbadorHandler.frameParser import HEADER_ACK, HEADER_ESTADO, HEADER_MUESTRAS, longitud_trama
+from engine.ProbadorHandler.eventLog import registro_configurado
+
+# ----------------------------
+# Métricas operativas del motor de adquisición y ensayo (formato de texto Prometheus)
+# ----------------------------
+# Regla para el camino caliente: cada contador tiene un único hilo escritor
+# (RX, escritor TX o el hilo del ensayo) y es un atributo int/float común, sin
+# locks. El scrape lee sin sincronizar: puede ver un histograma a medio
+# actualizar (una observación de diferencia entre suma y cuenta), nunca un valor roto.
+
+TIPOS_TRAMA = {HEADER_ACK: "ack", HEADER_ESTADO: "estado", HEADER_MUESTRAS: "muestras"}
+
+# Límites superiores de los buckets (segundos)
+BUCKETS_DECODIFICACION = (25e-6, 50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 5e-3, 10e-3)
+BUCKETS_RTT_ACK = (0.5e-3, 1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3, 100e-3, 250e-3, 1.0)
+BUCKETS_ENSAYO = (2.0, 4.0, 6.0, 8.0, 10.0, 15.0, 20.0, 30.0, 60.0)
+
+# Enlace serie: 8N1 = 10 bits por byte
+BAUDIOS_ENLACE = 1843200
+BITS_POR_BYTE = 10
+
+# Ventana de las tasas calculadas al exponer (bytes/s, tramas/s, utilización)
+VENTANA_TASAS = 10.0
+
+# Resultado del ensayo según EstadoEnsayo
+RESULTADOS_ENSAYO = {2: "ok", 3: "error"}
+
+
+class Histograma:
+    """Histograma de un solo escritor: `observar` es un bisect y tres sumas, sin locks."""
+
+    __slots__ = ("limites", "cuentas", "suma", "n")
+
+    def __init__(self, limites):
+        self.limites = tuple(limites)
+        self.cuentas = [0] * (len(self.limites) + 1)    # el último es +Inf
+        self.suma = 0.0
+        self.n = 0
+
+    def observar(self, valor):
+        self.cuentas[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.n += 1
+
+    def acumulado(self):
+        """Lista de (le, cuenta acumulada) terminada en +Inf, como la espera Prometheus."""
+        out, total = [], 0
+        for limite, cuenta in zip(self.limites + (float("inf"),), list(self.cuentas)):
+            total += cuenta
+            out.append((limite, total))
+        return out
+
+
+class MetricasTester:
+    """Contadores propios de un DZETester que no estaban ya en parser, ACKTracker o TXScheduler."""
+
+    def __init__(self):
+        # Hilo RX
+        self.tramas_invalidas = 0
+        self.decodificacion = Histograma(BUCKETS_DECODIFICACION)
+        # Reenvíos: sondeo de arranque sin ACK (esperar_placa) y escrituras reintentadas (núcleo legado)
+        self.reintentos_tx = 0
+        # Hilo del ensayo (uno a la vez por banco)
+        self.ensayos = {"ok": 0, "error": 0, "excepcion": 0}
+        self.duracion_ensayo = Histograma(BUCKETS_ENSAYO)
+
+    def ensayo_terminado(self, estado, segundos):
+        self.ensayos[RESULTADOS_ENSAYO.get(estado, "error")] += 1
+        self.duracion_ensayo.observar(segundos)
+
+    def ensayo_abortado(self):
+        self.ensayos["excepcion"] += 1
+
+
+class TasaMedida:
+    """Tasa de un contador creciente sobre los últimos `ventana` segundos, muestreada al exponer."""
+
+    def __init__(self, ventana=VENTANA_TASAS):
+        self.ventana = ventana
+        self._muestras = deque()
+
+    def actualizar(self, ahora, valor):
+        muestras = self._muestras
+        muestras.append((ahora, valor))
+        # Conservar una muestra anterior a la ventana como base
+        while len(muestras) > 2 and muestras[1][0] <= ahora - self.ventana:
+            muestras.popleft()
+        t0, v0 = muestras[0]
+        if ahora <= t0 or valor < v0:
+            return 0.0
+        return (valor - v0) / (ahora - t0)
+
+
+# ----------------------------
+# Exposición en formato de texto
+# ----------------------------
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    partes = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+              for k, v in etiquetas.items())
+    return "{" + ",".join(partes) + "}"
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    if isinstance(valor, float):
+        return repr(round(valor, 9))
+    return str(valor)
+
+
+class TextoPrometheus:
+    """Acumula familias de métricas (HELP/TYPE una vez por nombre) y arma el texto final."""
+
+    def __init__(self):
+        self._familias = {}
+
+    def _familia(self, nombre, tipo, ayuda):
+        familia = self._familias.get(nombre)
+        if familia is None:
+            familia = self._familias[nombre] = [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+        return familia
+
+    def contador(self, nombre, ayuda, valor, **etiquetas):
+        self._familia(nombre, "counter", ayuda).append(f"{nombre}{_etiquetas(etiquetas)} {_numero(valor)}")
+
+    def medidor(self, nombre, ayuda, valor, **etiquetas):
+        self._familia(nombre, "gauge", ayuda).append(f"{nombre}{_etiquetas(etiquetas)} {_numero(valor)}")
+
+    def histograma(self, nombre, ayuda, histograma, **etiquetas):
+        familia = self._familia(nombre, "histogram", ayuda)
+        for limite, cuenta in histograma.acumulado():
+            familia.append(f"{nombre}_bucket{_etiquetas(dict(etiquetas, le=_numero(float(limite))))} {cuenta}")
+        familia.append(f"{nombre}_sum{_etiquetas(etiquetas)} {_numero(histograma.suma)}")
+        familia.append(f"{nombre}_count{_etiquetas(etiquetas)} {histograma.n}")
+
+    def texto(self):
+        return "\n".join(linea for familia in self._familias.values() for linea in familia) + "\n"
+
+
+class ExportadorMetricas:
+    """
+    Arma /metrics recorriendo los bancos del FixtureRegistry.
+
+    Lee los contadores de diagnóstico existentes (FrameParser, ACKTracker,
+    TXScheduler) y los de MetricasTester; las tasas (bytes/s, tramas/s y la
+    utilización del enlace frente a su capacidad en baudios) se calculan acá,
+    al exponer, para no sumar trabajo al hilo RX.
+    """
+
+    def __init__(self, fixtures, difusores=None, ventana=VENTANA_TASAS):
+        self.fixtures = fixtures
+        self.difusores = difusores      # DifusoresEnVivo de /stream (opcional)
+        self.ventana = ventana
+        self._tasas = {}
+
+    def _tasa(self, *clave, valor, ahora):
+        tasa = self._tasas.get(clave)
+        if tasa is None:
+            tasa = self._tasas[clave] = TasaMedida(self.ventana)
+        return tasa.actualizar(ahora, valor)
+
+    def exponer(self):
+        out = TextoPrometheus()
+        ahora = time.monotonic()
+        for fixture in self.fixtures.todos():
+            self._exponer_banco(out, fixture, ahora)
+        self._exponer_registro(out)
+        return out.texto()
+
+    def _exponer_registro(self, out):
+        eventos = registro_configurado()
+        if eventos is None:
+            return
+        manejador = eventos.manejador
+        out.medidor("dze_log_queue_depth", "Registros de eventos pendientes de escribir", manejador.en_cola)
+        for nivel, n in sorted(dict(manejador.descartados).items()):
+            out.contador("dze_log_dropped_total", "Registros de eventos descartados con la cola saturada", n,
+                         nivel=nivel.lower())
+
+    def _exponer_banco(self, out, fixture, ahora):
+        banco = fixture.id
+        out.medidor("dze_fixture_connected", "1 si el banco tiene la placa conectada", int(fixture.conectado),
+                    fixture=banco)
+        if not fixture.creado:
+            return      # banco registrado que nunca se conectó: sin tester todavía
+
+        tester = fixture.tester
+        parser, acks, tx, metricas = tester.parser, tester.acks, tester.tx, tester.metricas
+
+        # --- RX
+        out.contador("dze_rx_bytes_total", "Bytes recibidos del puerto serie", parser.bytes_recibidos, fixture=banco)
+        out.medidor("dze_rx_bytes_per_second", f"Bytes recibidos por segundo (últimos {self.ventana:g} s)",
+                    self._tasa(banco, "rx_bytes", valor=parser.bytes_recibidos, ahora=ahora), fixture=banco)
+        for header, tipo in TIPOS_TRAMA.items():
+            n = parser.por_cabecera.get(header, 0)
+            out.contador("dze_rx_frames_total", "Tramas completas recibidas por tipo", n, fixture=banco, tipo=tipo)
+            out.medidor("dze_rx_frames_per_second", f"Tramas por segundo por tipo (últimos {self.ventana:g} s)",
+                        self._tasa(banco, "rx_tramas", tipo, valor=n, ahora=ahora), fixture=banco, tipo=tipo)
+            out.contador("dze_rx_frame_bytes_total", "Bytes recibidos en tramas completas por tipo",
+                         n * longitud_trama(header), fixture=banco, tipo=tipo)
+        out.contador("dze_rx_discarded_bytes_total", "Bytes descartados al resincronizar el reensamblador",
+                     parser.bytes_descartados, fixture=banco)
+        out.contador("dze_rx_invalid_frames_total", "Tramas de muestras completas que no pudieron decodificarse",
+                     metricas.tramas_invalidas, fixture=banco)
+        out.medidor("dze_rx_partial_bytes", "Bytes de una trama parcial pendientes en el reensamblador",
+                    parser.pendientes(), fixture=banco)
+        out.histograma("dze_rx_decode_seconds", "Decodificación, RMS/AVG y publicación de una trama de muestras",
+                       metricas.decodificacion, fixture=banco)
+
+        # --- TX
+        out.medidor("dze_tx_queue_depth", "Comandos pendientes en la cola TX", len(tx.cola), fixture=banco)
+        out.contador("dze_tx_commands_total", "Comandos procesados por el escritor TX", tx.stats.enviados,
+                     fixture=banco, resultado="enviado")
+        out.contador("dze_tx_commands_total", "Comandos procesados por el escritor TX", tx.stats.fallidos,
+                     fixture=banco, resultado="fallido")
+        out.contador("dze_tx_coalesced_total", "Setpoints reemplazados en cola antes de salir", tx.cola.coalescidos,
+                     fixture=banco)
+        out.contador("dze_tx_retries_total", "Comandos reenviados por falta de ACK o error de escritura", metricas.reintentos_tx,
+                     fixture=banco)
+        out.contador("dze_tx_bytes_total", "Bytes escritos en el puerto serie", tx.stats.bytes_enviados, fixture=banco)
+
+        # --- ACK
+        out.contador("dze_ack_received_total", "ACK recibidos", acks.recibidos, fixture=banco)
+        out.contador("dze_ack_uncorrelated_total", "ACK sin comando pendiente", acks.sin_correlacion, fixture=banco)
+        out.contador("dze_ack_expired_total", "Comandos cuyo ACK llegó vencido o nunca", acks.vencidos, fixture=banco)
+        out.contador("dze_ack_late_total", "ACK llegados después de abandonar la espera", acks.tardios, fixture=banco)
+        out.histograma("dze_ack_rtt_seconds", "Tiempo entre la escritura de un comando y su ACK",
+                       acks.rtt_histograma, fixture=banco)
+
+        # --- Enlace
+        ser = getattr(tester, "ser", None)
+        baudios = getattr(ser, "baudrate", None) or BAUDIOS_ENLACE
+        capacidad = baudios / BITS_POR_BYTE
+        out.medidor("dze_serial_link_capacity_bytes_per_second", "Capacidad del enlace serie por sentido (8N1)",
+                    capacidad, fixture=banco)
+        for sentido, total in (("rx", parser.bytes_recibidos), ("tx", tx.stats.bytes_enviados)):
+            tasa = self._tasa(banco, "enlace", sentido, valor=total, ahora=ahora)
+            out.medidor("dze_serial_link_utilization_ratio",
+                        f"Fracción de la capacidad del enlace en uso (últimos {self.ventana:g} s)",
+                        tasa / capacidad, fixture=banco, sentido=sentido)
+
+        # --- Ensayos
+        for resultado, n in metricas.ensayos.items():
+            out.contador("dze_tests_total", "Ensayos de regulador terminados por resultado", n,
+                         fixture=banco, resultado=resultado)
+        out.histograma("dze_test_duration_seconds", "Duración del ensayo de regulador", metricas.duracion_ensayo,
+                       fixture=banco)
+
+        # --- Mediciones en vivo
+        difusor = self.difusores.obtener(banco) if self.difusores is not None else None
+        if difusor is not None:
+            out.medidor("dze_stream_clients", "Clientes conectados a /stream", difusor.clientes, fixture=banco)
+            out.contador("dze_stream_events_total", "Eventos producidos para /stream", difusor.eventos,
+                         fixture=banco)
+            out.contador("dze_stream_dropped_events_total",
+                         "Eventos descartados por clientes lentos (clientes conectados)", difusor.descartados,
+                         fixture=banco)
@@ -0,0 +1,284 @@
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import threading
+
+# ----------------------------
+# Registro de eventos estructurado y no bloqueante
+# ----------------------------
+# Los hilos que hablan con el puerto (escritor TX, RX, ensayo) solo encolan un
+# LogRecord: sin formatear, sin tocar la consola ni el disco. Un hilo de salida
+# (QueueListener) lo formatea y lo reparte a los destinos configurados: consola,
+# archivo JSON por líneas con rotación comprimida y el AnilloLog de GET /logs.
+# Si la cola se llena, los registros se descartan (nunca se bloquea al que
+# registra) y se informa cuántos con un registro de resumen.
+
+RAIZ = "dze"
+COLA_REGISTRO = 10000           # registros pendientes como máximo
+UMBRAL_DEBUG = 0.75             # con la cola por encima de esta fracción se descartan los DEBUG
+ARCHIVO_MAX_BYTES = 5 * 1024 * 1024
+ARCHIVOS_ROTADOS = 5
+
+COLOR_AZUL = '\033[94m'
+COLOR_ROJO = '\033[91m'
+COLOR_VERDE = '\033[32m'
+COLOR_MAGENTA = '\033[95m'
+COLOR_RESET = '\033[0m'
+COLOR_AMARILLO = '\033[33m'
+
+COLORES_NIVEL = {logging.WARNING: COLOR_AMARILLO, logging.ERROR: COLOR_ROJO, logging.CRITICAL: COLOR_ROJO}
+
+# Campos estructurados que se copian del LogRecord (vía extra=...) a la salida JSON
+CAMPOS = ("fixture", "etapa", "comando", "payload")
+
+
+def registro(nombre):
+    """Logger `dze.<nombre>`; todos cuelgan de la raíz que configura configurar_registro."""
+    return logging.getLogger(f"{RAIZ}.{nombre}")
+
+
+class RegistroTester(logging.LoggerAdapter):
+    """
+    Logger de un DZETester: cada registro lleva el banco (`fixture`, o el puerto
+    mientras el FixtureRegistry no lo asigne) y la etapa del ensayo en curso.
+    """
+
+    def __init__(self, tester, fixture=None):
+        super().__init__(registro("tester"), {})
+        self.tester = tester
+        self.fixture = fixture
+
+    def process(self, msg, kwargs):
+        extra = kwargs.get("extra") or {}
+        extra.setdefault("fixture", self.fixture or getattr(self.tester, "PuertoSerie", None))
+        extra.setdefault("etapa", self.tester.traza.etapa_actual)
+        kwargs["extra"] = extra
+        return msg, kwargs
+
+    def tx(self, descripcion, cmd):
+        """Comando escrito en el puerto (DEBUG): descripción y payload en hexadecimal."""
+        if self.isEnabledFor(logging.DEBUG):
+            self.debug("TX: %s : (%s)", descripcion, cmd,
+                       extra={"comando": descripcion, "payload": cmd, "color": COLOR_AZUL})
+
+    def color(self, color, msg, *args, nivel=logging.INFO):
+        """Registro con color de consola propio (los demás destinos lo ignoran)."""
+        if self.isEnabledFor(nivel):
+            self.log(nivel, msg, *args, extra={"color": color})
+
+
+# ----------------------------
+# Encolado (lo ejecuta el hilo que registra)
+# ----------------------------
+class ManejadorNoBloqueante(logging.handlers.QueueHandler):
+    """
+    QueueHandler con cola acotada que nunca bloquea: por encima de `umbral` de
+    ocupación descarta los DEBUG y con la cola llena descarta cualquier nivel.
+    Los descartes se acumulan por nivel y, cuando la cola se libera, se encola
+    un único WARNING de resumen en lugar de uno por registro perdido.
+    """
+
+    def __init__(self, capacidad=COLA_REGISTRO, umbral=UMBRAL_DEBUG):
+        super().__init__(queue.Queue(capacidad))
+        self._limite_debug = int(capacidad * umbral)
+        self._lock = threading.Lock()       # solo en el camino de descarte
+        self._pendientes = {}               # nivel -> descartados aún no informados
+        self.descartados = {}               # nivel -> total descartado
+
+    def prepare(self, record):
+        # Sin formatear acá: el mensaje (%-args) se arma en el hilo de salida.
+        # Los args deben ser valores que no cambien después (str, números).
+        return record
+
+    def enqueue(self, record):
+        cola = self.queue
+        if record.levelno <= logging.DEBUG and cola.qsize() >= self._limite_debug:
+            self._descartar(record)
+            return
+        try:
+            cola.put_nowait(record)
+        except queue.Full:
+            self._descartar(record)
+            return
+        if self._pendientes and cola.qsize() < self._limite_debug:
+            self._informar_descartes()
+
+    def _descartar(self, record):
+        with self._lock:
+            nivel = record.levelname
+            self._pendientes[nivel] = self._pendientes.get(nivel, 0) + 1
+            self.descartados[nivel] = self.descartados.get(nivel, 0) + 1
+
+    def _informar_descartes(self):
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+        if not pendientes:
+            return
+        detalle = ", ".join(f"{n} {nivel}" for nivel, n in sorted(pendientes.items()))
+        resumen = logging.makeLogRecord({
+            "name": RAIZ, "levelno": logging.WARNING, "levelname": "WARNING",
+            "msg": "Registro saturado: %d registros descartados (%s)",
+            "args": (sum(pendientes.values()), detalle),
+        })
+        try:
+            self.queue.put_nowait(resumen)
+        except queue.Full:
+            with self._lock:
+                for nivel, n in pendientes.items():
+                    self._pendientes[nivel] = self._pendientes.get(nivel, 0) + n
+
+    @property
+    def en_cola(self):
+        return self.queue.qsize()
+
+
+# ----------------------------
+# Destinos (los ejecuta el hilo de salida)
+# ----------------------------
+class FormatoConsola(logging.Formatter):
+    """Línea legible con el banco como prefijo y color ANSI por registro o por nivel."""
+
+    def __init__(self, colores=True):
+        super().__init__("%(message)s")
+        self.colores = colores
+
+    def format(self, record):
+        linea = super().format(record)
+        fixture = getattr(record, "fixture", None)
+        if fixture:
+            linea = f"[{fixture}] {linea}"
+        color = getattr(record, "color", None) or COLORES_NIVEL.get(record.levelno)
+        if self.colores and color:
+            linea = f"{color}{linea}{COLOR_RESET}"
+        return linea
+
+
+class FormatoJSON(logging.Formatter):
+    """Un objeto JSON por línea: t, nivel, origen, mensaje y los CAMPOS presentes."""
+
+    def format(self, record):
+        datos = {
+            "t": round(record.created, 6),
+            "nivel": record.levelname.lower(),
+            "origen": record.name,
+            "mensaje": record.getMessage(),
+        }
+        for campo in CAMPOS:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                datos[campo] = valor
+        if record.exc_info:
+            datos["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+def _nombre_rotado(nombre):
+    return nombre + ".gz"
+
+
+def _rotar_comprimiendo(origen, destino):
+    with open(origen, "rb") as f_origen, gzip.open(destino, "wb") as f_destino:
+        shutil.copyfileobj(f_origen, f_destino)
+    os.remove(origen)
+
+
+def archivo_rotativo(ruta, max_bytes=ARCHIVO_MAX_BYTES, rotados=ARCHIVOS_ROTADOS):
+    """RotatingFileHandler JSON por líneas cuyos archivos rotados (ruta.1.gz ... ruta.N.gz) se comprimen."""
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    manejador = logging.handlers.RotatingFileHandler(ruta, maxBytes=max_bytes, backupCount=rotados,
+                                                     encoding="utf-8")
+    manejador.namer = _nombre_rotado
+    manejador.rotator = _rotar_comprimiendo
+    manejador.setLevel(logging.DEBUG)
+    manejador.setFormatter(FormatoJSON())
+    return manejador
+
+
+class ManejadorAnillo(logging.Handler):
+    """Pasa los registros al AnilloLog que sirve GET /logs (fuente = banco)."""
+
+    def __init__(self, anillo, nivel=logging.INFO):
+        super().__init__(nivel)
+        self.anillo = anillo
+
+    def emit(self, record):
+        try:
+            self.anillo.agregar(record.getMessage(), record.levelname.lower(), getattr(record, "fixture", None))
+        except Exception:
+            self.handleError(record)
+
+
+# ----------------------------
+# Configuración
+# ----------------------------
+class RegistroEventos:
+    """Registro configurado: el manejador de encolado, el hilo de salida y sus destinos."""
+
+    def __init__(self, manejador, oyente, destinos):
+        self.manejador = manejador
+        self.oyente = oyente
+        self.destinos = destinos
+
+    def detener(self):
+        """Vacía la cola hacia los destinos y termina el hilo de salida."""
+        if self.oyente is not None:
+            self.oyente.stop()
+            self.oyente = None
+            logging.getLogger(RAIZ).removeHandler(self.manejador)
+            for destino in self.destinos:
+                destino.close()
+
+
+_configurado = None
+
+
+def configurar_registro(consola=True, nivel_consola=logging.DEBUG, archivo=None, anillo=None,
+                        nivel_anillo=logging.INFO, capacidad=COLA_REGISTRO):
+    """
+    Configura la raíz `dze` con el encolado no bloqueante y los destinos pedidos:
+    consola (stdout, con colores si es una terminal), `archivo` (JSON por líneas
+    con rotación comprimida) y `anillo` (AnilloLog, desde `nivel_anillo`).
+    Reconfigurar detiene el registro anterior. Devuelve el RegistroEventos.
+    """
+    global _configurado
+    if _configurado is not None:
+        _configurado.detener()
+
+    destinos = []
+    if consola:
+        salida = logging.StreamHandler(sys.stdout)
+        salida.setLevel(nivel_consola)
+        salida.setFormatter(FormatoConsola(colores=sys.stdout.isatty()))
+        destinos.append(salida)
+    if archivo:
+        destinos.append(archivo_rotativo(archivo))
+    if anillo is not None:
+        destinos.append(ManejadorAnillo(anillo, nivel_anillo))
+
+    manejador = ManejadorNoBloqueante(capacidad)
+    raiz = logging.getLogger(RAIZ)
+    raiz.setLevel(min([d.level for d in destinos] or [logging.WARNING]))
+    raiz.propagate = False
+    raiz.addHandler(manejador)
+
+    oyente = logging.handlers.QueueListener(manejador.queue, *destinos, respect_handler_level=True)
+    oyente.start()
+    _configurado = RegistroEventos(manejador, oyente, destinos)
+    return _configurado
+
+
+def registro_configurado():
+    """RegistroEventos activo o None (para /metrics)."""
+    return _configurado
+
+
+@atexit.register
+def _vaciar_al_salir():
+    if _configurado is not None:
+        _configurado.detener()
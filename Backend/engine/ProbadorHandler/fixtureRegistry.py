@@ -0,0 +1,221 @@
+import time
+import threading
+
+from engine.serialUtils.SerialFinder import find_stlinks, seriales_permitidos
+from engine.ProbadorHandler.eventLog import registro
+
+log = registro("fixtures")
+
+# Preparación de un banco (y del conjunto, ver FixtureRegistry.preparacion)
+DESCUBRIENDO = "descubriendo"   # primer escaneo de placas en curso
+SIN_PLACA = "sin_placa"
+CONFIGURANDO = "configurando"   # puerto abierto, configuración de la placa en curso
+LISTO = "listo"
+
+
+class Fixture:
+    """
+    Un banco de ensayo: una placa ST-Link (identificada por su número de serie) y su DZETester.
+
+    El tester se crea con `fabrica(fixture_id)` la primera vez que se usa (al
+    conectar la placa, normalmente): registrar un banco no importa el núcleo ni
+    reserva sus buffers.
+    """
+
+    def __init__(self, fixture_id, fabrica):
+        self.id = fixture_id
+        self._fabrica = fabrica
+        self._tester = None
+        self._lock_tester = threading.Lock()
+        self.puerto = None
+        # Un ensayo a la vez por banco; bancos distintos corren en paralelo
+        self.ensayo = threading.Lock()
+
+    @property
+    def creado(self):
+        """True si el tester ya existe."""
+        return self._tester is not None
+
+    @property
+    def tester(self):
+        tester = self._tester
+        if tester is None:
+            with self._lock_tester:
+                if self._tester is None:
+                    tester = self._fabrica(self.id)
+                    # Los registros del tester llevan el id del banco en lugar del puerto
+                    registro_tester = getattr(tester, "log", None)
+                    if registro_tester is not None:
+                        registro_tester.fixture = self.id
+                    self._tester = tester
+                tester = self._tester
+        return tester
+
+    @property
+    def conectado(self):
+        ser = getattr(self._tester, "ser", None)
+        return ser is not None and ser.is_open
+
+    @property
+    def preparacion(self):
+        """SIN_PLACA, CONFIGURANDO o LISTO (un tester sin evento `configurada` está listo al conectar)."""
+        if not self.conectado:
+            return SIN_PLACA
+        configurada = getattr(self._tester, "configurada", None)
+        if configurada is not None and not configurada.is_set():
+            return CONFIGURANDO
+        return LISTO
+
+    def esperar_listo(self, timeout, pausa=0.05):
+        """Espera hasta `timeout` s a que el banco esté LISTO; devuelve el estado final."""
+        limite = time.monotonic() + timeout
+        estado = self.preparacion
+        while estado != LISTO and time.monotonic() < limite:
+            time.sleep(pausa)
+            estado = self.preparacion
+        return estado
+
+    def conectar(self, puerto):
+        self.puerto = puerto
+        self.tester.start(puerto)
+        return self.conectado
+
+    def desconectar(self):
+        if not self.creado:
+            return
+        try:
+            self.tester.stop()
+        except Exception as e:
+            log.error("Error deteniendo banco %s: %s", self.id, e, extra={"fixture": self.id})
+
+    def retirar(self):
+        """La placa se desconectó físicamente: aborta el ensayo en curso sin esperar timeouts."""
+        if not self.creado:
+            return
+        try:
+            self.tester.placa_retirada()
+        except Exception as e:
+            log.error("Error deteniendo banco %s: %s", self.id, e, extra={"fixture": self.id})
+
+    def estado(self):
+        return {
+            "id": self.id,
+            "puerto": self.puerto,
+            "conectado": self.conectado,
+            "preparacion": self.preparacion,
+            "ensayando": self.ensayo.locked(),
+            "msg_gui": getattr(self._tester, "msg_gui", ""),
+        }
+
+
+class FixtureRegistry:
+    """
+    Registro de bancos: un DZETester por placa ST-Link habilitada.
+
+    `fabrica(fixture_id)` crea un tester nuevo (DZETester o DZETesterAsync). Los bancos se
+    identifican por el número de serie de la placa, así el id no cambia aunque
+    cambie el puerto (/dev/ttyACMx, COMx) al reconectar.
+
+    Con `descubriendo=True` el registro informa DESCUBRIENDO hasta que se llama
+    a `fin_descubrimiento()` (al terminar el primer escaneo de placas).
+    """
+
+    def __init__(self, fabrica, seriales=None, descubriendo=False):
+        self._fabrica = fabrica
+        self.seriales = seriales if seriales is not None else seriales_permitidos()
+        self._fixtures = {}
+        self._lock = threading.Lock()
+        self._descubierto = threading.Event()
+        if not descubriendo:
+            self._descubierto.set()
+
+        # Los seriales explícitos tienen su banco desde el inicio (orden de la lista)
+        for serial in self.seriales:
+            if serial != "*":
+                self.asegurar(serial)
+
+    def asegurar(self, fixture_id):
+        """Devuelve el banco `fixture_id`, creándolo (sin conectar) si no existe."""
+        with self._lock:
+            fixture = self._fixtures.get(fixture_id)
+            if fixture is None:
+                fixture = Fixture(fixture_id, self._fabrica)
+                self._fixtures[fixture_id] = fixture
+            return fixture
+
+    def obtener(self, fixture_id):
+        with self._lock:
+            return self._fixtures.get(fixture_id)
+
+    def por_defecto(self):
+        """Primer banco registrado (el que atienden las rutas sin id de banco)."""
+        with self._lock:
+            return next(iter(self._fixtures.values()), None)
+
+    def todos(self):
+        with self._lock:
+            return list(self._fixtures.values())
+
+    def conectados(self):
+        return [f for f in self.todos() if f.conectado]
+
+    @property
+    def descubriendo(self):
+        return not self._descubierto.is_set()
+
+    def fin_descubrimiento(self):
+        self._descubierto.set()
+
+    def preparacion(self):
+        """
+        Estado del conjunto: LISTO si algún banco lo está, si no CONFIGURANDO si
+        alguno se configura, DESCUBRIENDO durante el primer escaneo y SIN_PLACA después.
+        """
+        estados = {f.preparacion for f in self.todos()}
+        for estado in (LISTO, CONFIGURANDO):
+            if estado in estados:
+                return estado
+        return DESCUBRIENDO if self.descubriendo else SIN_PLACA
+
+    def descubrir(self):
+        """Busca placas habilitadas y conecta las que no estén conectadas. Devuelve los bancos conectados ahora."""
+        nuevos = []
+        for serial, puerto in find_stlinks(self.seriales):
+            fixture = self.asegurar(serial)
+            if fixture.conectado:
+                continue
+            log.info("Placa %s encontrada en: %s", serial, puerto, extra={"fixture": serial})
+            if fixture.conectar(puerto):
+                nuevos.append(fixture)
+        return nuevos
+
+    def placa_conectada(self, serial, puerto, reintentos=20, pausa=0.05):
+        """
+        Evento de hot-plug: conecta el banco de `serial`. El nodo del puerto aparece
+        antes de que udev le ajuste los permisos, así que se reintenta unos instantes.
+        """
+        fixture = self.asegurar(serial)
+        if fixture.conectado and fixture.puerto == puerto:
+            return fixture
+        if fixture.conectado:
+            fixture.desconectar()
+        log.info("Placa %s conectada en: %s", serial, puerto, extra={"fixture": serial})
+        for _ in range(reintentos):
+            if fixture.conectar(puerto):
+                return fixture
+            time.sleep(pausa)
+        log.error("No se pudo abrir %s para la placa %s", puerto, serial, extra={"fixture": serial})
+        return None
+
+    def placa_retirada(self, serial):
+        """Evento de hot-plug: la placa de `serial` se desconectó."""
+        fixture = self.obtener(serial)
+        if fixture is not None and (fixture.conectado or fixture.ensayo.locked()):
+            fixture.retirar()
+
+    def detener_todos(self):
+        for fixture in self.todos():
+            fixture.desconectar()
+
+    def estado(self):
+        return [f.estado() for f in self.todos()]
@@ -0,0 +1,119 @@
+import re
+
+# ----------------------------
+# Cabeceras de tramas recibidas desde la placa DZE
+# ----------------------------
+# Las cabeceras son 4 bytes; interpretadas como uint32 little-endian,
+# los bits 4..15 codifican la cantidad de bytes que siguen a la cabecera.
+HEADER_ACK = bytes.fromhex("1a000020")        # Comando recibido OK (1a00002000)
+HEADER_ESTADO = bytes.fromhex("2a050040")     # Trama de estado (tensión de salida, etc.)
+HEADER_MUESTRAS = bytes.fromhex("a93f0050")   # Muestras de corriente Ia/Ib intercaladas
+
+HEADERS_CONOCIDOS = (HEADER_ACK, HEADER_ESTADO, HEADER_MUESTRAS)
+
+LARGO_HEADER = 4
+
+
+def longitud_trama(header):
+    """Devuelve la longitud total de la trama (cabecera incluida) codificada en `header`."""
+    valor = int.from_bytes(header[:LARGO_HEADER], "little")
+    return LARGO_HEADER + ((valor >> 4) & 0xFFF)
+
+
+class FrameParser:
+    """
+    Reensamblador incremental de tramas binarias.
+
+    Recibe bytes tal como llegan del puerto serie (en trozos arbitrarios) y
+    devuelve las tramas completas que contienen, sin pasar por hexadecimal.
+    - Acumula en un bytearray preasignado, compactando solo cuando hace falta.
+    - Determina el largo de cada trama a partir de su cabecera.
+    - Devuelve todas las tramas presentes en una misma lectura.
+    - Si encuentra basura, descarta bytes hasta la próxima cabecera conocida.
+    """
+
+    def __init__(self, headers=HEADERS_CONOCIDOS, capacidad=16384):
+        self._buf = bytearray(capacidad)
+        self._inicio = 0
+        self._fin = 0
+        self._patron = re.compile(b"|".join(re.escape(h) for h in headers))
+        self._longitudes = {h: longitud_trama(h) for h in headers}
+
+        # Contadores de diagnóstico
+        self.tramas = 0
+        self.bytes_descartados = 0
+        self.por_cabecera = dict.fromkeys(headers, 0)
+
+        # Posición absoluta en el flujo recibido: total de bytes entregados a feed(),
+        # posición del índice 0 del buffer y, por cada trama devuelta por el último
+        # feed(), la posición de su primer byte (usado por el grabador de capturas)
+        self.bytes_recibidos = 0
+        self._base = 0
+        self.posiciones = []
+
+    def reset(self):
+        """Descarta cualquier trama parcial pendiente."""
+        self._base += self._fin
+        self._inicio = 0
+        self._fin = 0
+
+    def pendientes(self):
+        """Cantidad de bytes acumulados que todavía no forman una trama completa."""
+        return self._fin - self._inicio
+
+    def _agregar(self, datos):
+        n = len(datos)
+        if self._fin + n > len(self._buf):
+            # Compactar: mover lo pendiente al principio del buffer
+            pendiente = self._fin - self._inicio
+            self._buf[0:pendiente] = self._buf[self._inicio:self._fin]
+            self._base += self._inicio
+            self._inicio = 0
+            self._fin = pendiente
+            if pendiente + n > len(self._buf):
+                self._buf.extend(bytes(pendiente + n - len(self._buf)))
+        self._buf[self._fin:self._fin + n] = datos
+        self._fin += n
+
+    def feed(self, datos):
+        """
+        Agrega `datos` al buffer y devuelve una lista de tuplas (header, trama)
+        con las tramas completas encontradas. `trama` incluye la cabecera.
+        """
+        if datos:
+            self._agregar(datos)
+            self.bytes_recibidos += len(datos)
+
+        tramas = []
+        posiciones = []
+        buf = self._buf
+        while self._fin - self._inicio >= LARGO_HEADER:
+            m = self._patron.search(buf, self._inicio, self._fin)
+            if m is None:
+                # Conservar los últimos bytes por si son una cabecera partida
+                resto = LARGO_HEADER - 1
+                self.bytes_descartados += self._fin - self._inicio - resto
+                self._inicio = self._fin - resto
+                break
+
+            if m.start() != self._inicio:
+                # Resincronización: descartar basura previa a la cabecera
+                self.bytes_descartados += m.start() - self._inicio
+                self._inicio = m.start()
+
+            header = m.group(0)
+            largo = self._longitudes[header]
+            if self._fin - self._inicio < largo:
+                break  # trama incompleta, esperar más datos
+
+            tramas.append((header, bytes(buf[self._inicio:self._inicio + largo])))
+            posiciones.append(self._base + self._inicio)
+            self._inicio += largo
+            self.tramas += 1
+            self.por_cabecera[header] += 1
+
+        if self._inicio == self._fin:
+            self._base += self._fin
+            self._inicio = self._fin = 0
+        self.posiciones = posiciones
+        return tramas
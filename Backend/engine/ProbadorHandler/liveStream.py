@@ -0,0 +1,160 @@
+import json
+import threading
+import time
+from collections import deque
+
+# ----------------------------
+# Mediciones en vivo por Server-Sent Events
+# ----------------------------
+# Un productor por banco toma la última medición publicada (corrientes, tensión,
+# etapa del ensayo, msg_gui) a PERIODO_PRODUCTOR, la serializa una sola vez y la
+# reparte a todos los clientes. El hilo RX no se entera: la decimación es tomar
+# la instantánea más reciente, no procesar cada trama.
+
+PERIODO_PRODUCTOR = 0.05    # 20 Hz como máximo
+HZ_POR_DEFECTO = 5.0
+COLA_CLIENTE = 32           # eventos pendientes por cliente; si se llena se descarta el más viejo
+PING_SSE = 15.0             # comentario de keep-alive para proxies y navegadores
+REINTENTO_SSE_MS = 2000
+
+
+class SuscripcionEnVivo:
+    """
+    Cola de un cliente. El productor le entrega como mucho un evento cada
+    `intervalo` segundos (decimación); si el cliente no consume, la deque con
+    `maxlen` descarta el más viejo (drop-oldest) y el productor nunca se bloquea.
+    """
+
+    def __init__(self, intervalo, capacidad=COLA_CLIENTE, tolerancia=PERIODO_PRODUCTOR / 2):
+        self.intervalo = intervalo
+        self._tolerancia = tolerancia
+        self._proximo = 0.0
+        self._cola = deque(maxlen=capacidad)
+        self._hay = threading.Event()
+        self.descartados = 0
+
+    def entregar(self, evento, ahora):
+        """Lo llama solo el hilo productor."""
+        if ahora + self._tolerancia < self._proximo:
+            return
+        self._proximo = max(self._proximo + self.intervalo, ahora)
+        if len(self._cola) == self._cola.maxlen:
+            self.descartados += 1
+        self._cola.append(evento)
+        self._hay.set()
+
+    def proximo(self, timeout):
+        """Devuelve el próximo evento o None si vence `timeout`."""
+        self._hay.clear()
+        if not self._cola:
+            self._hay.wait(timeout)
+        try:
+            return self._cola.popleft()
+        except IndexError:
+            return None
+
+
+class DifusorEnVivo:
+    """Productor único de mediciones de un banco; el hilo vive mientras haya suscriptores."""
+
+    def __init__(self, fixture, periodo=PERIODO_PRODUCTOR):
+        self.fixture = fixture
+        self.periodo = periodo
+        self._suscripciones = []
+        self._lock = threading.Lock()
+        self._hilo = None
+        self.eventos = 0
+
+    @property
+    def clientes(self):
+        return len(self._suscripciones)
+
+    @property
+    def descartados(self):
+        return sum(s.descartados for s in list(self._suscripciones))
+
+    def suscribir(self, hz=HZ_POR_DEFECTO):
+        """Nueva suscripción a `hz` eventos por segundo como máximo (decimación sobre el productor)."""
+        suscripcion = SuscripcionEnVivo(1.0 / max(hz, 0.01), tolerancia=self.periodo / 2)
+        with self._lock:
+            # Copia nueva en cada alta/baja: el productor itera sin tomar el lock
+            self._suscripciones = self._suscripciones + [suscripcion]
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._producir, daemon=True)
+                self._hilo.start()
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            self._suscripciones = [s for s in self._suscripciones if s is not suscripcion]
+
+    def instantanea(self):
+        """Estado actual del banco como dict serializable."""
+        tester = self.fixture.tester
+        corrientes = tester.corrientes.actual
+        tension = tester.lecturas_tension.actual
+        evento = {
+            "fixture": self.fixture.id,
+            "t": round(time.time(), 3),
+            "estado": tester.EstadoEnsayo,
+            "etapa": tester.traza.etapa_actual,
+            "msg_gui": tester.msg_gui,
+            "TensionSalida": round(tension.TensionSalida, 3) if tension else None,
+        }
+        if corrientes is not None:
+            evento["seq"] = corrientes.seq
+            for campo in ("IaRMS", "IbRMS", "IcRMS", "IaAVG", "IbAVG", "IcAVG"):
+                evento[campo] = round(float(getattr(corrientes, campo)), 1)
+        return evento
+
+    def _producir(self):
+        proximo = time.monotonic()
+        while True:
+            suscripciones = self._suscripciones
+            if not suscripciones:
+                with self._lock:
+                    if not self._suscripciones:
+                        self._hilo = None
+                        return
+                continue
+            ahora = time.monotonic()
+            mensaje = f"data: {json.dumps(self.instantanea())}\n\n"
+            self.eventos += 1
+            for suscripcion in suscripciones:
+                suscripcion.entregar(mensaje, ahora)
+            # Período fijo aunque la instantánea demore
+            proximo = max(proximo + self.periodo, ahora)
+            time.sleep(max(0.0, proximo - time.monotonic()))
+
+
+class DifusoresEnVivo:
+    """Un DifusorEnVivo por banco del FixtureRegistry, creado al conectarse el primer cliente."""
+
+    def __init__(self, fixtures, periodo=PERIODO_PRODUCTOR):
+        self.fixtures = fixtures
+        self.periodo = periodo
+        self._difusores = {}
+        self._lock = threading.Lock()
+
+    def para(self, fixture):
+        with self._lock:
+            difusor = self._difusores.get(fixture.id)
+            if difusor is None:
+                difusor = self._difusores[fixture.id] = DifusorEnVivo(fixture, self.periodo)
+            return difusor
+
+    def obtener(self, fixture_id):
+        with self._lock:
+            return self._difusores.get(fixture_id)
+
+
+def flujo_sse(difusor, hz=HZ_POR_DEFECTO, ping=PING_SSE):
+    """Generador de la respuesta text/event-stream de un cliente; se desuscribe al cortarse la conexión."""
+    suscripcion = difusor.suscribir(hz)
+    try:
+        yield f"retry: {REINTENTO_SSE_MS}\n\n"
+        while True:
+            evento = suscripcion.proximo(ping)
+            yield evento if evento is not None else ": ping\n\n"
+    finally:
+        difusor.desuscribir(suscripcion)
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+# Entradas que conserva el anillo (las más viejas se descartan: memoria constante)
+CAPACIDAD_LOG = 2000
+# Máximo de entradas por respuesta y de espera de un long-poll
+LIMITE_RESPUESTA = 500
+ESPERA_MAXIMA_LOG = 30.0
+
+
+class AnilloLog:
+    """
+    Registro de eventos de capacidad fija con números de secuencia crecientes.
+
+    Cada entrada recibe un `seq` consecutivo (empieza en 1). Los lectores piden
+    `desde(seq)` con el último que vieron y reciben solo lo nuevo; si el anillo
+    ya descartó entradas que no llegaron a leer, se informa cuántas (`perdidas`).
+    `esperar(seq, timeout)` permite el long-poll: bloquea hasta que haya algo
+    posterior a `seq`.
+    """
+
+    def __init__(self, capacidad=CAPACIDAD_LOG):
+        self._entradas = deque(maxlen=capacidad)
+        self._cond = threading.Condition()
+        self.ultimo = 0
+
+    def agregar(self, mensaje, nivel="info", fuente=None):
+        """Agrega una entrada y devuelve su seq."""
+        with self._cond:
+            self.ultimo += 1
+            self._entradas.append({
+                "seq": self.ultimo,
+                "t": time.time(),
+                "nivel": nivel,
+                "fuente": fuente,
+                "mensaje": str(mensaje),
+            })
+            self._cond.notify_all()
+            return self.ultimo
+
+    # Compatibilidad con el log_buffer = [] anterior
+    append = agregar
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def desde(self, seq=0, limite=LIMITE_RESPUESTA):
+        """
+        Devuelve (entradas, perdidas): hasta `limite` entradas con seq > `seq`, en
+        orden, y cuántas posteriores a `seq` ya no están en el anillo.
+        Con `seq` None devuelve las últimas `limite`.
+        """
+        with self._cond:
+            if seq is not None and seq > self.ultimo:
+                seq = 0     # cursor de una ejecución anterior del servidor: desde el principio
+            if not self._entradas:
+                return [], 0
+            primero = self._entradas[0]["seq"]
+            if seq is None:
+                inicio = max(0, len(self._entradas) - limite)
+                perdidas = 0
+            else:
+                inicio = max(0, seq + 1 - primero)
+                perdidas = max(0, primero - seq - 1)
+            return list(islice(self._entradas, inicio, inicio + limite)), perdidas
+
+    def esperar(self, seq, timeout):
+        """Bloquea hasta que haya entradas posteriores a `seq` o venza `timeout`. Devuelve True si las hay."""
+        with self._cond:
+            # Un cursor mayor que el último (servidor reiniciado) no espera: desde() lo reinicia
+            return self._cond.wait_for(lambda: self.ultimo != seq, min(timeout, ESPERA_MAXIMA_LOG))
@@ -1,9 +1,26 @@
-import os, struct, time, random, threading, serial, asyncio, time, json
-import matplotlib.pyplot as plt
-from collections import deque
+import struct, time, threading, serial
 import numpy as np
 
-from concurrent.futures import ThreadPoolExecutor
+from engine.ProbadorHandler.frameParser import FrameParser, HEADER_ACK, HEADER_ESTADO, HEADER_MUESTRAS
+from engine.ProbadorHandler.sampleDecoder import SampleDecoder
+from engine.ProbadorHandler.sampleRing import SampleRing, ValueRing
+from engine.ProbadorHandler.captureRecorder import CaptureRecorder
+from engine.ProbadorHandler.measurementSnapshot import (
+    CanalMediciones, MedicionCorrientes, MedicionTension, promediar,
+    TRAMAS_POR_MEDICION, LECTURAS_TENSION,
+)
+from engine.ProbadorHandler.steadyState import (
+    DetectorEstabilidad, esperar_estabilidad, CAMPOS_CORRIENTES, CAMPOS_TENSION,
+)
+from engine.ProbadorHandler.serialReader import SerialReader, MODO_BLOQUEANTE, PlacaDesconectada
+from engine.ProbadorHandler.txScheduler import TXScheduler, PRIORIDAD_ENSAYO, PRIORIDAD_KEEP_ALIVE
+from engine.ProbadorHandler.ackTracker import ACKTracker, esperar_ack
+from engine.ProbadorHandler.virtualClock import RELOJ_REAL
+from engine.ProbadorHandler.engineMetrics import MetricasTester
+from engine.ProbadorHandler.eventLog import RegistroTester
+from engine.ProbadorHandler.stageTrace import (
+    TrazaEnsayo, TRAZA_INACTIVA, CATEGORIA_RAMPA, CATEGORIA_ASENTAMIENTO,
+)
 
 # from engine.serialUtils.SerialFinder import find_stlink
 
@@ -19,19 +36,27 @@ COLOR_AMARILLO = '\033[33m'
 #Puerto serie Localizado dinamicamente
 BAUD_RATE = 1843200
 
+# Sondeo de la placa recién enchufada (reemplaza la espera fija de 1 s) y
+# espera máxima del keep-alive a que termine la configuración
+ESPERA_ARRANQUE_PLACA = 1.0
+INTERVALO_SONDEO_PLACA = 0.1
+ESPERA_KEEP_ALIVE = 2.0
+
 # ----------------------------
 # Simulated Serial Interface
 # ----------------------------
 class DZETester:
-    def __init__(self):
+    def __init__(self, reloj=RELOJ_REAL):
+        # Fuente de tiempo y esperas (RelojVirtual para correr el ensayo simulado, ver virtualRunner)
+        self.reloj = reloj
         self.running = False
         self.condition = threading.Condition()
+        self.PuertoSerie = None
+        self.ser = None
 
-        self.hilo_enviar = threading.Thread(target=self.keep_alive_status)
-        self.hilo_recibir = threading.Thread(target=self.recibir_datos)
-
-        self.hilo_enviar.daemon = True
-        self.hilo_recibir.daemon = True
+        # Se crean en cada start(): un hilo solo puede iniciarse una vez
+        self.hilo_enviar = None
+        self.hilo_recibir = None
 
         self.TensionSalida = 0.0
         self.TensionSalidaMedia = 0.0
@@ -54,20 +79,60 @@ class DZETester:
         self.DispositivoFaseB = 0
         self.DispositivoFaseC = 0
 
-        # Create a fixed-length deque of size 50 to store the data points
-        self.data_points = deque(maxlen=50)
-        self.fig, self.ax = plt.subplots()
-        self.line = self.ax.plot([])
+        # Historial de muestras por fase y de tensión de salida (preasignado)
+        self.muestras = SampleRing()
+        self.tensiones = ValueRing()
+
+        # Última medición publicada por el hilo RX (objeto inmutable, se reemplaza entero)
+        self.corrientes = CanalMediciones(reloj=reloj)
+        self.lecturas_tension = CanalMediciones(reloj=reloj)
+
+        # Reensamblador de tramas del puerto serie
+        self.parser = FrameParser()
+        self.decoder = SampleDecoder()
+        self.modo_lectura = MODO_BLOQUEANTE   # "bloqueante" o "selector" (Linux)
+
+        # Escritor único del puerto (prioridades + coalescencia de setpoints)
+        # y correlación de comandos con su ACK (1a00002000)
+        self.acks = ACKTracker(reloj)
+        self.tx = TXScheduler(self._escribir, acks=self.acks, reloj=reloj)
+
+        # True si la placa fue retirada (hot-plug) hasta el próximo start()
+        self.retirada = False
+        # Placa configurada y lista para ensayar
+        self.configurada = threading.Event()
+
+        # Grabador opcional de capturas crudas (iniciar_grabacion)
+        self.grabador = None
 
         self.resultados = {}
+
+        # Tramos temporizados del ensayo en curso (etapas, rampas, ventanas); ver stageTrace
+        self.traza = TRAZA_INACTIVA
+
+        # Registro de eventos no bloqueante (banco, etapa, comando); ver eventLog
+        self.log = RegistroTester(self)
+
+        # Contadores para /metrics (un hilo escritor por contador, sin locks; ver engineMetrics)
+        self.metricas = MetricasTester()
     
     def start(self, PuertoSerie):
+        self.PuertoSerie = PuertoSerie
         try:
             self.ser = serial.Serial(PuertoSerie, BAUD_RATE, timeout=2, write_timeout=2)
-            time.sleep(1)
-            print(f"Puerto serie {PuertoSerie} abierto a {BAUD_RATE} bps.")
+            self.parser.reset()
+            self.muestras.reset()
+            self.tensiones.reset()
+            self.corrientes.reset()
+            self.lecturas_tension.reset()
+            self.retirada = False
+            self.configurada.clear()
+            self.log.info("Puerto serie %s abierto a %d bps.", PuertoSerie, BAUD_RATE)
+            self.hilo_recibir = threading.Thread(target=self.recibir_datos, daemon=True)
+            self.hilo_enviar = threading.Thread(target=self.keep_alive_status, daemon=True)
             self.hilo_recibir.start()
             self.running = True
+            self.tx.start()
             self.configurar_placa()
             self.hilo_enviar.start()
 
@@ -75,15 +140,74 @@ class DZETester:
             # self.hilo_recibir.join()
 
         except serial.SerialException as e:
-            print(f"Error abriendo puerto serie: {e}")
+            self.log.error("Error abriendo puerto serie: %s", e)
             self.ser = None
 
     def stop(self):
         self.running = False
+        self.configurada.clear()
+        self.tx.stop()
+        self.acks.cancelar_todos()
+        try:
+            if self.ser and self.ser.is_open:
+                self.ser.close()
+        except Exception as e:
+            self.log.error("Error cerrando puerto serie: %s", e)
+
+        # El RX termina al cerrarse el puerto y el keep-alive al bajar `running`
+        for hilo in (self.hilo_enviar, self.hilo_recibir):
+            if hilo is not None and hilo.is_alive() and hilo is not threading.current_thread():
+                hilo.join(timeout=1)
+
+
+    def placa_retirada(self):
+        """
+        Aviso de hot-plug: la placa se desconectó. Aborta el ensayo en curso (los
+        ACK pendientes resuelven False, las esperas de mediciones se liberan y el
+        próximo send lanza PlacaDesconectada) y libera el puerto.
+        """
+        self.log.warning("Placa retirada de %s", self.PuertoSerie)
+        self.retirada = True
+        if self.EstadoEnsayo == 1:
+            self.EstadoEnsayo = 3
+            self.msg_gui = "Placa desconectada durante el ensayo."
+        self.corrientes.cerrar()
+        self.lecturas_tension.cerrar()
+        self.stop()
 
-    def send(self, cmd, description="", retries=10, retry_delay=0.2):
+    def send(self, cmd, description="", prioridad=PRIORIDAD_ENSAYO, clave=None, esperar=True,
+             ack=False, ack_timeout=1.0):
+        """
+        Encola un comando en el escritor TX.
+        Con `ack` devuelve de inmediato un Future que resuelve True al recibir el ACK
+        de la placa (usar con esperar_ack(futuro, timeout)).
+        Con `esperar` bloquea hasta que el comando sale por el puerto y devuelve True/False;
+        si no, devuelve el ComandoTX encolado. Comandos con la misma `clave` pendientes
+        se coalescen (se envía solo el último valor).
         """
-        Envía un comando por puerto serie con reintentos automáticos.
+        if self.retirada:
+            raise PlacaDesconectada(f"Placa retirada de {self.PuertoSerie}")
+        futuro = self.acks.nuevo_futuro() if ack else None
+        comando = self.tx.encolar(cmd, description, prioridad, clave, futuro, ack_timeout)
+        if ack:
+            return futuro       # propio aunque el comando se haya coalescido con uno previo
+        if esperar:
+            return comando.esperar(timeout=5)
+        return comando
+
+    def estadisticas_tx(self):
+        """Profundidad de cola, coalescencias y latencia encolado→puerto por tipo de comando."""
+        return {
+            "en_cola": len(self.tx.cola),
+            "coalescidos": self.tx.cola.coalescidos,
+            "enviados": self.tx.stats.enviados,
+            "fallidos": self.tx.stats.fallidos,
+            "latencias": self.tx.stats.resumen(),
+        }
+
+    def _escribir(self, cmd, description="", retries=10, retry_delay=0.2):
+        """
+        Envía un comando por puerto serie con reintentos automáticos (lo llama solo el hilo escritor TX).
         Si ocurre un Write Timeout o el puerto está cerrado, reintenta hasta `retries` veces.
         """
 
@@ -92,53 +216,74 @@ class DZETester:
         reintento_exitoso = False  # flag para detectar si se logró en un intento posterior
 
         for intento in range(1, retries + 1):
+            if intento > 1:
+                self.metricas.reintentos_tx += 1
             try:
                 if self.ser is None or not self.ser.is_open:
-                    print("Error: puerto serie no inicializado o cerrado.")
-                    return
+                    self.log.error("Error: puerto serie no inicializado o cerrado.")
+                    return False
 
                 # Verificar si el puerto sigue abierto
                 if not self.ser.is_open:
-                    print(f"{COLOR_ROJO}[WARN] Puerto serie cerrado. Reabriendo...{COLOR_RESET}")
+                    self.log.warning("Puerto serie cerrado. Reabriendo...")
                     try:
                         self.ser.open()
-                        time.sleep(0.1)
+                        self.reloj.sleep(0.1)
                     except Exception as e:
-                        print(f"{COLOR_ROJO}Error al reabrir puerto: {e}{COLOR_RESET}")
+                        self.log.error("Error al reabrir puerto: %s", e)
                         continue  # Reintentar en la próxima iteración
 
                 # Enviar datos
                 try:
                     self.ser.flush()
                     self.ser.write(data_part1)
-                    time.sleep(0.002)
+                    self.reloj.sleep(0.002)
                     self.ser.write(data_part2)
+                    if self.grabador is not None:
+                        self.grabador.tx(data_part1 + data_part2)
 
                 except serial.SerialException as e:
-                    print(f"Error enviando datos: {e}")
+                    self.log.error("Error enviando datos: %s", e, extra={"comando": description, "payload": cmd})
                 
 
-                # Mostrar solo si no es mensaje NP:
+                # Registrar solo si no es mensaje NP:
                 if not description.startswith("NP:"):
                     if intento == 1:
-                        print(f"{COLOR_AZUL}TX: {description} : ({cmd}){COLOR_RESET}")
+                        self.log.tx(description, cmd)
                     else:
-                        print(f"{COLOR_VERDE}Reintento exitoso ({intento}/{retries}) → {description}{COLOR_RESET}")
+                        self.log.color(COLOR_VERDE, "Reintento exitoso (%d/%d) → %s", intento, retries, description)
 
                 return True  # envío exitoso, salgo de la función
 
             except serial.SerialTimeoutException:
-                print(f"{COLOR_ROJO}Write timeout (intento {intento}/{retries}){COLOR_RESET}")
+                self.log.warning("Write timeout (intento %d/%d)", intento, retries,
+                                 extra={"comando": description, "payload": cmd})
 
             except serial.SerialException as e:
-                print(f"{COLOR_ROJO}Error al enviar datos (intento {intento}/{retries}): {e}{COLOR_RESET}")
+                self.log.warning("Error al enviar datos (intento %d/%d): %s", intento, retries, e,
+                                 extra={"comando": description, "payload": cmd})
 
             # Esperar antes de reintentar
-            time.sleep(retry_delay)
+            self.reloj.sleep(retry_delay)
 
-        print(f"{COLOR_ROJO}Fallo al enviar comando tras {retries} intentos: {cmd}{COLOR_RESET}")
+        self.log.error("Fallo al enviar comando tras %d intentos: %s", retries, cmd,
+                       extra={"comando": description, "payload": cmd})
         return False
 
+    def esperar_placa(self, mensaje, timeout=ESPERA_ARRANQUE_PLACA, intervalo=INTERVALO_SONDEO_PLACA):
+        """Reenvía `mensaje` hasta que la placa lo confirma con ACK; False si vence `timeout`."""
+        limite = self.reloj.monotonic() + timeout
+        intentos = 0
+        while True:
+            restante = limite - self.reloj.monotonic()
+            if restante <= 0:
+                return False
+            if intentos:
+                self.metricas.reintentos_tx += 1
+            intentos += 1
+            if esperar_ack(self.send(mensaje, "NP:Configuración placa", ack=True), min(intervalo, restante)):
+                return True
+
     def configurar_placa(self):
         i=0
         
@@ -159,141 +304,216 @@ class DZETester:
                     "D900004008002905070000040000FF0000"]
         
         with self.condition:
+            # Placa recién enchufada: se sondea con el primer mensaje en lugar de la espera fija
+            if self.esperar_placa(mensajes[0]):
+                self.log.debug("Enviado: %s", mensajes[0], extra={"payload": mensajes[0], "color": COLOR_AZUL})
+                i = 1
 
             while i < len(mensajes):
                 
                 if self.ser is None or not self.ser.is_open:
-                    print("Error: puerto serie no inicializado o cerrado.")
+                    self.log.error("Error: puerto serie no inicializado o cerrado.")
                     return
 
-                try:
-                    self.ser.flush()
-                    self.ser.write( bytes.fromhex(mensajes[i][0:8]))
-                    time.sleep(0.002)
-                    self.ser.write( bytes.fromhex(mensajes[i][8:]))
-
-                    print(f"{COLOR_AZUL}Enviado: {mensajes[i]}{COLOR_RESET}")
-                except serial.SerialException as e:
-                    print(f"Error al enviar datos: {e}")
-                    break
-                time.sleep(0.1)
+                # Se avanza al recibir el ACK; 100 ms como máximo (delay anterior entre comandos)
+                if esperar_ack(self.send(mensajes[i], "NP:Configuración placa", ack=True), 0.1):
+                    self.log.debug("Enviado: %s", mensajes[i], extra={"payload": mensajes[i], "color": COLOR_AZUL})
+                else:
+                    self.log.warning("Enviado (sin ACK): %s", mensajes[i], extra={"payload": mensajes[i]})
                 i += 1
-            print(f"{COLOR_AZUL}Enviado: PLACA CONECTADA {COLOR_RESET}")
+            self.log.color(COLOR_AZUL, "Enviado: PLACA CONECTADA")
             self.msg_gui = "Placa configurada y conectada."
+            self.configurada.set()
             self.condition.notify_all()      #comienzo a enviar datos
 
     def keep_alive_status(self):
-        time.sleep(2)  # Espera inicial antes de comenzar el keep-alive
+        self.configurada.wait(ESPERA_KEEP_ALIVE)  # Espera inicial antes de comenzar el keep-alive
         mensaje = "A9040070110019005900591B9900D90019019102D10251099101D101911451149100D1009109D1081109D105910551039103910451041119D118910B510BD10B110C510C910CD11A49008900C900"
-        with self.condition:
-            #self.condition.wait()  # Espera hasta que la placa esté configurada - se traba, resuelto con sleep
-            while True:
-                self.send(mensaje, "NP:Lectura status")
-                time.sleep(0.2)
+        # Sin tomar self.condition: la configuración de un start() posterior la necesita
+        while self.running:
+            self.send(mensaje, "NP:Lectura status",
+                      prioridad=PRIORIDAD_KEEP_ALIVE, clave="keep_alive", esperar=False)
+            self.reloj.sleep(0.2)
 
-    def SetearCorrienteCarga(self, corriente):              
+    def SetearCorrienteCarga(self, corriente, ack=False):              
         self.CorrienteCarga = corriente/1000.0  # Convertir mA a A
         mensaje_base = "6900000008009100"  
         porcentaje_hex = struct.pack('<h', corriente).hex()
         msj = mensaje_base + porcentaje_hex
         #print(f"{COLOR_MAGENTA}Seteando Corriente de Carga a {corriente} mA ({msj})")
-        self.send(msj, f"NP:Seteo Corriente de Carga a {corriente} mA")
+        return self.send(msj, f"NP:Seteo Corriente de Carga a {corriente} mA", clave="corriente_carga", esperar=False, ack=ack)
 
-    def SetearCorrientePruebaRegParalelo(self, corriente):              #0x69000000080091095302 
+    def SetearCorrientePruebaRegParalelo(self, corriente, ack=False):              #0x69000000080091095302 
         self.CorrienteEnsayo = corriente/1000.0  # Convertir mA a A
         corriente = int(corriente/0.0006715014773/1000)
         mensaje_base = "6900000008009109"  
         porcentaje_hex = struct.pack('<h', corriente).hex()
         msj = mensaje_base + porcentaje_hex
-        self.send(msj, f"NP:Seteo Corriente de ensayo a {corriente}")
+        return self.send(msj, f"NP:Seteo Corriente de ensayo a {corriente}", clave="corriente_ensayo", esperar=False, ack=ack)
 
     # Tension porcentual de la tension de entrada
-    def SetearTensionPruebaRegSerie(self, tension_porcentual):              #0x690000000800D11A0000 
+    def SetearTensionPruebaRegSerie(self, tension_porcentual, ack=False):              #0x690000000800D11A0000 
         self.TensionEnsayo = tension_porcentual*24/100
         mensaje_base = "6900000008009109"  
         porcentaje_hex = struct.pack('<h', tension_porcentual).hex()
         msj = mensaje_base + porcentaje_hex
-        self.send(msj, f"NP:Seteo Tension de ensayo a {tension_porcentual}")
+        return self.send(msj, f"NP:Seteo Tension de ensayo a {tension_porcentual}", clave="corriente_ensayo", esperar=False, ack=ack)
 
     def hex_to_int16_array(self,hex_str):
-        import struct
-        hex_str_data = hex_str[16::]         
-            # 0x2FCF3F01  (20959023)
-            # 0xE93F00B0 0x4C1BBE00  (12458828)
-        if len(hex_str_data) % 4 == 0:
-            chunks = [hex_str_data[i:i+4] for i in range(0, len(hex_str_data), 4)]
-            int16_array = np.array([], dtype=np.int16)
-            for chunk in chunks:
-                byte_data = bytes.fromhex(chunk)
-                value = struct.unpack('<h', byte_data)[0]
-                int16_array = np.append(int16_array, value)
-
-            ia_array =  np.array([], dtype=np.int16)
-            ib_array =  np.array([], dtype=np.int16)  
-            ic_array =  np.array([], dtype=np.int16)
-            for i in range(len(int16_array)//2):
-                ia_array = np.append(ia_array, int16_array[i*2])
-                ib_array = np.append(ib_array, int16_array[i*2+1])
-            # ia+ib+ic=0 -> ic = - (ia + ib)
-            ic_array = - (ia_array + ib_array)
-
-            return [ia_array, ib_array, ic_array]
-        return [0,0,0]
+        """Compatibilidad: decodifica una trama a93f0050 en hexadecimal a [Ia, Ib, Ic]."""
+        fases = self.decoder.decodificar(bytes.fromhex(hex_str))
+        if fases is None:
+            return [0,0,0]
+        return list(fases)
 
     def recibir_datos(self):
-        cmd = ""
-        while True:
-            try:
-                if self.ser is None or not self.ser.is_open:
-                    print("Error: puerto serie no inicializado o cerrado.")
-                    return
+        lector = SerialReader(self.ser, modo=self.modo_lectura)
+        try:
+            while True:
+                try:
+                    if self.ser is None or not self.ser.is_open:
+                        self.log.error("Error: puerto serie no inicializado o cerrado.")
+                        return
 
-                if self.ser.in_waiting > 0:
-                    datos_recibidos = self.ser.read(self.ser.in_waiting)
-                    #print(datos_recibidos)
-
-                    # Convierte los bytes recibidos a una cadena hexadecimal
-                    hex_representation = datos_recibidos.hex()
-                    
-                    #if(hex_representation == "1a00002000"):            #Comando recibido OK
-                    #   print(f"{COLOR_ROJO}RX: Comando recibido OK! - ({hex_representation})")
-
-                    if(hex_representation.startswith("2a050040")):  
-                        byte_data = bytes.fromhex(hex_representation[88:92])
-                        if(len(byte_data) >= 2):
-                            tension_mV = struct.unpack('<h', byte_data)[0]
-                            self.TensionSalida = tension_mV / 1000.0 *14.7 / 15.0 # Convertir mV a V
-                            self.TensionSalidaMedia = self.TensionSalidaMedia + ( self.TensionSalida - self.TensionSalidaMedia ) * 0.1      #filtro FIR 1er orden
-                            #print(f"{COLOR_ROJO}RX: TENSION {self.TensionSalida} ")
-
-                    # print("DATOS BRUTOS:", hex_representation)
-                    #A93F0050F27142015E032000FE0290FF8E02C0FF8E0290FF5E02B0FFEE01F0FF5E02B0FF1E02E0FF10016E00B0005E0040005E00D0FF3E00D0013E002004BEFF20051E00A0FA7E05F0043E0002052E00A2032E0012025E004200BEFFA2FE2E0032FD4E0082FB3E00F2F94E00C2F72E0042F93E00C2FAA0FF82FBA0FF32FC90FFB2FC90FF22FD70FF02FDB0FF32FDE0FF62FDE0FFF001D2FD500172FE30FFC2FF80FF0200C0FF1200E0FD0200A0FC0200F0FBF2FFDEFC02007EFDE2FF5EFEF2FFBEFFE2FFEE003200EE01F2FF9E0202000E05D2FFCE06E2FFCE05F2FF2E00B2FB7E0300006E03C0FF2E034000DE02B0FFDE02A0FFCE0280FF7E02E0FF8E0280FF70015E003001DEFF20005E00A0FF5E00E0FF3E0080013E00D0022E0060033E0080FC7E0320FD0E0352022E0062011E00C2FF4E0042FE3E00E2FC1E0042FB4E0042F91E0022F83E0092F92E00C2FAC0FFA2FBA0FF72FC80FFB2FCC0FFF2FC90FF02FDF0FF52FDC0FFD2FCD000800132FE1001C2FE30FFF2FFE0FFF2FF20FEF2FF80FCF2FF20FB120010FBF2FF3EFC1200FEFC22001EFE12009EFF2200CE00F2FFCE02E2FF6E0302002E05F2FFCE06D2FFDE05E2FFFEFFB2FB7E03E0FF5E03D0FF3E0390FFEE02D0FFCE02C0FFBE02A0FF6E02E0FF4E0280FF40014E00E0003E0040003E00C0FF4E00C0014E0060032E0030043E0000FBFE04D004BEFF32043E00C2022E0032012E00B2FF3E0012FE3E0072FC1E00E2FABEFFF2F81E00D2F84E00C2F93E0012FB70FFC2FBD0FF42FCC0FFA2FC30FFE2FCA0FF02FDD0FF42FDD0FF92FDB00040FEF2FFD0FEF2FFF0FEE2FFF0FFF2FF20FE1200B0FCF2FFB0FBF2FF50FB12007EFCF2FF4EFDF2FF6EFE1200EEFFF2FF3E0102006E024200EE03F2FFAE05C2FF6E06D2FF3E05E2FFDE0320003E03C0FF7E0240009E0290FF8E02B0FF5E02E0FF6E02A0FF4E02C0FF0E02B0FFD0FF5E0080003E00E0FF7E00D0FF4E00A0014E0020033E0010043E00B0FB8E0430042E00A2033E0062022E00B2001E0022FF1E00B2FD2E00D2FC1E00D2FA0E00D2F83E00C2F83E0012FA3E0032FBC0FFF2FB90FF92FC90FFC2FCC0FFF2FCE0FF32FDC0FF72FDC0FFB2FD200080FEE2FF00FFF2FFA0FF02000000F2FF30FE0200C0FCF2FFE0FBF2FFB0FB0200CEFCF2FFAEFD0200EEFE32005E00E2FF8E01E2FFCE0202004E04F2FF6E0502008E06D2FFFE04D2FF8E033000AE0350FFAE02E0FF6E02D0FF7E02D0FF8E02B0FF5E02B0FF6E0280FFE001DEFFF0004E0080003E00E0FF3E00C0FF3E00C0013E00E0023E00A0031E00D0FB5E04A0034E0042033E00E2013E0042004E00D2FE3E0072FD3E00F2FB6E0002FA4E0042F82E00C2F83E0082FA90FF72FB90FF82FC20FF72FCC0FFC2FCB0FF02FDB0FF02FDD0FF62FDC0FF0002D2FD0002D2FDC0FEE2FF0300
-                    if(hex_representation.startswith("a93f0050")):
-                        
-                        [ia_array, ib_array, ic_array] = self.hex_to_int16_array(hex_representation)
-
-                        if type(ia_array) == int:
-                            continue
-
-                        self.IaRMS = np.sqrt(np.mean(np.square(ia_array)))
-                        self.IbRMS = np.sqrt(np.mean(np.square(ib_array)))
-                        self.IcRMS = np.sqrt(np.mean(np.square(ic_array)))
-
-                        #print(f"RMS: IaRMS {self.IaRMS:5.1f} - IbRMS {self.IbRMS:5.1f} - IcRMS {self.IcRMS:5.1f}")
-                        #print("DATOS BRUTOS:", hex_representation)
-
-                        self.IaAVG = np.mean(ia_array)
-                        self.IbAVG = np.mean(ib_array)
-                        self.IcAVG = np.mean(ic_array)
-                        #print("Average: Iavg", self.IaAVG," - Iavg" ,self.IbAVG," - Iavg", self.IcAVG)
+                    # Bloquea hasta que llegan datos (o vence el timeout del lector)
+                    datos_recibidos = lector.leer()
+                    if not datos_recibidos:
+                        continue
+                    t_rx = self.reloj.monotonic()
 
-            except serial.SerialException as e:
-                print(f"Error al recibir datos: {e}")
-                break
-            time.sleep(0.01)
+                    # Reensamblar tramas completas (puede haber varias o ninguna por lectura)
+                    self._alimentar(datos_recibidos, t_rx)
+
+                except serial.SerialException as e:
+                    self.log.error("Error al recibir datos: %s", e)
+                    break
+        finally:
+            lector.close()
+
+    def _alimentar(self, datos, t_rx):
+        """Pasa bytes recibidos al FrameParser (y al grabador de capturas, si hay uno) y procesa las tramas."""
+        grabador = self.grabador
+        if grabador is not None:
+            grabador.rx(datos, t_rx, self.parser.bytes_recibidos)
+        tramas = self.parser.feed(datos)
+        if grabador is not None:
+            for (header, _), posicion in zip(tramas, self.parser.posiciones):
+                grabador.trama(posicion, t_rx, header)
+        for header, trama in tramas:
+            self.procesar_trama(header, trama, t_rx)
+
+    def iniciar_grabacion(self, ruta_base, **opciones):
+        """Graba los bytes crudos RX/TX en capturas indexadas (ver CaptureRecorder)."""
+        self.detener_grabacion()
+        grabador = CaptureRecorder(ruta_base, **opciones)
+        grabador.start()
+        self.grabador = grabador
+        self.log.info("Grabando captura en %s", grabador.archivo_actual)
+
+    def detener_grabacion(self):
+        grabador, self.grabador = self.grabador, None
+        if grabador is not None:
+            grabador.stop()
+
+    def procesar_trama(self, header, trama, t_rx=None):
+        """
+        Interpreta una trama completa (cabecera incluida) entregada por el FrameParser.
+        `t_rx` es el instante (self.reloj.monotonic) en que se leyeron los datos del puerto.
+        """
+        if t_rx is None:
+            t_rx = self.reloj.monotonic()
+        if header == HEADER_ACK:            #Comando recibido OK
+            self.acks.recibido()
+
+        elif header == HEADER_ESTADO:
+            tension_mV = struct.unpack_from('<h', trama, 44)[0]
+            self.TensionSalida = tension_mV / 1000.0 *14.7 / 15.0 # Convertir mV a V
+            self.TensionSalidaMedia = self.TensionSalidaMedia + ( self.TensionSalida - self.TensionSalidaMedia ) * 0.1      #filtro FIR 1er orden
+            seq = self.tensiones.agregar(self.TensionSalida, t_rx)
+            self.lecturas_tension.publicar(MedicionTension(seq, t_rx, self.TensionSalida))
+            #print(f"{COLOR_ROJO}RX: TENSION {self.TensionSalida} ")
+
+        elif header == HEADER_MUESTRAS:
+            t_decodificacion = time.perf_counter()
+            fases = self.decoder.decodificar(trama)
+            if fases is None:
+                self.metricas.tramas_invalidas += 1
+                return
+            ia_array, ib_array, ic_array = fases
+            seq = self.muestras.agregar(ia_array, ib_array, ic_array, t_rx)
+
+            # Las tres fases de la misma trama se publican juntas en un objeto inmutable
+            medicion = MedicionCorrientes(
+                seq, t_rx,
+                self.decoder.rms(ia_array), self.decoder.rms(ib_array), self.decoder.rms(ic_array),
+                self.decoder.avg(ia_array), self.decoder.avg(ib_array), self.decoder.avg(ic_array),
+            )
+            self.corrientes.publicar(medicion)
+            self.metricas.decodificacion.observar(time.perf_counter() - t_decodificacion)
+
+            # Atributos sueltos: compatibilidad con código que los lee directamente
+            self.IaRMS, self.IbRMS, self.IcRMS = medicion.IaRMS, medicion.IbRMS, medicion.IcRMS
+            self.IaAVG, self.IbAVG, self.IcAVG = medicion.IaAVG, medicion.IbAVG, medicion.IcAVG
+
+    def wait_for_frames(self, n, timeout=None):
+        """
+        Espera `n` tramas de muestras nuevas (posteriores a la llamada) y devuelve sus
+        MedicionCorrientes. Si vence `timeout` devuelve las que hayan llegado.
+        """
+        with self.traza.tramo("ventana_corrientes", n=n, timeout=timeout) as tramo:
+            mediciones = self.corrientes.esperar(n, timeout)
+            tramo["recibidas"] = len(mediciones)
+        return mediciones
+
+    def esperar_tensiones(self, n, timeout=None):
+        """Igual que wait_for_frames pero con las lecturas de tensión (tramas de status)."""
+        with self.traza.tramo("ventana_tension", n=n, timeout=timeout) as tramo:
+            lecturas = self.lecturas_tension.esperar(n, timeout)
+            tramo["recibidas"] = len(lecturas)
+        return lecturas
+
+    def esperar_corrientes_estables(self, timeout):
+        """Espera régimen permanente en las corrientes de fase. `timeout` es el tiempo de asentamiento fijo anterior."""
+        detector = DetectorEstabilidad(CAMPOS_CORRIENTES, ventana=10, tolerancia_rel=0.02,
+                                       tolerancia_abs=5.0, duracion_minima=0.2)
+        with self.traza.tramo("asentamiento_corrientes", CATEGORIA_ASENTAMIENTO, timeout=timeout) as tramo:
+            estable, espera = esperar_estabilidad(self.corrientes, detector, timeout)
+            tramo["estable"] = estable
+        self._informar_asentamiento("corrientes", estable, espera, timeout)
+        return estable
+
+    def esperar_tension_estable(self, timeout):
+        """Espera régimen permanente en la tensión de salida. `timeout` es el tiempo de asentamiento fijo anterior."""
+        detector = DetectorEstabilidad(CAMPOS_TENSION, ventana=5, tolerancia_rel=0.005,
+                                       tolerancia_abs=0.02, duracion_minima=0.6)
+        with self.traza.tramo("asentamiento_tension", CATEGORIA_ASENTAMIENTO, timeout=timeout) as tramo:
+            estable, espera = esperar_estabilidad(self.lecturas_tension, detector, timeout)
+            tramo["estable"] = estable
+        self._informar_asentamiento("tensión", estable, espera, timeout)
+        return estable
+
+    def rampa(self, nombre, setear, valores, timeout):
+        """
+        Aplica los setpoints `valores` con `setear(valor, ack=True)`, avanzando en
+        cada ACK (`timeout` es el máximo por paso). Queda registrada como un tramo
+        de la traza con la cantidad de pasos que vencieron sin ACK.
+        """
+        with self.traza.tramo(nombre, CATEGORIA_RAMPA, desde=valores.start, hasta=valores.stop,
+                              paso=valores.step, pasos=len(valores)) as tramo:
+            sin_ack = 0
+            for valor in valores:
+                if not esperar_ack(setear(valor, ack=True), timeout):
+                    sin_ack += 1
+            tramo["sin_ack"] = sin_ack
+
+    def _informar_asentamiento(self, senal, estable, espera, timeout):
+        if estable:
+            self.log.color(COLOR_MAGENTA, "Asentamiento %s: estable en %.2f s (máx. %s s)", senal, espera, timeout)
+        else:
+            self.log.warning("Asentamiento %s: sin estabilizar tras %s s", senal, timeout)
 
     def ProbarReguladorSerie(self):
-        print(f"{COLOR_VERDE}--- PROBANDO REGULADOR SERIE ---")
+        self.log.color(COLOR_VERDE, "--- PROBANDO REGULADOR SERIE ---")
 
     def ProbarReguladorParalelo(self):
         """
@@ -304,45 +524,31 @@ class DZETester:
         # FUNCIONES AUXILIARES
         # -------------------------------------------------------------------------
         def medir_corrientes(self,n=10, delay=0.1):
-            Ia_rms = []; Ia_avg = []
-            Ib_rms = []; Ib_avg = []
-            Ic_rms = []; Ic_avg = []
-            for dt in range(n):
-                Ia_avg.append(self.IaAVG); Ia_rms.append(self.IaRMS)
-                Ib_avg.append(self.IbAVG); Ib_rms.append(self.IbRMS)
-                Ic_avg.append(self.IcAVG); Ic_rms.append(self.IcRMS)
-                time.sleep(delay)
-            
-            A =(float(np.mean(Ia_avg)), float(np.mean(Ia_rms)))
-            B =(float(np.mean(Ib_avg)), float(np.mean(Ib_rms)))
-            C =(float(np.mean(Ic_avg)), float(np.mean(Ic_rms)))
+            # Consume n tramas nuevas; n*delay (ventana de muestreo anterior) es el máximo de espera
+            medias = promediar(self.wait_for_frames(n, timeout=n * delay))
+
+            A =(float(medias["IaAVG"]), float(medias["IaRMS"]))
+            B =(float(medias["IbAVG"]), float(medias["IbRMS"]))
+            C =(float(medias["IcAVG"]), float(medias["IcRMS"]))
 
             #print(f"Valores en Medir Corrientes: {A}" )
             #print(f"Valores en Medir Corrientes: {B}" )
             #print(f"Valores en Medir Corrientes: {C}" )
 
-            return {
-                'A': (float(np.mean(Ia_avg)), float(np.mean(Ia_rms))),
-                'B': (float(np.mean(Ib_avg)), float(np.mean(Ib_rms))),
-                'C': (float(np.mean(Ic_avg)), float(np.mean(Ic_rms)))
-            }
+            return {'A': A, 'B': B, 'C': C}
 
 
         def imprimir_corrientes(valores):
-            """Imprime valores RMS y AVG."""
-            print(
-                f"RMS: Ia {valores['A'][1]:5.1f} - Ib {valores['B'][1]:5.1f} - Ic {valores['C'][1]:5.1f}"
-            )
-            print(
-                f"AVG: Ia {valores['A'][0]:5.1f} - Ib {valores['B'][0]:5.1f} - Ic {valores['C'][0]:5.1f}"
-            )
+            """Registra valores RMS y AVG."""
+            self.log.info("RMS: Ia %5.1f - Ib %5.1f - Ic %5.1f", valores['A'][1], valores['B'][1], valores['C'][1])
+            self.log.info("AVG: Ia %5.1f - Ib %5.1f - Ic %5.1f", valores['A'][0], valores['B'][0], valores['C'][0])
 
         def evaluar_fases(valores):
             """Evalúa desviaciones entre fases y determina fallas."""
             #print(f"VALORES EN EVALUAR FASES {valores}")
             maxRMS = max(v[1] for v in valores.values())
             desvio_max = 0.2 * maxRMS
-            print(f"maxRMS:{maxRMS:5.1f} - DesvioRMSmax :{desvio_max:5.1f}")
+            self.log.info("maxRMS:%5.1f - DesvioRMSmax :%5.1f", maxRMS, desvio_max)
 
             for fase, (avg, rms) in valores.items():
                 dispositivo = getattr(self, f"DispositivoFase{fase}")
@@ -352,23 +558,26 @@ class DZETester:
                     dispositivo = 1  # Dispositivo Abierto
                 setattr(self, f"DispositivoFase{fase}", dispositivo)
 
-            print(
-                f"{COLOR_AMARILLO}Estado Fases: A: {self.DispositivoEstado[self.DispositivoFaseA]} - "
-                f"B: {self.DispositivoEstado[self.DispositivoFaseB]} - "
-                f"C: {self.DispositivoEstado[self.DispositivoFaseC]}"
+            self.log.color(
+                COLOR_AMARILLO, "Estado Fases: A: %s - B: %s - C: %s",
+                self.DispositivoEstado[self.DispositivoFaseA], self.DispositivoEstado[self.DispositivoFaseB],
+                self.DispositivoEstado[self.DispositivoFaseC],
             )
 
+        # Cada comando avanza al recibir su ACK; el tiempo indicado es el máximo (delay anterior)
         def Sendstart():
-            self.send("290000E01900", "Comando Start")
-            time.sleep(0.5)
+            esperar_ack(self.send("290000E01900", "Comando Start", ack=True), 0.5)
 
         def SendStop():
-            self.send("290000E02100", "Comando Stop")
-            time.sleep(5)
+            esperar_ack(self.send("290000E02100", "Comando Stop", ack=True), 5)
 
-        print(f"{COLOR_VERDE}--- PROBANDO REGULADOR PARALELO ---")
+        self.log.color(COLOR_VERDE, "--- PROBANDO REGULADOR PARALELO ---")
         self.msg_gui = "Iniciando prueba regulador paralelo..."
         self.EstadoEnsayo = 1  # Ejecutando
+        # Diccionario nuevo por ensayo: el devuelto por el anterior puede estar guardado (GET /jobs)
+        self.resultados = {}
+        self.traza = TrazaEnsayo("regulador_paralelo", self.reloj)
+        self.traza.etapa("configuracion")
 
         # -------------------------------------------------------------------------
         # CONFIGURACIÓN INICIAL
@@ -377,18 +586,15 @@ class DZETester:
         self.DispositivoFaseB = 0
         self.DispositivoFaseC = 0
 
-        self.send("290000E03900", "ACK Error previo")
-        self.send("590000F00800890002", "Configurar modo regulador paralelo")
+        esperar_ack(self.send("290000E03900", "ACK Error previo", ack=True), 0.1)
+        esperar_ack(self.send("590000F00800890002", "Configurar modo regulador paralelo", ack=True), 0.1)
 
         # Seteo corriente de carga
-        for mA in range(0, 201, 50):
-            self.SetearCorrienteCarga(mA)
-            time.sleep(0.05)
+        self.rampa("rampa_carga", self.SetearCorrienteCarga, range(0, 201, 50), 0.05)
 
         # # Configuración inicial de muestras y start
-        self.send("F9000030080029050900FE030001FF00D10713", "Datos Ia")
-        self.send("190100A0080029050B00FC030002FF00D107110814", "Datos Ib")
-        time.sleep(0.1)
+        esperar_ack(self.send("F9000030080029050900FE030001FF00D10713", "Datos Ia", ack=True), 0.1)
+        esperar_ack(self.send("190100A0080029050B00FC030002FF00D107110814", "Datos Ib", ack=True), 0.1)
         
         Sendstart()
         
@@ -425,41 +631,31 @@ class DZETester:
         # -------------------------------------------------------------------------
 
         # Seteo corriente de prueba del regulador paralelo de 0 a xxmA
-        for mA in range(0, 400, 100):
-            self.SetearCorrientePruebaRegParalelo(mA) 
-            time.sleep(0.1)
-        time.sleep(0.5)
+        self.traza.etapa("falta_de_fase")
+        self.rampa("rampa_prueba", self.SetearCorrientePruebaRegParalelo, range(0, 400, 100), 0.1)
+        self.esperar_corrientes_estables(0.5)
 
-        print("Rampas de seteo para falta de fase configuradas")
+        self.log.info("Rampas de seteo para falta de fase configuradas")
 
-        print(f"{COLOR_AMARILLO} Ensayo falta de fase {COLOR_RESET}")
-        valores = medir_corrientes(self, n=50)
+        self.log.color(COLOR_AMARILLO, " Ensayo falta de fase")
+        valores = medir_corrientes(self, n=TRAMAS_POR_MEDICION, delay=0.25)
         imprimir_corrientes(valores)
         evaluar_fases(valores)
 
-        self.resultados["corrientes_1"] = {
-        "IaRMS": self.IaRMS,
-        "IbRMS": self.IbRMS,
-        "IcRMS": self.IcRMS,
-        "IaAVG": self.IaAVG,
-        "IbAVG": self.IbAVG,
-        "IcAVG": self.IcAVG
-    }
+        ultima = self.corrientes.actual     # las seis magnitudes de una misma trama
+        self.resultados["corrientes_1"] = promediar([ultima] if ultima else [])
 
 
         # -------------------------------------------------------------------------
         # ENSAYO FUNCIONAMIENTO DISPOSITIVOS
         # -------------------------------------------------------------------------
-        print(f"{COLOR_AMARILLO} Ensayo funcionamiento dispositivos {COLOR_RESET}")
+        self.traza.etapa("conduccion_mos")
+        self.log.color(COLOR_AMARILLO, " Ensayo funcionamiento dispositivos")
 
-        for mA in range(200, 401, 100):
-            self.SetearCorrienteCarga(mA)
-            time.sleep(0.1)
+        self.rampa("rampa_carga", self.SetearCorrienteCarga, range(200, 401, 100), 0.1)
 
-        for mA in range(400, 1600, 50):
-            self.SetearCorrientePruebaRegParalelo(mA)
-            time.sleep(0.05)
-        time.sleep(1.8)
+        self.rampa("rampa_prueba", self.SetearCorrientePruebaRegParalelo, range(400, 1600, 50), 0.05)
+        self.esperar_corrientes_estables(1.8)
 
         valores = medir_corrientes(self)
         imprimir_corrientes(valores)
@@ -468,46 +664,36 @@ class DZETester:
             if avg < -500:
                 setattr(self, f"DispositivoFase{fase}", 1)
 
-        print(
-            f"{COLOR_AMARILLO}Ensayo conducción MOS: A: {self.DispositivoEstado[self.DispositivoFaseA]} - "
-            f"B: {self.DispositivoEstado[self.DispositivoFaseB]} - "
-            f"C: {self.DispositivoEstado[self.DispositivoFaseC]}"
+        self.log.color(
+            COLOR_AMARILLO, "Ensayo conducción MOS: A: %s - B: %s - C: %s",
+            self.DispositivoEstado[self.DispositivoFaseA], self.DispositivoEstado[self.DispositivoFaseB],
+            self.DispositivoEstado[self.DispositivoFaseC],
         )
 
-        self.resultados["corrientes_2"] = {
-        "IaRMS": self.IaRMS,
-        "IbRMS": self.IbRMS,
-        "IcRMS": self.IcRMS,
-        "IaAVG": self.IaAVG,
-        "IbAVG": self.IbAVG,
-        "IcAVG": self.IcAVG
-    }
+        ultima = self.corrientes.actual     # las seis magnitudes de una misma trama
+        self.resultados["corrientes_2"] = promediar([ultima] if ultima else [])
 
         # -------------------------------------------------------------------------
         # ENSAYO REGULACIÓN DE TENSIÓN
         # -------------------------------------------------------------------------
         
         
-        print(f"{COLOR_AMARILLO} Ensayo regulación de tensión {COLOR_RESET}")
+        self.traza.etapa("regulacion_tension")
+        self.log.color(COLOR_AMARILLO, " Ensayo regulación de tensión")
 
-        for mA in range(1000, 100, -100):
-            self.SetearCorrienteCarga(mA)
-            time.sleep(0.1)
-        time.sleep(4)
+        self.rampa("rampa_carga", self.SetearCorrienteCarga, range(1000, 100, -100), 0.1)
+        self.esperar_tension_estable(4)
 
         #print("rampa de corriente de carga 1000 terminada")
 
-        for mA in range(1000, 1500, 100):
-            self.SetearCorrientePruebaRegParalelo(mA)
-            time.sleep(0.1)
-        time.sleep(4)
+        self.rampa("rampa_prueba", self.SetearCorrientePruebaRegParalelo, range(1000, 1500, 100), 0.1)
+        self.esperar_tension_estable(4)
 
         #print("rampa de corriente de prueba reg paralelo 1000 terminada")
 
-        Vout_cola = []
-        for dt in range(50):
-            Vout_cola.append(self.TensionSalida)
-            time.sleep(0.1)
+        # Lecturas de status nuevas (una por keep-alive); la ventana anterior (50 x 0.1 s) es el máximo
+        lecturas = self.esperar_tensiones(LECTURAS_TENSION, timeout=5)
+        Vout_cola = [l.TensionSalida for l in lecturas] or [self.TensionSalida]
 
         #print(Vout_cola)
 
@@ -515,29 +701,32 @@ class DZETester:
         self.resultados["Vout"] = round(float(Vout_medio), 3)
 
         if abs(Vout_medio - 14.4) > 0.3:
-            print(f"{COLOR_ROJO}--- ERROR EN ENSAYO REGULADOR PARALELO - Tensión: {Vout_medio:2.2f} V ---")
+            self.log.error("--- ERROR EN ENSAYO REGULADOR PARALELO - Tensión: %2.2f V ---", Vout_medio)
             self.msg_gui = "Error en ensayo regulador paralelo. Tensión fuera de rango."
             self.EstadoEnsayo = 3
         else:
-            print(f"{COLOR_VERDE}--- ENSAYO REGULADOR PARALELO OK - Tensión: {Vout_medio:2.2f} V ---")
+            self.log.color(COLOR_VERDE, "--- ENSAYO REGULADOR PARALELO OK - Tensión: %2.2f V ---", Vout_medio)
             self.msg_gui = "Ensayo regulador paralelo OK. Tensión dentro de rango."
             self.EstadoEnsayo = 2
 
         # -------------------------------------------------------------------------
         # FINALIZACIÓN
         # -------------------------------------------------------------------------
+        self.traza.etapa("stop")
+        estado = self.EstadoEnsayo
         SendStop()
         self.EstadoEnsayo = 2
+        self.resultados["traza"] = self.traza.cerrar()
+        self.metricas.ensayo_terminado(estado, self.resultados["traza"]["duracion_ms"] / 1000)
 
         # resultado_json = json.dumps(self.resultados, indent=4)
         # return resultado_json
         return self.resultados
 
 # ---------------------------------------------
-DZE = DZETester()
+# Uso manual sin el servidor (importar el módulo no crea testers ni abre puertos)
 # ---------------------------------------------
-
-print("Inicializando interfaz serial...")
+# DZE = DZETester()
 
 # while True:
 #     found, PuertoSerie = find_stlink()
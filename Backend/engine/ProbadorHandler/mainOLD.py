@@ -1,17 +1,32 @@
 import struct
 import time
-import random
 import threading
 import serial
-import asyncio
 import math
 
-import matplotlib.pyplot as plt
-
-from collections import deque
-
 import numpy as np
 
+from engine.ProbadorHandler.frameParser import FrameParser, HEADER_ACK, HEADER_ESTADO, HEADER_MUESTRAS
+from engine.ProbadorHandler.sampleDecoder import SampleDecoder
+from engine.ProbadorHandler.sampleRing import SampleRing, ValueRing
+from engine.ProbadorHandler.captureRecorder import CaptureRecorder
+from engine.ProbadorHandler.measurementSnapshot import (
+    CanalMediciones, MedicionCorrientes, MedicionTension, promediar,
+    TRAMAS_POR_MEDICION, LECTURAS_TENSION,
+)
+from engine.ProbadorHandler.steadyState import (
+    DetectorEstabilidad, esperar_estabilidad, CAMPOS_CORRIENTES, CAMPOS_TENSION,
+)
+from engine.ProbadorHandler.serialReader import SerialReader, MODO_BLOQUEANTE, PlacaDesconectada
+from engine.ProbadorHandler.txScheduler import TXScheduler, PRIORIDAD_ENSAYO, PRIORIDAD_KEEP_ALIVE
+from engine.ProbadorHandler.ackTracker import ACKTracker, esperar_ack
+from engine.ProbadorHandler.virtualClock import RELOJ_REAL
+from engine.ProbadorHandler.engineMetrics import MetricasTester
+from engine.ProbadorHandler.stageTrace import (
+    TrazaEnsayo, TRAZA_INACTIVA, CATEGORIA_RAMPA, CATEGORIA_ASENTAMIENTO,
+)
+from engine.ProbadorHandler.eventLog import RegistroTester
+
 COLOR_AZUL = '\033[94m'
 COLOR_ROJO = '\033[91m'
 COLOR_VERDE = '\033[32m'
@@ -23,12 +38,39 @@ COLOR_AMARILLO = '\033[33m'
 #Puerto serie Localizado dinamicamente
 BAUD_RATE = 1843200
 
+# Mensajes de configuración enviados al conectar la placa
+MENSAJES_CONFIGURACION = [
+    "85FFFFBF", "05C30082", "06000060", "06000060",
+    "4900007010002800", "4900007010002000", "4900007010006000",
+    "4900007011006900", "490000701100A900", "490000701100E900",
+    "490000701100A100", "490000701100E100", 
+    "4900007011002901", "4900007011002902",
+    "D900004008002905070000040000FF0000"
+]
+
+# Placa recién enchufada: se repite el primer mensaje de configuración hasta su
+# ACK (cada INTERVALO_SONDEO_PLACA), como máximo ESPERA_ARRANQUE_PLACA (la espera
+# fija anterior al abrir el puerto)
+ESPERA_ARRANQUE_PLACA = 1.0
+INTERVALO_SONDEO_PLACA = 0.1
+# El keep-alive empieza al terminar la configuración, o tras esta espera
+ESPERA_KEEP_ALIVE = 2.0
+
+# Pedido periódico de status (keep-alive)
+MENSAJE_KEEP_ALIVE = "A9040070110019005900591B9900D90019019102D10251099101D101911451149100D1009109D1081109D105910551039103910451041119D118910B510BD10B110C510C910CD11A49008900C900"
+
+
+class EnsayoAbortado(Exception):
+    """El ensayo se canceló (abortar_ensayo): la secuencia se detuvo y se envió el Stop."""
+
 
 # ----------------------------
 # Simulated Serial Interface
 # ----------------------------
 class DZETester:
-    def __init__(self):
+    def __init__(self, reloj=RELOJ_REAL):
+        # Fuente de tiempo y esperas (RelojVirtual para correr el ensayo simulado, ver virtualRunner)
+        self.reloj = reloj
         self.running = False
         self.condition = threading.Condition()
 
@@ -55,232 +97,442 @@ class DZETester:
         self.IbAVG = 0.0
         self.IcAVG = 0.0
 
-        self.DispositivoEstado = ["Dispositivo OK","Dispositivo no conduce/abierto","Dispositivo en cortocircuito","Fase abierta"]
+        self.DispositivoEstado = ["Dispositivo OK","Dispositivo no conduce/abierto","Dispositivo en cortocircuito","Fase abierta","Sin medición"]
         self.EstadoEnsayo = 0  # 0: Espera, 1: Ejecutando, 2: Ensayo OK, 3: Ensayo ERRROR
-        self.DispositivoFaseA = 0 #0: Dispositivo OK, 1: Dispositivo Abierto, 2: Dispositivo en cortocircuito, 3: Fase abierta
+        self.DispositivoFaseA = 0 #0: Dispositivo OK, 1: Dispositivo Abierto, 2: Dispositivo en cortocircuito, 3: Fase abierta, 4: Sin medición
         self.DispositivoFaseB = 0
         self.DispositivoFaseC = 0
 
-        # Create a fixed-length deque of size 50 to store the data points
-        self.data_points = deque(maxlen=50)
-        self.fig, self.ax = plt.subplots()
-        self.line = self.ax.plot([])
+        # Historial de muestras por fase y de tensión de salida (preasignado)
+        self.muestras = SampleRing()
+        self.tensiones = ValueRing()
+
+        # Última medición publicada por el hilo RX (objeto inmutable, se reemplaza entero)
+        self.corrientes = CanalMediciones(reloj=reloj)
+        self.lecturas_tension = CanalMediciones(reloj=reloj)
+
+        # Reensamblador de tramas del puerto serie
+        self.parser = FrameParser()
+        self.decoder = SampleDecoder()
+        self.modo_lectura = MODO_BLOQUEANTE   # "bloqueante" o "selector" (Linux)
+
+        # Escritor único del puerto (prioridades + coalescencia de setpoints)
+        # y correlación de comandos con su ACK (1a00002000)
+        self.acks = ACKTracker(reloj)
+        self.tx = TXScheduler(self._escribir, acks=self.acks, reloj=reloj)
+
+        # True si la placa fue retirada (hot-plug) hasta el próximo start()
+        self.retirada = False
+        # Pedido de cancelación del ensayo en curso (abortar_ensayo); solo vale mientras hay uno
+        self.abortado = threading.Event()
+        self._en_ensayo = False
+        self._lock_ensayo = threading.Lock()
+        # Placa configurada y lista para ensayar (se limpia al abrir y al cerrar el puerto)
+        self.configurada = threading.Event()
+
+        # Grabador opcional de capturas crudas (iniciar_grabacion)
+        self.grabador = None
 
         self.resultados = {}
+        self.ventanas_incompletas = []
+
+        # Tramos temporizados del ensayo en curso (etapas, rampas, ventanas); ver stageTrace
+        self.traza = TRAZA_INACTIVA
+
+        # Registro de eventos no bloqueante (banco, etapa, comando); ver eventLog
+        self.log = RegistroTester(self)
+
+        # Contadores para /metrics (un hilo escritor por contador, sin locks; ver engineMetrics)
+        self.metricas = MetricasTester()
 
 
     def start(self, PuertoSerie):
-        print("=== START INICIADO ===")
+        self.log.info("=== START INICIADO ===")
         self.PuertoSerie = PuertoSerie
         try:
-            print(f"Intentando abrir puerto serie {PuertoSerie} a {BAUD_RATE} bps...")
+            self.log.info("Intentando abrir puerto serie %s a %d bps...", PuertoSerie, BAUD_RATE)
             self.ser = serial.Serial(PuertoSerie, BAUD_RATE, timeout=2, write_timeout=2)
-            time.sleep(1)
-            print(f"Puerto serie {PuertoSerie} abierto correctamente.")
+            self.parser.reset()
+            self.muestras.reset()
+            self.tensiones.reset()
+            self.corrientes.reset()
+            self.lecturas_tension.reset()
+            self.retirada = False
+            self.configurada.clear()
+            self.log.info("Puerto serie %s abierto correctamente.", PuertoSerie)
 
             self.running = True
+            self.tx.start()
 
             # Crear hilos
-            print("Creando hilo de recepción...")
+            self.log.debug("Creando hilo de recepción...")
             self.hilo_recibir = threading.Thread(target=self.recibir_datos, daemon=True)
-            print("Creando hilo de envío (keep_alive)...")
+            self.log.debug("Creando hilo de envío (keep_alive)...")
             self.hilo_enviar = threading.Thread(target=self.keep_alive_status, daemon=True)
 
             # Iniciar hilo de recepción primero
-            print("Iniciando hilo de recepción...")
+            self.log.debug("Iniciando hilo de recepción...")
             self.hilo_recibir.start()
-            print(f"hilo_recibir alive: {self.hilo_recibir.is_alive()}")
+            self.log.debug("hilo_recibir alive: %s", self.hilo_recibir.is_alive())
 
             # Configurar placa en hilo separado
-            print("Iniciando hilo de configuración de placa...")
+            self.log.debug("Iniciando hilo de configuración de placa...")
             threading.Thread(target=self.configurar_placa, daemon=True).start()
 
             # Iniciar hilo de envío después
-            print("Iniciando hilo de envío (keep_alive)...")
+            self.log.debug("Iniciando hilo de envío (keep_alive)...")
             self.hilo_enviar.start()
-            print(f"hilo_enviar alive: {self.hilo_enviar.is_alive()}")
+            self.log.debug("hilo_enviar alive: %s", self.hilo_enviar.is_alive())
 
-            print("=== START FINALIZADO ===")
+            self.log.info("=== START FINALIZADO ===")
 
         except serial.SerialException as e:
-            print(f"Error abriendo puerto serie: {e}")
+            self.log.error("Error abriendo puerto serie: %s", e)
             self.ser = None
 
 
 
     def stop(self):
         """Detiene la comunicación y cierra el puerto serie"""
-        print("=== STOP INICIADO ===")
+        self.log.info("=== STOP INICIADO ===")
         self.running = False
+        self.configurada.clear()
+        self.tx.stop()
+        self.acks.cancelar_todos()
         try:
             if hasattr(self, "ser") and self.ser and self.ser.is_open:
                 self.ser.close()
-                print("Puerto serie cerrado correctamente.")
+                self.log.info("Puerto serie cerrado correctamente.")
         except Exception as e:
-            print("Error cerrando puerto serie:", e)
+            self.log.error("Error cerrando puerto serie: %s", e)
 
         # Esperar a que los hilos terminen
         if hasattr(self, "hilo_enviar") and self.hilo_enviar.is_alive():
             self.hilo_enviar.join(timeout=1)
-            print("hilo_enviar join completado")
+            self.log.debug("hilo_enviar join completado")
         if hasattr(self, "hilo_recibir") and self.hilo_recibir.is_alive():
             self.hilo_recibir.join(timeout=1)
-            print("hilo_recibir join completado")
-        print("=== STOP FINALIZADO ===")
-
-    def send(self, cmd, description=""):
+            self.log.debug("hilo_recibir join completado")
+        self.log.info("=== STOP FINALIZADO ===")
+
+
+    def placa_retirada(self):
+        """
+        Aviso de hot-plug: la placa se desconectó. Aborta el ensayo en curso (los
+        ACK pendientes resuelven False, las esperas de mediciones se liberan y el
+        próximo send lanza PlacaDesconectada) y libera el puerto.
+        """
+        self.log.warning("Placa retirada de %s", self.PuertoSerie)
+        self.retirada = True
+        if self.EstadoEnsayo == 1:
+            self.EstadoEnsayo = 3
+            self.msg_gui = "Placa desconectada durante el ensayo."
+        self.corrientes.cerrar()
+        self.lecturas_tension.cerrar()
+        self.stop()
+
+    def send(self, cmd, description="", prioridad=PRIORIDAD_ENSAYO, clave=None, esperar=True,
+             ack=False, ack_timeout=1.0):
+        """
+        Encola un comando en el escritor TX.
+        Con `ack` devuelve de inmediato un Future que resuelve True al recibir el ACK
+        de la placa (usar con esperar_ack(futuro, timeout)).
+        Con `esperar` bloquea hasta que el comando sale por el puerto y devuelve True/False;
+        si no, devuelve el ComandoTX encolado. Comandos con la misma `clave` pendientes
+        se coalescen (se envía solo el último valor).
+        """
+        if self.retirada:
+            raise PlacaDesconectada(f"Placa retirada de {self.PuertoSerie}")
+        futuro = self.acks.nuevo_futuro() if ack else None
+        comando = self.tx.encolar(cmd, description, prioridad, clave, futuro, ack_timeout)
+        if ack:
+            return futuro       # propio aunque el comando se haya coalescido con uno previo
+        if esperar:
+            return comando.esperar(timeout=5)
+        return comando
+
+    def _escribir(self, cmd, description=""):
+        """Escritura física de un comando (la llama solo el hilo escritor TX)."""
         try:
             if self.ser is None or not self.ser.is_open:
-                print("Error: puerto serie no inicializado o cerrado.")
-                return
+                self.log.error("Error: puerto serie no inicializado o cerrado.")
+                return False
             
             self.ser.flush()
             self.ser.write( bytes.fromhex(cmd[0:8]))
-            time.sleep(0.002)
+            self.reloj.sleep(0.002)
             self.ser.write( bytes.fromhex(cmd[8:]))
-            if not(description.startswith("NP:")):      #si la descripcion empieza con NP no la imprimo
-                print(f"{COLOR_AZUL}TX: {description} : ({cmd}){COLOR_RESET}")
+            if self.grabador is not None:
+                self.grabador.tx(bytes.fromhex(cmd))
+            if not(description.startswith("NP:")):      #si la descripcion empieza con NP no la registro
+                self.log.tx(description, cmd)
+            return True
         except serial.SerialException as e:
-            print(f"Error al enviar datos: {e}")
-        time.sleep(0.1)
+            self.log.error("Error al enviar datos: %s", e, extra={"comando": description, "payload": cmd})
+            return False
+
+    def estadisticas_tx(self):
+        """Profundidad de cola, coalescencias y latencia encolado→puerto por tipo de comando."""
+        return {
+            "en_cola": len(self.tx.cola),
+            "coalescidos": self.tx.cola.coalescidos,
+            "enviados": self.tx.stats.enviados,
+            "fallidos": self.tx.stats.fallidos,
+            "latencias": self.tx.stats.resumen(),
+        }
+
+    def esperar_placa(self, mensaje, timeout=ESPERA_ARRANQUE_PLACA, intervalo=INTERVALO_SONDEO_PLACA):
+        """Reenvía `mensaje` hasta que la placa lo confirma con ACK; False si vence `timeout`."""
+        limite = self.reloj.monotonic() + timeout
+        intentos = 0
+        while True:
+            restante = limite - self.reloj.monotonic()
+            if restante <= 0:
+                return False
+            if intentos:
+                self.metricas.reintentos_tx += 1
+            intentos += 1
+            if esperar_ack(self.send(mensaje, "NP:Configuración placa", ack=True), min(intervalo, restante)):
+                return True
 
     def configurar_placa(self):
-        mensajes = [
-            "85FFFFBF", "05C30082", "06000060", "06000060",
-            "4900007010002800", "4900007010002000", "4900007010006000",
-            "4900007011006900", "490000701100A900", "490000701100E900",
-            "490000701100A100", "490000701100E100", 
-            "4900007011002901", "4900007011002902",
-            "D900004008002905070000040000FF0000"
-        ]
-
-        for m in mensajes:
-            try:
-                if not self.ser or not self.ser.is_open:
-                    print("Puerto serie no disponible, saltando comando:", m)
-                    continue
-                self.ser.flush()
-                self.ser.write(bytes.fromhex(m[0:8]))
-                time.sleep(0.01)  # delay seguro
-                self.ser.write(bytes.fromhex(m[8:]))
-                print(f"{COLOR_AZUL}Enviado: {m}{COLOR_RESET}")
-            except serial.SerialException as e:
-                print("Error enviando comando:", m, e)
-            time.sleep(0.05)  # delay entre comandos
-
-        print(f"{COLOR_AZUL}Enviado: PLACA CONECTADA{COLOR_RESET}")
+        pendientes = MENSAJES_CONFIGURACION
+        if self.esperar_placa(pendientes[0]):
+            self.log.debug("Enviado: %s", pendientes[0], extra={"payload": pendientes[0], "color": COLOR_AZUL})
+            pendientes = pendientes[1:]
+        for m in pendientes:
+            # Se avanza al recibir el ACK; 50 ms como máximo (delay anterior entre comandos)
+            if esperar_ack(self.send(m, "NP:Configuración placa", ack=True), 0.05):
+                self.log.debug("Enviado: %s", m, extra={"payload": m, "color": COLOR_AZUL})
+            else:
+                self.log.warning("Enviado (sin ACK): %s", m, extra={"payload": m})
+
+        self.log.color(COLOR_AZUL, "Enviado: PLACA CONECTADA")
         self.msg_gui = "Placa configurada y conectada."
+        self.configurada.set()
 
 
     def keep_alive_status(self):
-        time.sleep(2)  # Espera inicial antes de comenzar el keep-alive
-        mensaje = "A9040070110019005900591B9900D90019019102D10251099101D101911451149100D1009109D1081109D105910551039103910451041119D118910B510BD10B110C510C910CD11A49008900C900"
-        
+        self.configurada.wait(ESPERA_KEEP_ALIVE)  # Espera inicial antes de comenzar el keep-alive
         while self.running:
-            self.send(mensaje, "NP:Lectura status")
-            time.sleep(0.2)
+            self.send(MENSAJE_KEEP_ALIVE, "NP:Lectura status",
+                      prioridad=PRIORIDAD_KEEP_ALIVE, clave="keep_alive", esperar=False)
+            self.reloj.sleep(0.2)
 
 
-    def SetearCorrienteCarga(self, corriente):              
+    def SetearCorrienteCarga(self, corriente, ack=False):              
         self.CorrienteCarga = corriente/1000.0  # Convertir mA a A
         mensaje_base = "6900000008009100"  
         porcentaje_hex = struct.pack('<h', corriente).hex()
         msj = mensaje_base + porcentaje_hex
         #print(f"{COLOR_MAGENTA}Seteando Corriente de Carga a {corriente} mA ({msj})")
-        self.send(msj, f"NP:Seteo Corriente de Carga a {corriente} mA")
+        return self.send(msj, f"NP:Seteo Corriente de Carga a {corriente} mA", clave="corriente_carga", esperar=False, ack=ack)
 
 
-    def SetearCorrientePruebaRegParalelo(self, corriente):              #0x69000000080091095302 
+    def SetearCorrientePruebaRegParalelo(self, corriente, ack=False):              #0x69000000080091095302 
         self.CorrienteEnsayo = corriente/1000.0  # Convertir mA a A
         corriente = int(corriente/0.0006715014773/1000)
         mensaje_base = "6900000008009109"  
         porcentaje_hex = struct.pack('<h', corriente).hex()
         msj = mensaje_base + porcentaje_hex
-        self.send(msj, f"NP:Seteo Corriente de ensayo a {corriente}")
+        return self.send(msj, f"NP:Seteo Corriente de ensayo a {corriente}", clave="corriente_ensayo", esperar=False, ack=ack)
 
     # Tension porcentual de la tension de entrada
-    def SetearTensionPruebaRegSerie(self, tension_porcentual):              #0x690000000800D11A0000 
+    def SetearTensionPruebaRegSerie(self, tension_porcentual, ack=False):              #0x690000000800D11A0000 
         self.TensionEnsayo = tension_porcentual*24/100
         mensaje_base = "6900000008009109"  
         porcentaje_hex = struct.pack('<h', tension_porcentual).hex()
         msj = mensaje_base + porcentaje_hex
-        self.send(msj, f"NP:Seteo Tension de ensayo a {tension_porcentual}")
+        return self.send(msj, f"NP:Seteo Tension de ensayo a {tension_porcentual}", clave="corriente_ensayo", esperar=False, ack=ack)
 
     def hex_to_int16_array(self,hex_str):
-        import struct
-        hex_str_data = hex_str[16::]         
-            # 0x2FCF3F01  (20959023)
-            #0xE93F00B0 0x4C1BBE00  (12458828)
-        if len(hex_str_data) % 4 == 0:
-            chunks = [hex_str_data[i:i+4] for i in range(0, len(hex_str_data), 4)]
-            int16_array = np.array([], dtype=np.int16)
-            for chunk in chunks:
-                byte_data = bytes.fromhex(chunk)
-                value = struct.unpack('<h', byte_data)[0]
-                int16_array = np.append(int16_array, value)
-
-            ia_array =  np.array([], dtype=np.int16)
-            ib_array =  np.array([], dtype=np.int16)  
-            ic_array =  np.array([], dtype=np.int16)
-            for i in range(len(int16_array)//2):
-                ia_array = np.append(ia_array, int16_array[i*2])
-                ib_array = np.append(ib_array, int16_array[i*2+1])
-            # ia+ib+ic=0 -> ic = - (ia + ib)
-            ic_array = - (ia_array + ib_array)
-
-            return [ia_array, ib_array, ic_array]
-        return [0,0,0]
+        """Compatibilidad: decodifica una trama a93f0050 en hexadecimal a [Ia, Ib, Ic]."""
+        fases = self.decoder.decodificar(bytes.fromhex(hex_str))
+        if fases is None:
+            return [0,0,0]
+        return list(fases)
 
     def recibir_datos(self):
-        cmd = ""
-        while True:
-            try:
-                if self.ser is None or not self.ser.is_open:
-                    print("Error: puerto serie no inicializado o cerrado.")
-                    return
-
-                if self.ser.in_waiting > 0:
-                    datos_recibidos = self.ser.read(self.ser.in_waiting)
-
-                    # Convierte los bytes recibidos a una cadena hexadecimal
-                    hex_representation = datos_recibidos.hex()
-                    
-                    #if(hex_representation == "1a00002000"):            #Comando recibido OK
-                    #   print(f"{COLOR_ROJO}RX: Comando recibido OK! - ({hex_representation})")
-
-                    if(hex_representation.startswith("2a050040")):  
-                        byte_data = bytes.fromhex(hex_representation[88:92])
-                        if(len(byte_data) >= 2):
-                            tension_mV = struct.unpack('<h', byte_data)[0]
-                            self.TensionSalida = tension_mV / 1000.0 *14.7 / 15.0 # Convertir mV a V
-                            self.TensionSalidaMedia = self.TensionSalidaMedia + ( self.TensionSalida - self.TensionSalidaMedia ) * 0.1      #filtro FIR 1er orden
-                            #print(f"{COLOR_ROJO}RX: TENSION {self.TensionSalida} ")
-
-                    # print("DATOS BRUTOS:", hex_representation)
-                    #A93F0050F27142015E032000FE0290FF8E02C0FF8E0290FF5E02B0FFEE01F0FF5E02B0FF1E02E0FF10016E00B0005E0040005E00D0FF3E00D0013E002004BEFF20051E00A0FA7E05F0043E0002052E00A2032E0012025E004200BEFFA2FE2E0032FD4E0082FB3E00F2F94E00C2F72E0042F93E00C2FAA0FF82FBA0FF32FC90FFB2FC90FF22FD70FF02FDB0FF32FDE0FF62FDE0FFF001D2FD500172FE30FFC2FF80FF0200C0FF1200E0FD0200A0FC0200F0FBF2FFDEFC02007EFDE2FF5EFEF2FFBEFFE2FFEE003200EE01F2FF9E0202000E05D2FFCE06E2FFCE05F2FF2E00B2FB7E0300006E03C0FF2E034000DE02B0FFDE02A0FFCE0280FF7E02E0FF8E0280FF70015E003001DEFF20005E00A0FF5E00E0FF3E0080013E00D0022E0060033E0080FC7E0320FD0E0352022E0062011E00C2FF4E0042FE3E00E2FC1E0042FB4E0042F91E0022F83E0092F92E00C2FAC0FFA2FBA0FF72FC80FFB2FCC0FFF2FC90FF02FDF0FF52FDC0FFD2FCD000800132FE1001C2FE30FFF2FFE0FFF2FF20FEF2FF80FCF2FF20FB120010FBF2FF3EFC1200FEFC22001EFE12009EFF2200CE00F2FFCE02E2FF6E0302002E05F2FFCE06D2FFDE05E2FFFEFFB2FB7E03E0FF5E03D0FF3E0390FFEE02D0FFCE02C0FFBE02A0FF6E02E0FF4E0280FF40014E00E0003E0040003E00C0FF4E00C0014E0060032E0030043E0000FBFE04D004BEFF32043E00C2022E0032012E00B2FF3E0012FE3E0072FC1E00E2FABEFFF2F81E00D2F84E00C2F93E0012FB70FFC2FBD0FF42FCC0FFA2FC30FFE2FCA0FF02FDD0FF42FDD0FF92FDB00040FEF2FFD0FEF2FFF0FEE2FFF0FFF2FF20FE1200B0FCF2FFB0FBF2FF50FB12007EFCF2FF4EFDF2FF6EFE1200EEFFF2FF3E0102006E024200EE03F2FFAE05C2FF6E06D2FF3E05E2FFDE0320003E03C0FF7E0240009E0290FF8E02B0FF5E02E0FF6E02A0FF4E02C0FF0E02B0FFD0FF5E0080003E00E0FF7E00D0FF4E00A0014E0020033E0010043E00B0FB8E0430042E00A2033E0062022E00B2001E0022FF1E00B2FD2E00D2FC1E00D2FA0E00D2F83E00C2F83E0012FA3E0032FBC0FFF2FB90FF92FC90FFC2FCC0FFF2FCE0FF32FDC0FF72FDC0FFB2FD200080FEE2FF00FFF2FFA0FF02000000F2FF30FE0200C0FCF2FFE0FBF2FFB0FB0200CEFCF2FFAEFD0200EEFE32005E00E2FF8E01E2FFCE0202004E04F2FF6E0502008E06D2FFFE04D2FF8E033000AE0350FFAE02E0FF6E02D0FF7E02D0FF8E02B0FF5E02B0FF6E0280FFE001DEFFF0004E0080003E00E0FF3E00C0FF3E00C0013E00E0023E00A0031E00D0FB5E04A0034E0042033E00E2013E0042004E00D2FE3E0072FD3E00F2FB6E0002FA4E0042F82E00C2F83E0082FA90FF72FB90FF82FC20FF72FCC0FFC2FCB0FF02FDB0FF02FDD0FF62FDC0FF0002D2FD0002D2FDC0FEE2FF0300
-                    if(hex_representation.startswith("a93f0050")):
-                        
-                        [ia_array, ib_array, ic_array] = self.hex_to_int16_array(hex_representation)
-
-                        if type(ia_array) == int:
-                            continue
-
-                        self.IaRMS = np.sqrt(np.mean(np.square(ia_array)))
-                        self.IbRMS = np.sqrt(np.mean(np.square(ib_array)))
-                        self.IcRMS = np.sqrt(np.mean(np.square(ic_array)))
-
-                        # print(f"RMS: IaRMS {self.IaRMS:5.1f} - IbRMS {self.IbRMS:5.1f} - IcRMS {self.IcRMS:5.1f}")
-                        # print("DATOS BRUTOS:", hex_representation)
-
-                        self.IaAVG = np.mean(ia_array)
-                        self.IbAVG = np.mean(ib_array)
-                        self.IcAVG = np.mean(ic_array)
-                        #print("Average: Iavg", self.IaAVG," - Iavg" ,self.IbAVG," - Iavg", self.IcAVG)
-
-            except serial.SerialException as e:
-                print(f"Error al recibir datos: {e}")
-                break
-            time.sleep(0.01)
+        lector = SerialReader(self.ser, modo=self.modo_lectura)
+        try:
+            while True:
+                try:
+                    if self.ser is None or not self.ser.is_open:
+                        self.log.error("Error: puerto serie no inicializado o cerrado.")
+                        return
+
+                    # Bloquea hasta que llegan datos (o vence el timeout del lector)
+                    datos_recibidos = lector.leer()
+                    if not datos_recibidos:
+                        continue
+                    t_rx = self.reloj.monotonic()
+
+                    # Reensamblar tramas completas (puede haber varias o ninguna por lectura)
+                    self._alimentar(datos_recibidos, t_rx)
+
+                except serial.SerialException as e:
+                    self.log.error("Error al recibir datos: %s", e)
+                    break
+        finally:
+            lector.close()
+
+    def _alimentar(self, datos, t_rx):
+        """Pasa bytes recibidos al FrameParser (y al grabador de capturas, si hay uno) y procesa las tramas."""
+        grabador = self.grabador
+        if grabador is not None:
+            grabador.rx(datos, t_rx, self.parser.bytes_recibidos)
+        tramas = self.parser.feed(datos)
+        if grabador is not None:
+            for (header, _), posicion in zip(tramas, self.parser.posiciones):
+                grabador.trama(posicion, t_rx, header)
+        for header, trama in tramas:
+            self.procesar_trama(header, trama, t_rx)
+
+    def iniciar_grabacion(self, ruta_base, **opciones):
+        """Graba los bytes crudos RX/TX en capturas indexadas (ver CaptureRecorder)."""
+        self.detener_grabacion()
+        grabador = CaptureRecorder(ruta_base, **opciones)
+        grabador.start()
+        self.grabador = grabador
+        self.log.info("Grabando captura en %s", grabador.archivo_actual)
+
+    def detener_grabacion(self):
+        grabador, self.grabador = self.grabador, None
+        if grabador is not None:
+            grabador.stop()
+
+    def procesar_trama(self, header, trama, t_rx=None):
+        """
+        Interpreta una trama completa (cabecera incluida) entregada por el FrameParser.
+        `t_rx` es el instante (self.reloj.monotonic) en que se leyeron los datos del puerto.
+        """
+        if t_rx is None:
+            t_rx = self.reloj.monotonic()
+        if header == HEADER_ACK:            #Comando recibido OK
+            self.acks.recibido()
+
+        elif header == HEADER_ESTADO:
+            tension_mV = struct.unpack_from('<h', trama, 44)[0]
+            self.TensionSalida = tension_mV / 1000.0 *14.7 / 15.0 # Convertir mV a V
+            self.TensionSalidaMedia = self.TensionSalidaMedia + ( self.TensionSalida - self.TensionSalidaMedia ) * 0.1      #filtro FIR 1er orden
+            seq = self.tensiones.agregar(self.TensionSalida, t_rx)
+            self.lecturas_tension.publicar(MedicionTension(seq, t_rx, self.TensionSalida))
+            #print(f"{COLOR_ROJO}RX: TENSION {self.TensionSalida} ")
+
+        elif header == HEADER_MUESTRAS:
+            t_decodificacion = time.perf_counter()
+            fases = self.decoder.decodificar(trama)
+            if fases is None:
+                self.metricas.tramas_invalidas += 1
+                return
+            ia_array, ib_array, ic_array = fases
+            seq = self.muestras.agregar(ia_array, ib_array, ic_array, t_rx)
+
+            # Las tres fases de la misma trama se publican juntas en un objeto inmutable
+            medicion = MedicionCorrientes(
+                seq, t_rx,
+                self.decoder.rms(ia_array), self.decoder.rms(ib_array), self.decoder.rms(ic_array),
+                self.decoder.avg(ia_array), self.decoder.avg(ib_array), self.decoder.avg(ic_array),
+            )
+            self.corrientes.publicar(medicion)
+            self.metricas.decodificacion.observar(time.perf_counter() - t_decodificacion)
+
+            # Atributos sueltos: compatibilidad con código que los lee directamente
+            self.IaRMS, self.IbRMS, self.IcRMS = medicion.IaRMS, medicion.IbRMS, medicion.IcRMS
+            self.IaAVG, self.IbAVG, self.IcAVG = medicion.IaAVG, medicion.IbAVG, medicion.IcAVG
+
+    def abortar_ensayo(self):
+        """
+        Cancela el ensayo en curso desde otro hilo: la secuencia se detiene en el
+        próximo paso (las esperas de mediciones se liberan ya), envía el Stop y
+        ProbarReguladorParalelo lanza EnsayoAbortado. Sin ensayo en curso no hace
+        nada y devuelve False.
+        """
+        with self._lock_ensayo:
+            if not self._en_ensayo:
+                return False
+            self.abortado.set()
+        self.corrientes.interrumpir()
+        self.lecturas_tension.interrumpir()
+        return True
+
+    def _verificar_aborto(self):
+        if self.abortado.is_set():
+            raise EnsayoAbortado("Ensayo cancelado")
+
+    def wait_for_frames(self, n, timeout=None):
+        """
+        Espera `n` tramas de muestras nuevas (posteriores a la llamada) y devuelve sus
+        MedicionCorrientes. Si vence `timeout` devuelve las que hayan llegado.
+        """
+        self._verificar_aborto()
+        with self.traza.tramo("ventana_corrientes", n=n, timeout=timeout) as tramo:
+            mediciones = self.corrientes.esperar(n, timeout)
+            tramo["recibidas"] = len(mediciones)
+        self._verificar_aborto()
+        return mediciones
+
+    def esperar_tensiones(self, n, timeout=None):
+        """Igual que wait_for_frames pero con las lecturas de tensión (tramas de status)."""
+        self._verificar_aborto()
+        with self.traza.tramo("ventana_tension", n=n, timeout=timeout) as tramo:
+            lecturas = self.lecturas_tension.esperar(n, timeout)
+            tramo["recibidas"] = len(lecturas)
+        self._verificar_aborto()
+        return lecturas
+
+    def _ventana_completa(self, nombre, mediciones, n):
+        """True si la ventana trajo las `n` mediciones pedidas; si no, la anota en ventanas_incompletas."""
+        if len(mediciones) >= n:
+            return True
+        self.log.error("Ventana %s incompleta: %d de %d mediciones", nombre, len(mediciones), n)
+        self.ventanas_incompletas.append(nombre)
+        return False
+
+    def esperar_corrientes_estables(self, timeout):
+        """Espera régimen permanente en las corrientes de fase. `timeout` es el tiempo de asentamiento fijo anterior."""
+        detector = DetectorEstabilidad(CAMPOS_CORRIENTES, ventana=10, tolerancia_rel=0.02,
+                                       tolerancia_abs=5.0, duracion_minima=0.2)
+        self._verificar_aborto()
+        with self.traza.tramo("asentamiento_corrientes", CATEGORIA_ASENTAMIENTO, timeout=timeout) as tramo:
+            estable, espera = esperar_estabilidad(self.corrientes, detector, timeout)
+            tramo["estable"] = estable
+        self._verificar_aborto()
+        self._informar_asentamiento("corrientes", estable, espera, timeout)
+        return estable
+
+    def esperar_tension_estable(self, timeout):
+        """Espera régimen permanente en la tensión de salida. `timeout` es el tiempo de asentamiento fijo anterior."""
+        detector = DetectorEstabilidad(CAMPOS_TENSION, ventana=5, tolerancia_rel=0.005,
+                                       tolerancia_abs=0.02, duracion_minima=0.6)
+        self._verificar_aborto()
+        with self.traza.tramo("asentamiento_tension", CATEGORIA_ASENTAMIENTO, timeout=timeout) as tramo:
+            estable, espera = esperar_estabilidad(self.lecturas_tension, detector, timeout)
+            tramo["estable"] = estable
+        self._verificar_aborto()
+        self._informar_asentamiento("tensión", estable, espera, timeout)
+        return estable
+
+    def rampa(self, nombre, setear, valores, timeout):
+        """
+        Aplica los setpoints `valores` con `setear(valor, ack=True)`, avanzando en
+        cada ACK (`timeout` es el máximo por paso). Queda registrada como un tramo
+        de la traza con la cantidad de pasos que vencieron sin ACK.
+        """
+        with self.traza.tramo(nombre, CATEGORIA_RAMPA, desde=valores.start, hasta=valores.stop,
+                              paso=valores.step, pasos=len(valores)) as tramo:
+            sin_ack = 0
+            for valor in valores:
+                self._verificar_aborto()
+                if not esperar_ack(setear(valor, ack=True), timeout):
+                    sin_ack += 1
+            tramo["sin_ack"] = sin_ack
+
+    def _informar_asentamiento(self, senal, estable, espera, timeout):
+        if estable:
+            self.log.color(COLOR_MAGENTA, "Asentamiento %s: estable en %.2f s (máx. %s s)", senal, espera, timeout)
+        else:
+            self.log.warning("Asentamiento %s: sin estabilizar tras %s s", senal, timeout)
 
     def limpiar_nans_dict(self, d):
         """Limpia NaN/Inf dentro de un dict existente sin reemplazarlo."""
@@ -290,7 +542,7 @@ class DZETester:
             if isinstance(v, dict):
                 self.limpiar_nans_dict(v)
             elif isinstance(v, list):
-                d[k] = [self.limpiar_nans_dict_lista(x) for x in v]
+                d[k] = self.limpiar_nans_dict_lista(v)
             elif isinstance(v, float) and (math.isnan(v) or math.isinf(v)):
                 d[k] = None
         
@@ -310,7 +562,7 @@ class DZETester:
 
     def ProbarReguladorSerie(self):
         # Paso a modo regulador serie
-        print(f"{COLOR_VERDE}--- PROBANDO REGULADOR SERIE ---")
+        self.log.color(COLOR_VERDE, "--- PROBANDO REGULADOR SERIE ---")
     #     self.msg_gui = "Iniciando prueba regulador serie..."
     #     self.EstadoEnsayo = 1  # Ejecutando
 
@@ -486,63 +738,82 @@ class DZETester:
 
 
     def ProbarReguladorParalelo(self):
-        print(f"{COLOR_VERDE}--- PROBANDO REGULADOR PARALELO ---")
+        """Secuencia de ensayo completa. Cancelable con abortar_ensayo (lanza EnsayoAbortado)."""
+        self._iniciar_ensayo()
+        return self._correr_ensayo()
+
+    def _iniciar_ensayo(self):
+        # Desde acá abortar_ensayo tiene efecto, aunque la secuencia todavía no haya arrancado
+        with self._lock_ensayo:
+            self.abortado.clear()
+            self._en_ensayo = True
+
+    def _correr_ensayo(self):
+        try:
+            return self._secuencia_regulador_paralelo()
+        except EnsayoAbortado:
+            self.log.warning("Ensayo cancelado en la etapa %s: se detiene el inversor", self.traza.etapa_actual)
+            self.msg_gui = "Ensayo cancelado."
+            self.EstadoEnsayo = 3  # Ensayo ERROR
+            self.traza.etapa("stop")
+            esperar_ack(self.send("290000E02100", "Comando Stop", ack=True), 0.1)
+            self.traza.cerrar()
+            raise
+        finally:
+            # Ya se envió el Stop: las esperas de otros llamadores no deben ver el pedido
+            with self._lock_ensayo:
+                self._en_ensayo = False
+                self.abortado.clear()
+
+    def _secuencia_regulador_paralelo(self):
+        self.log.color(COLOR_VERDE, "--- PROBANDO REGULADOR PARALELO ---")
         self.msg_gui = "Iniciando prueba regulador paralelo..."
         self.EstadoEnsayo = 1  # Ejecutando
+        # Diccionario nuevo por ensayo: el devuelto por el anterior puede estar guardado (GET /jobs)
+        self.resultados = {}
+        self.traza = TrazaEnsayo("regulador_paralelo", self.reloj)
+        self.traza.etapa("configuracion")
 
         self.DispositivoFaseA = 0
         self.DispositivoFaseB = 0
         self.DispositivoFaseC = 0
+        # Ventanas de medición que no trajeron todo lo pedido (el ensayo no puede darse por bueno)
+        self.ventanas_incompletas = []
 
-        self.send("290000E03900", "ACK Error previo")
-        self.send("590000F00800890002", "Configurar modo regulador paralelo")
+        # Cada comando avanza al recibir su ACK; el tiempo indicado es el máximo (delay anterior)
+        esperar_ack(self.send("290000E03900", "ACK Error previo", ack=True), 0.1)
+        esperar_ack(self.send("590000F00800890002", "Configurar modo regulador paralelo", ack=True), 0.1)
 
         # Seteo corriente de carga
-        for mA in range(0, 201, 50):
-            self.SetearCorrienteCarga(mA)  
-            time.sleep(0.05)
+        self.rampa("rampa_carga", self.SetearCorrienteCarga, range(0, 201, 50), 0.05)
         # Start inversor y pido muestas Ia e Ib
-        self.send("F9000030080029050900FE030001FF00D10713","Datos Ia")  #07D1 in decimal is 2001  F9000030080029050900FE030001FF00D10713
-        self.send("190100A0080029050B00FC030002FF00D107110814","Datos Ib")  #0811 in decimal is 2065  0x190100A0080029050B00FC030002FF00D10711080F
-        time.sleep(0.1)
-        self.send("290000E01900", "Comando Start")
+        esperar_ack(self.send("F9000030080029050900FE030001FF00D10713","Datos Ia", ack=True), 0.1)  #07D1 in decimal is 2001  F9000030080029050900FE030001FF00D10713
+        esperar_ack(self.send("190100A0080029050B00FC030002FF00D107110814","Datos Ib", ack=True), 0.1)  #0811 in decimal is 2065  0x190100A0080029050B00FC030002FF00D10711080F
+        self._verificar_aborto()
+        esperar_ack(self.send("290000E01900", "Comando Start", ack=True), 0.1)
 
         # Seteo corriente de prueba del regulador paralelo de 0 a xxmA
-        for mA in range(0, 400, 100):
-            self.SetearCorrientePruebaRegParalelo(mA) 
-            time.sleep(0.1)
+        self.traza.etapa("falta_de_fase")
+        self.rampa("rampa_prueba", self.SetearCorrientePruebaRegParalelo, range(0, 400, 100), 0.1)
         # time.sleep(0.5) ------------------------------------ Reduccion de Tiempo de Prueba
 
 
         # 1) Ensayo falta de fase 
-        print(f"{COLOR_AMARILLO} 1)Ensayo falta de fase {COLOR_RESET}" )
-        IaRMS_cola = []
-        IbRMS_cola = []
-        IcRMS_cola = []
-
-        IaAVG_cola = [] 
-        IbAVG_cola = []
-        IcAVG_cola = []
-
-        for dt in range(20):
-            IaAVG_cola.append(self.IaAVG)
-            IaRMS_cola.append(self.IaRMS)  
-            IbAVG_cola.append(self.IbAVG)
-            IbRMS_cola.append(self.IbRMS)  
-            IcAVG_cola.append(self.IcAVG)
-            IcRMS_cola.append(self.IcRMS)  
-            time.sleep(0.1)
-
-        ValorMedioGeneral_A =  np.mean(IaAVG_cola)
-        ValorRMSGeneral_A =  np.mean(IaRMS_cola)
-        ValorMedioGeneral_B =  np.mean(IbAVG_cola)
-        ValorRMSGeneral_B =  np.mean(IbRMS_cola)
-        ValorMedioGeneral_C =  np.mean(IcAVG_cola)
-        ValorRMSGeneral_C =  np.mean(IcRMS_cola)
-
-
-        print(f"RMS: IaRMS {ValorRMSGeneral_A:5.1f} - IbRMS {ValorRMSGeneral_B:5.1f} - IcRMS {ValorRMSGeneral_C:5.1f}")
-        print(f"AVG: IaAVG {ValorMedioGeneral_A:5.1f} - IbAVG {ValorMedioGeneral_B:5.1f} - IcAVG {ValorMedioGeneral_C:5.1f}")
+        self.log.color(COLOR_AMARILLO, " 1)Ensayo falta de fase")
+        # Promedio sobre tramas nuevas y completas; la ventana anterior (20 x 0.1 s) es el máximo
+        tramas = self.wait_for_frames(TRAMAS_POR_MEDICION, timeout=2)
+        completa = self._ventana_completa("corrientes_1", tramas, TRAMAS_POR_MEDICION)
+        medias = promediar(tramas)
+        ValorMedioGeneral_A = medias["IaAVG"]
+        ValorRMSGeneral_A = medias["IaRMS"]
+        ValorMedioGeneral_B = medias["IbAVG"]
+        ValorRMSGeneral_B = medias["IbRMS"]
+        ValorMedioGeneral_C = medias["IcAVG"]
+        ValorRMSGeneral_C = medias["IcRMS"]
+
+
+        self.log.info("RMS: IaRMS %5.1f - IbRMS %5.1f - IcRMS %5.1f", ValorRMSGeneral_A, ValorRMSGeneral_B, ValorRMSGeneral_C)
+        self.log.info("AVG: IaAVG %5.1f - IbAVG %5.1f - IcAVG %5.1f", ValorMedioGeneral_A, ValorMedioGeneral_B, ValorMedioGeneral_C)
 
         self.resultados["corrientes_1"] = {
         "IaRMS": ValorRMSGeneral_A ,
@@ -554,26 +825,32 @@ class DZETester:
         }
 
 
-        maxRMS = max([ValorRMSGeneral_A,ValorRMSGeneral_B,ValorRMSGeneral_C])
-        desvio_RMS_entre_fases_maximo = 0.2*maxRMS
-        print(f"maxRMS:{maxRMS:5.1f} - DesvioRMSmax :{desvio_RMS_entre_fases_maximo:5.1f}")
+        if not completa:
+            # Sin la ventana completa no se evalúan las fases (vacía, todas darían OK)
+            self.DispositivoFaseA = self.DispositivoFaseB = self.DispositivoFaseC = 4  # Sin medición
+        else:
+            maxRMS = max([ValorRMSGeneral_A,ValorRMSGeneral_B,ValorRMSGeneral_C])
+            desvio_RMS_entre_fases_maximo = 0.2*maxRMS
+            self.log.info("maxRMS:%5.1f - DesvioRMSmax :%5.1f", maxRMS, desvio_RMS_entre_fases_maximo)
 
-        if(abs(ValorRMSGeneral_A-maxRMS) > desvio_RMS_entre_fases_maximo):
-            self.DispositivoFaseA = 3  # Fase Abierta
-        if(ValorMedioGeneral_A < -500):
-            self.DispositivoFaseA = 1  # Dispositivo Abierto
+            if(abs(ValorRMSGeneral_A-maxRMS) > desvio_RMS_entre_fases_maximo):
+                self.DispositivoFaseA = 3  # Fase Abierta
+            if(ValorMedioGeneral_A < -500):
+                self.DispositivoFaseA = 1  # Dispositivo Abierto
 
-        if(abs(ValorRMSGeneral_B-maxRMS) > desvio_RMS_entre_fases_maximo):
-            self.DispositivoFaseB = 3  # Fase Abierta
-        if(ValorMedioGeneral_B < -500):
-            self.DispositivoFaseB = 1  # Dispositivo Abierto
+            if(abs(ValorRMSGeneral_B-maxRMS) > desvio_RMS_entre_fases_maximo):
+                self.DispositivoFaseB = 3  # Fase Abierta
+            if(ValorMedioGeneral_B < -500):
+                self.DispositivoFaseB = 1  # Dispositivo Abierto
 
-        if(abs(ValorRMSGeneral_C-maxRMS) > desvio_RMS_entre_fases_maximo):
-            self.DispositivoFaseC = 3  # Fase Abierta
-        if(ValorMedioGeneral_C < -500):
-            self.DispositivoFaseC = 1  # Dispositivo Abierto
+            if(abs(ValorRMSGeneral_C-maxRMS) > desvio_RMS_entre_fases_maximo):
+                self.DispositivoFaseC = 3  # Fase Abierta
+            if(ValorMedioGeneral_C < -500):
+                self.DispositivoFaseC = 1  # Dispositivo Abierto
 
-        print(f"{COLOR_AMARILLO}Ensayo falta de fase: A: {self.DispositivoEstado[self.DispositivoFaseA]} - B: {self.DispositivoEstado[self.DispositivoFaseB]} - C: {self.DispositivoEstado[self.DispositivoFaseC]}")
+        self.log.color(COLOR_AMARILLO, "Ensayo falta de fase: A: %s - B: %s - C: %s",
+                       self.DispositivoEstado[self.DispositivoFaseA], self.DispositivoEstado[self.DispositivoFaseB],
+                       self.DispositivoEstado[self.DispositivoFaseC])
 
         self.resultados["state_corrientes_1"] ={
             "dispA":self.DispositivoEstado[self.DispositivoFaseA],
@@ -583,15 +860,12 @@ class DZETester:
 
         # 2) Ensayo dispositivo en no dispara
         # Seteo corriente de prueba del regulador paralelo de 0 a xxmA
-        print(f"{COLOR_AMARILLO} 2) Ensayo funcionamiento dispositivos {COLOR_RESET}" )
+        self.traza.etapa("conduccion_mos")
+        self.log.color(COLOR_AMARILLO, " 2) Ensayo funcionamiento dispositivos")
         
-        for mA in range(200, 401, 100):
-            self.SetearCorrienteCarga(mA)   
-            time.sleep(0.1)
+        self.rampa("rampa_carga", self.SetearCorrienteCarga, range(200, 401, 100), 0.1)
         
-        for mA in range(400, 1600, 50):
-            self.SetearCorrientePruebaRegParalelo(mA) 
-            time.sleep(0.05)
+        self.rampa("rampa_prueba", self.SetearCorrientePruebaRegParalelo, range(400, 1600, 50), 0.05)
         # time.sleep(1.5) ------------------------------------ Reduccion de Tiempo de Prueba
 
         # for mA in range(1500, 800, 100):
@@ -600,36 +874,23 @@ class DZETester:
         # time.sleep(0.3) ------------------------------------ Reduccion de Tiempo de Prueba
 
 
-        IaRMS_cola.clear()
-        IbRMS_cola.clear()
-        IcRMS_cola.clear()
-
-        IaAVG_cola.clear() 
-        IbAVG_cola.clear()
-        IcAVG_cola.clear()
-
-        for dt in range(20):
-            IaAVG_cola.append(self.IaAVG)
-            IaRMS_cola.append(self.IaRMS)  
-            IbAVG_cola.append(self.IbAVG)
-            IbRMS_cola.append(self.IbRMS)  
-            IcAVG_cola.append(self.IcAVG)
-            IcRMS_cola.append(self.IcRMS)  
-            time.sleep(0.1)
-
-        ValorMedioGeneral_A =  np.mean(IaAVG_cola)
-        ValorRMSGeneral_A =  np.mean(IaRMS_cola)
-        ValorMedioGeneral_B =  np.mean(IbAVG_cola)
-        ValorRMSGeneral_B =  np.mean(IbRMS_cola)
-        ValorMedioGeneral_C =  np.mean(IcAVG_cola)
-        ValorRMSGeneral_C =  np.mean(IcRMS_cola)
+        # Promedio sobre tramas nuevas y completas; la ventana anterior (20 x 0.1 s) es el máximo
+        tramas = self.wait_for_frames(TRAMAS_POR_MEDICION, timeout=2)
+        completa = self._ventana_completa("corrientes_2", tramas, TRAMAS_POR_MEDICION)
+        medias = promediar(tramas)
+        ValorMedioGeneral_A = medias["IaAVG"]
+        ValorRMSGeneral_A = medias["IaRMS"]
+        ValorMedioGeneral_B = medias["IbAVG"]
+        ValorRMSGeneral_B = medias["IbRMS"]
+        ValorMedioGeneral_C = medias["IcAVG"]
+        ValorRMSGeneral_C = medias["IcRMS"]
 
         # print("IaAVG",IaAVG_cola)
         # print("IbAVG",IbAVG_cola)
         # print("IcAVG",IcAVG_cola)
 
-        print(f"RMS: IaRMS {ValorRMSGeneral_A:5.1f} - IbRMS {ValorRMSGeneral_B:5.1f} - IcRMS {ValorRMSGeneral_C:5.1f}")
-        print(f"AVG: IaAVG {ValorMedioGeneral_A:5.1f} - IbAVG {ValorMedioGeneral_B:5.1f} - IcAVG {ValorMedioGeneral_C:5.1f}")
+        self.log.info("RMS: IaRMS %5.1f - IbRMS %5.1f - IcRMS %5.1f", ValorRMSGeneral_A, ValorRMSGeneral_B, ValorRMSGeneral_C)
+        self.log.info("AVG: IaAVG %5.1f - IbAVG %5.1f - IcAVG %5.1f", ValorMedioGeneral_A, ValorMedioGeneral_B, ValorMedioGeneral_C)
 
         self.resultados["corrientes_2"] = {
         "IaRMS": ValorRMSGeneral_A,
@@ -644,16 +905,21 @@ class DZETester:
         # comparacionRMS = 0.2*maxRMS
         # print(f"maxRMS:{maxRMS:5.1f} - DesvioRMSmax :{desvio_RMS_entre_fases_maximo:5.1f}")
 
-        if(ValorMedioGeneral_A < -500):
-            self.DispositivoFaseA = 1  # Dispositivo Abierto
+        if not completa:
+            self.DispositivoFaseA = self.DispositivoFaseB = self.DispositivoFaseC = 4  # Sin medición
+        else:
+            if(ValorMedioGeneral_A < -500):
+                self.DispositivoFaseA = 1  # Dispositivo Abierto
 
-        if(ValorMedioGeneral_B < -500):
-            self.DispositivoFaseB = 1  # Dispositivo Abierto
+            if(ValorMedioGeneral_B < -500):
+                self.DispositivoFaseB = 1  # Dispositivo Abierto
 
-        if(ValorMedioGeneral_C < -500):
-            self.DispositivoFaseC = 1  # Dispositivo Abierto
+            if(ValorMedioGeneral_C < -500):
+                self.DispositivoFaseC = 1  # Dispositivo Abierto
         
-        print(f"{COLOR_AMARILLO}Ensayo conducción MOS: A: {self.DispositivoEstado[self.DispositivoFaseA]} - B: {self.DispositivoEstado[self.DispositivoFaseB]} - C: {self.DispositivoEstado[self.DispositivoFaseC]}")
+        self.log.color(COLOR_AMARILLO, "Ensayo conducción MOS: A: %s - B: %s - C: %s",
+                       self.DispositivoEstado[self.DispositivoFaseA], self.DispositivoEstado[self.DispositivoFaseB],
+                       self.DispositivoEstado[self.DispositivoFaseC])
 
         self.resultados["state_corrientes_2"] ={
             "dispA":self.DispositivoEstado[self.DispositivoFaseA],
@@ -662,42 +928,48 @@ class DZETester:
         }
         
 
-        print(f"{COLOR_AMARILLO} 3) Ensayo regulacion de tensión {COLOR_RESET}" )
+        self.traza.etapa("regulacion_tension")
+        self.log.color(COLOR_AMARILLO, " 3) Ensayo regulacion de tensión")
 
-        for mA in range(1000, 100, 100):
-            self.SetearCorrienteCarga(mA)      
-            time.sleep(0.1)
+        self.rampa("rampa_carga", self.SetearCorrienteCarga, range(1000, 100, 100), 0.1)
         
         # time.sleep(4)          ------------------------------------ Reduccion de Tiempo de Prueba
 
-        for mA in range(1000, 1500, 100):
-            self.SetearCorrientePruebaRegParalelo(mA) 
-            time.sleep(0.1)
-        time.sleep(2)          #------------------------------------ Reduccion de Tiempo de Prueba
+        self.rampa("rampa_prueba", self.SetearCorrientePruebaRegParalelo, range(1000, 1500, 100), 0.1)
+        self.esperar_tension_estable(2)    # antes self.reloj.sleep(2): ahora es el máximo
 
 
-        Vout_cola = []
-        for dt in range(25):
-            Vout_cola.append(self.TensionSalida)
-            time.sleep(0.1)
-
-        Vout_medio = np.mean(Vout_cola)
+        # Lecturas de status nuevas (una por keep-alive); la ventana anterior (25 x 0.1 s) es el máximo
+        lecturas = self.esperar_tensiones(LECTURAS_TENSION, timeout=2.5)
+        self._ventana_completa("tension", lecturas, LECTURAS_TENSION)
+        # Sin lecturas no se usa la última TensionSalida: puede ser de antes del ensayo
+        Vout_medio = np.mean([l.TensionSalida for l in lecturas]) if lecturas else float("nan")
         self.resultados["Vout"] = Vout_medio
 
         # Evaluación del resultado del ensayo
-        if abs(Vout_medio - 14.45) > 0.3:
-            print(f"{COLOR_ROJO}--- ERROR EN ENSAYO REGULADOR PARALELO - Tensión: {Vout_medio:2.2f} V ---")
+        self._verificar_aborto()
+        if self.ventanas_incompletas:
+            self.log.error("--- ERROR EN ENSAYO REGULADOR PARALELO - Mediciones incompletas: %s ---",
+                           ", ".join(self.ventanas_incompletas))
+            self.msg_gui = "Error en ensayo regulador paralelo. Mediciones incompletas."
+            self.EstadoEnsayo = 3  # Ensayo ERROR
+            self.resultados["mediciones_incompletas"] = list(self.ventanas_incompletas)
+        elif abs(Vout_medio - 14.45) > 0.3:
+            self.log.error("--- ERROR EN ENSAYO REGULADOR PARALELO - Tensión: %2.2f V ---", Vout_medio)
             self.msg_gui = "Error en ensayo regulador paralelo. Tensión fuera de rango."
             self.EstadoEnsayo = 3  # Ensayo ERROR
         else:
-            print(f"{COLOR_VERDE}--- ENSAYO REGULADOR PARALELO OK - Tensión: {Vout_medio:2.2f} V ---")
+            self.log.color(COLOR_VERDE, "--- ENSAYO REGULADOR PARALELO OK - Tensión: %2.2f V ---", Vout_medio)
             self.msg_gui = "Ensayo regulador paralelo OK. Tensión dentro de rango."
             self.EstadoEnsayo = 2  # Ensayo OK
 
-        time.sleep(0.2)
-        self.send("290000E02100", "Comando Stop")
+        self.traza.etapa("stop")
+        self.reloj.sleep(0.2)
+        esperar_ack(self.send("290000E02100", "Comando Stop", ack=True), 0.1)
 
         self.resultados["general_state"] = self.EstadoEnsayo
+        self.resultados["traza"] = self.traza.cerrar()
+        self.metricas.ensayo_terminado(self.EstadoEnsayo, self.resultados["traza"]["duracion_ms"] / 1000)
 
         self.limpiar_nans_dict(self.resultados)
 
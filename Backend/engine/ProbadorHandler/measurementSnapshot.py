@@ -0,0 +1,99 @@
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+from engine.ProbadorHandler.virtualClock import RELOJ_REAL
+
+# Tramas por medición de corrientes y lecturas de status por medición de tensión
+TRAMAS_POR_MEDICION = 20
+LECTURAS_TENSION = 10
+
+
+@dataclass(frozen=True)
+class MedicionCorrientes:
+    """Valores de las tres fases calculados sobre una misma trama de muestras (a93f0050)."""
+    seq: int
+    t_rx: float
+    IaRMS: float
+    IbRMS: float
+    IcRMS: float
+    IaAVG: float
+    IbAVG: float
+    IcAVG: float
+
+
+@dataclass(frozen=True)
+class MedicionTension:
+    """Tensión de salida leída de una trama de status (2a050040)."""
+    seq: int
+    t_rx: float
+    TensionSalida: float
+
+
+class CanalMediciones:
+    """
+    Publicación de mediciones inmutables desde el hilo RX.
+
+    `actual` se reemplaza de una sola vez por cada trama (asignación atómica), así
+    un lector nunca mezcla fases de tramas distintas. `esperar(n)` bloquea hasta
+    que se publiquen `n` mediciones nuevas y las devuelve todas, sin duplicados
+    ni pérdidas (mientras quepan en el historial).
+    """
+
+    def __init__(self, historial=512, reloj=RELOJ_REAL):
+        self.reloj = reloj
+        self.actual = None
+        self._historial = deque(maxlen=historial)
+        self._cond = threading.Condition()
+        self._seq = -1
+        self._cerrado = False
+        self._interrupciones = 0
+
+    def reset(self):
+        with self._cond:
+            self.actual = None
+            self._historial.clear()
+            self._seq = -1
+            self._cerrado = False
+            self._cond.notify_all()
+
+    def cerrar(self):
+        """Libera a quienes esperan mediciones que ya no van a llegar (placa retirada)."""
+        with self._cond:
+            self._cerrado = True
+            self._cond.notify_all()
+
+    def interrumpir(self):
+        """Libera a quienes esperan en este momento (ensayo cancelado) sin cerrar el canal."""
+        with self._cond:
+            self._interrupciones += 1
+            self._cond.notify_all()
+
+    def publicar(self, medicion):
+        with self._cond:
+            self._seq = medicion.seq
+            self._historial.append(medicion)
+            self.actual = medicion
+            self._cond.notify_all()
+
+    def esperar(self, n, timeout=None):
+        """
+        Devuelve las próximas `n` mediciones publicadas después de la llamada.
+        Si vence `timeout` (o se cierra o interrumpe el canal) devuelve las que hayan
+        llegado, que pueden ser una lista corta o vacía.
+        """
+        with self._cond:
+            desde = self._seq + 1
+            interrupciones = self._interrupciones
+            self.reloj.esperar(self._cond, lambda: (self._cerrado or self._interrupciones != interrupciones
+                                                    or self._seq >= desde + n - 1), timeout)
+            return [m for m in self._historial if desde <= m.seq < desde + n]
+
+
+def promediar(mediciones):
+    """Promedio campo a campo de una lista de MedicionCorrientes (ceros si está vacía)."""
+    campos = ("IaRMS", "IbRMS", "IcRMS", "IaAVG", "IbAVG", "IcAVG")
+    if not mediciones:
+        return {campo: 0.0 for campo in campos}
+    n = len(mediciones)
+    return {campo: sum(getattr(m, campo) for m in mediciones) / n for campo in campos}
@@ -1,13 +1,24 @@
-import time
+from engine.ProbadorHandler.eventLog import registro
 
-def reiniciar_serial(dze_tester, inicializar_serial):
-    """Reinicia la comunicación serie con la placa."""
-    print("Reiniciando comunicación serie...")
+log = registro("serie")
+
+# Máximo que /reiniciar-serial retiene el pedido esperando que la placa vuelva a estar lista
+ESPERA_RECONEXION = 5.0
+
+def reiniciar_serial(dze_tester, reconectar, timeout=ESPERA_RECONEXION):
+    """
+    Reinicia la comunicación serie con la placa: cierra el puerto y llama a
+    `reconectar(timeout)`, que devuelve True si la placa volvió a estar lista a tiempo.
+    Si no, el vigilante de hot-plug la conecta cuando reaparezca.
+    """
+    log.info("Reiniciando comunicación serie...")
     if dze_tester:
         try:
             dze_tester.stop()
         except Exception as e:
-            print("Error cerrando puerto:", e)
-        time.sleep(2)
-    inicializar_serial()
+            log.error("Error cerrando puerto: %s", e)
+    if not reconectar(timeout):
+        log.warning("La placa no volvió a estar lista en %.0f s", timeout)
+        return {"status": "error", "message": f"Placa no encontrada tras {timeout:.0f} s; "
+                                              "se conectará al reaparecer"}
     return {"status": "ok", "message": "Comunicación serie reiniciada"}
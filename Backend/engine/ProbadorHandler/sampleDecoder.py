@@ -0,0 +1,56 @@
+import numpy as np
+
+# Las muestras comienzan después de la cabecera (4 bytes) y 4 bytes de encabezado
+# propio de la trama a93f0050. Son int16 little-endian intercalados: Ia, Ib, Ia, Ib...
+OFFSET_MUESTRAS = 8
+
+
+class SampleDecoder:
+    """
+    Decodificador de tramas de muestras de corriente de fase (a93f0050).
+
+    Trabaja directamente sobre los bytes de la trama con np.frombuffer: Ia e Ib
+    son vistas con paso 2 sobre la trama (sin copias) e Ic = -(Ia + Ib) se
+    calcula en un buffer int32 reutilizado entre tramas.
+    Las vistas devueltas son válidas hasta la próxima llamada a `decodificar`.
+    """
+
+    def __init__(self, max_muestras=2048):
+        self._ic = np.empty(max_muestras, dtype=np.int32)
+        self._cuadrados = np.empty(max_muestras, dtype=np.float64)
+
+    def _reservar(self, n):
+        if n > len(self._ic):
+            self._ic = np.empty(n, dtype=np.int32)
+            self._cuadrados = np.empty(n, dtype=np.float64)
+
+    def decodificar(self, trama):
+        """
+        Devuelve (ia, ib, ic) para la trama completa `trama` (cabecera incluida),
+        o None si la trama no contiene muestras.
+        """
+        n = (len(trama) - OFFSET_MUESTRAS) // 4   # pares Ia/Ib completos
+        if n <= 0:
+            return None
+        self._reservar(n)
+
+        muestras = np.frombuffer(trama, dtype='<i2', count=2 * n, offset=OFFSET_MUESTRAS)
+        ia = muestras[0::2]
+        ib = muestras[1::2]
+
+        # ia+ib+ic=0 -> ic = - (ia + ib), en int32 para no desbordar
+        ic = self._ic[:n]
+        np.add(ia, ib, out=ic, dtype=np.int32)
+        np.negative(ic, out=ic)
+        return ia, ib, ic
+
+    def rms(self, x):
+        """Valor RMS de `x` usando el buffer de cuadrados reutilizado."""
+        cuadrados = self._cuadrados[:len(x)]
+        np.multiply(x, x, out=cuadrados, dtype=np.float64)
+        return float(np.sqrt(cuadrados.mean()))
+
+    @staticmethod
+    def avg(x):
+        """Valor medio de `x`."""
+        return float(x.mean(dtype=np.float64))
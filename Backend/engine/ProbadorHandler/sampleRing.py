@@ -0,0 +1,153 @@
+import numpy as np
+
+
+class SampleRing:
+    """
+    Buffer circular preasignado de muestras por fase (Ia, Ib, Ic).
+
+    Cada fase se guarda en un arreglo de 2*capacidad donde cada muestra se escribe
+    dos veces (posición i e i+capacidad): así cualquier ventana de hasta
+    `capacidad` muestras es contigua y se devuelve como vista, sin copias.
+    Además guarda por trama su número de secuencia, instante de recepción y
+    posición absoluta de su primera muestra.
+
+    Escribe un solo hilo (RX). Las vistas devueltas pueden ser sobrescritas por
+    tramas nuevas: quien necesite conservarlas debe copiarlas, y puede usar
+    `seq` para verificar que la ventana no cambió mientras la leía (o usar
+    `copiar_ultimas`, que lo hace).
+    """
+
+    def __init__(self, capacidad=2**17, capacidad_tramas=1024):
+        self.capacidad = capacidad
+        self._fases = np.zeros((3, 2 * capacidad), dtype=np.int32)
+        self.total = 0          # muestras escritas desde el inicio (posición absoluta)
+
+        self.capacidad_tramas = capacidad_tramas
+        self._seq = np.full(capacidad_tramas, -1, dtype=np.int64)
+        self._t_rx = np.zeros(capacidad_tramas, dtype=np.float64)
+        self._inicio = np.zeros(capacidad_tramas, dtype=np.int64)
+        self._largo = np.zeros(capacidad_tramas, dtype=np.int32)
+        self.seq = -1           # secuencia de la última trama guardada
+
+    def reset(self):
+        self.total = 0
+        self.seq = -1
+        self._seq.fill(-1)
+
+    def agregar(self, ia, ib, ic, t_rx):
+        """Guarda las muestras de una trama y devuelve su número de secuencia."""
+        n = len(ia)
+        if n > self.capacidad:
+            ia, ib, ic = ia[-self.capacidad:], ib[-self.capacidad:], ic[-self.capacidad:]
+            n = self.capacidad
+        pos = self.total % self.capacidad
+        primero = min(n, self.capacidad - pos)
+        resto = n - primero
+        for fila, datos in enumerate((ia, ib, ic)):
+            destino = self._fases[fila]
+            destino[pos:pos + primero] = datos[:primero]
+            destino[pos + self.capacidad:pos + self.capacidad + primero] = datos[:primero]
+            if resto:
+                destino[0:resto] = datos[primero:]
+                destino[self.capacidad:self.capacidad + resto] = datos[primero:]
+
+        seq = self.seq + 1
+        k = seq % self.capacidad_tramas
+        self._seq[k] = seq
+        self._t_rx[k] = t_rx
+        self._inicio[k] = self.total
+        self._largo[k] = n
+
+        self.total += n
+        self.seq = seq      # publicar al final: los lectores ven la trama completa
+        return seq
+
+    def ultimas_muestras(self, n):
+        """Vistas (ia, ib, ic) de las últimas `n` muestras (acotado a la capacidad)."""
+        return self._vistas(self.total, n)
+
+    def _vistas(self, total, n):
+        n = min(n, self.capacidad, total)
+        fin = total % self.capacidad + self.capacidad
+        return tuple(self._fases[fila, fin - n:fin] for fila in range(3))
+
+    def copiar_ultimas(self, n, paso=1, intentos=3):
+        """
+        Copia de las últimas `n` muestras, una de cada `paso` (la última siempre
+        incluida), para lectores de otros hilos: (total, seq, (ia, ib, ic)).
+        Si el RX sobrescribió la ventana mientras se copiaba se reintenta; None
+        si no se logró en `intentos`.
+        """
+        for _ in range(intentos):
+            seq, total = self.seq, self.total
+            vistas = self._vistas(total, n)
+            inicio = (len(vistas[0]) - 1) % paso if len(vistas[0]) else 0
+            copias = tuple(v[inicio::paso].copy() for v in vistas)
+            # Lo escrito durante la copia ocupa las posiciones siguientes a `total`:
+            # pisa la ventana solo si alcanzó a dar la vuelta hasta su comienzo
+            if self.total - total <= self.capacidad - len(vistas[0]):
+                return total, seq, copias
+        return None
+
+    def muestras_desde(self, posicion):
+        """Vistas de las muestras a partir de la posición absoluta `posicion`."""
+        return self.ultimas_muestras(self.total - max(posicion, self.total - self.capacidad))
+
+    def trama(self, seq):
+        """
+        Devuelve (t_rx, ia, ib, ic) de la trama `seq`, o None si ya fue sobrescrita.
+        """
+        k = seq % self.capacidad_tramas
+        if seq < 0 or self._seq[k] != seq:
+            return None
+        inicio = int(self._inicio[k])
+        largo = int(self._largo[k])
+        if inicio < self.total - self.capacidad:
+            return None
+        # Si la trama cruza el final del anillo, la copia espejo la mantiene contigua
+        pos = inicio % self.capacidad
+        fases = tuple(self._fases[fila, pos:pos + largo] for fila in range(3))
+        return (float(self._t_rx[k]),) + fases
+
+    def tramas_desde(self, t):
+        """Números de secuencia de las tramas recibidas en o después del instante `t`."""
+        validas = (self._seq >= 0) & (self._t_rx >= t)
+        return sorted(int(s) for s in self._seq[validas])
+
+
+class ValueRing:
+    """Buffer circular preasignado de valores escalares con instante de recepción (p. ej. tensión de salida)."""
+
+    def __init__(self, capacidad=4096):
+        self.capacidad = capacidad
+        self._valores = np.zeros(2 * capacidad, dtype=np.float64)
+        self._t = np.zeros(2 * capacidad, dtype=np.float64)
+        self.total = 0
+
+    def reset(self):
+        self.total = 0
+
+    def agregar(self, valor, t_rx):
+        """Guarda un valor y devuelve su número de secuencia."""
+        pos = self.total % self.capacidad
+        self._valores[pos] = self._valores[pos + self.capacidad] = valor
+        self._t[pos] = self._t[pos + self.capacidad] = t_rx
+        self.total += 1
+        return self.total - 1
+
+    def ultimos(self, n):
+        """Vistas (t, valores) de los últimos `n` valores."""
+        n = min(n, self.capacidad, self.total)
+        fin = self.total % self.capacidad + self.capacidad
+        return self._t[fin - n:fin], self._valores[fin - n:fin]
+
+    def copiar_ultimos(self, n):
+        """Copia (t, valores) de los últimos `n` valores, para lectores de otros hilos."""
+        tiempos, valores = self.ultimos(n)
+        return tiempos.copy(), valores.copy()
+
+    def desde(self, t):
+        """Vistas (t, valores) de los valores recibidos en o después del instante `t`."""
+        tiempos, valores = self.ultimos(self.capacidad)
+        i = int(np.searchsorted(tiempos, t))
+        return tiempos[i:], valores[i:]
@@ -0,0 +1,86 @@
+import os
+import selectors
+
+import serial
+
+from engine.ProbadorHandler.eventLog import registro
+
+log = registro("serie")
+
+MODO_BLOQUEANTE = "bloqueante"
+MODO_SELECTOR = "selector"
+
+
+class PlacaDesconectada(serial.SerialException):
+    """La placa fue retirada (hot-plug): se aborta lo que esté en curso en vez de esperar timeouts."""
+
+
+class SerialReader:
+    """
+    Lectura del puerto serie guiada por eventos (sin sondeo de in_waiting + sleep).
+
+    Modos:
+    - "bloqueante": read() con timeout; el hilo duerme en el driver hasta que
+      llega al menos un byte y luego toma todo lo disponible.
+    - "selector" (POSIX): espera con un selector sobre el descriptor del puerto
+      y lee con os.readv directamente en un buffer preasignado.
+
+    `leer()` devuelve los bytes recibidos (vacío si venció el timeout). En modo
+    selector se devuelve una vista del buffer interno, válida hasta la próxima lectura.
+    """
+
+    def __init__(self, ser, modo=MODO_BLOQUEANTE, timeout=0.2, tam_buffer=16384):
+        self.ser = ser
+        self.timeout = timeout
+        self._selector = None
+
+        if modo == MODO_SELECTOR and not self._selector_disponible():
+            log.warning("Modo selector no disponible en esta plataforma, usando lectura bloqueante.")
+            modo = MODO_BLOQUEANTE
+        self.modo = modo
+
+        if modo == MODO_SELECTOR:
+            self._fd = ser.fileno()
+            self._buf = bytearray(tam_buffer)
+            self._vista = memoryview(self._buf)
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(self._fd, selectors.EVENT_READ)
+        else:
+            self.ser.timeout = timeout
+
+    def _selector_disponible(self):
+        return os.name == "posix" and hasattr(os, "readv") and hasattr(self.ser, "fileno")
+
+    def leer(self):
+        if self.modo == MODO_SELECTOR:
+            return self._leer_selector()
+        # Bloquea hasta 1 byte (o timeout) y luego toma lo que haya en el buffer del SO
+        try:
+            return self.ser.read(self.ser.in_waiting or 1)
+        except (TypeError, OSError, AttributeError) as e:
+            # pyserial falla así si otro hilo cierra el puerto durante la lectura
+            if not self.ser.is_open:
+                return b""
+            raise serial.SerialException(f"Error leyendo el puerto: {e}")
+
+    def _leer_selector(self):
+        if not self._selector.select(self.timeout):
+            return b""
+        try:
+            n = os.readv(self._fd, [self._buf])
+        except BlockingIOError:
+            return b""
+        except OSError as e:
+            raise serial.SerialException(f"Error leyendo el puerto: {e}")
+        if n == 0:
+            # El descriptor está listo pero no hay datos: dispositivo desconectado
+            raise serial.SerialException("El dispositivo no devolvió datos (¿desconectado?)")
+        return self._vista[:n]
+
+    def close(self):
+        if self._selector is not None:
+            try:
+                self._selector.close()
+            except Exception:
+                pass
+            self._selector = None
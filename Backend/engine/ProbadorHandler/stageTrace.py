@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+from engine.ProbadorHandler.virtualClock import RELOJ_REAL
+
+# Categorías de tramo (columna "cat" en Perfetto)
+CATEGORIA_ETAPA = "etapa"           # configuración, falta de fase, conducción MOS, regulación, stop
+CATEGORIA_RAMPA = "rampa"           # secuencia de setpoints con ACK
+CATEGORIA_MEDICION = "medicion"     # ventanas de tramas / lecturas de tensión
+CATEGORIA_ASENTAMIENTO = "asentamiento"
+
+
+class TrazaEnsayo:
+    """
+    Tramos temporizados de un ensayo (etapas, rampas y ventanas de medición).
+
+    Las etapas son secuenciales: `etapa(nombre)` cierra la anterior y abre la
+    siguiente. Los tramos (`with traza.tramo(...)`) se anidan dentro de la etapa
+    en curso. Los tiempos salen de `reloj`, así que con un RelojVirtual la traza
+    muestra tiempo simulado y es reproducible entre corridas.
+    """
+
+    def __init__(self, ensayo, reloj=RELOJ_REAL):
+        self.ensayo = ensayo
+        self.reloj = reloj
+        self.inicio_epoch = time.time()
+        self.activa = True
+        self._t0 = reloj.perf_counter()
+        self._tramos = []
+        self._pila = []                 # índices de los tramos abiertos
+        self._etapa = None
+
+    def _ahora(self):
+        return self.reloj.perf_counter() - self._t0
+
+    def _abrir(self, nombre, categoria, args):
+        self._tramos.append({
+            "nombre": nombre,
+            "categoria": categoria,
+            "inicio_ms": self._ahora() * 1000,
+            "duracion_ms": None,
+            "nivel": len(self._pila),
+            "args": args,
+        })
+        self._pila.append(len(self._tramos) - 1)
+        return self._tramos[-1]
+
+    def _cerrar(self, indice):
+        # Cierra también los tramos hijos que hayan quedado abiertos (excepción en el medio)
+        while self._pila:
+            i = self._pila.pop()
+            tramo = self._tramos[i]
+            tramo["duracion_ms"] = self._ahora() * 1000 - tramo["inicio_ms"]
+            if i == indice:
+                break
+
+    def etapa(self, nombre, **args):
+        """Cierra la etapa en curso (y lo que tenga abierto) y abre `nombre`."""
+        if not self.activa:
+            return
+        if self._etapa in self._pila:
+            self._cerrar(self._etapa)
+        self._etapa = len(self._tramos)
+        self._abrir(nombre, CATEGORIA_ETAPA, args)
+
+    @property
+    def etapa_actual(self):
+        """Nombre de la etapa en curso (None fuera de un ensayo)."""
+        etapa = self._etapa
+        if self.activa and etapa is not None and etapa in self._pila:
+            return self._tramos[etapa]["nombre"]
+        return None
+
+    def tramo(self, nombre, categoria=CATEGORIA_MEDICION, **args):
+        """Context manager que mide el bloque; devuelve el dict de args para completar datos al salir."""
+        if not self.activa:
+            return nullcontext(args)
+        return self._tramo(nombre, categoria, args)
+
+    @contextmanager
+    def _tramo(self, nombre, categoria, args):
+        tramo = self._abrir(nombre, categoria, args)
+        indice = len(self._tramos) - 1
+        try:
+            yield tramo["args"]
+        finally:
+            if indice in self._pila:
+                self._cerrar(indice)
+
+    def cerrar(self):
+        """Cierra todo lo abierto y devuelve el resumen para los resultados del ensayo."""
+        if self.activa:
+            if self._pila:
+                self._cerrar(self._pila[0])
+            self.activa = False
+        return self.resumen()
+
+    def resumen(self):
+        """Dict serializable: {ensayo, inicio_epoch, duracion_ms, tramos: [...]} con tiempos en ms."""
+        tramos = []
+        for t in self._tramos:
+            t = dict(t, inicio_ms=round(t["inicio_ms"], 3))
+            if t["duracion_ms"] is not None:
+                t["duracion_ms"] = round(t["duracion_ms"], 3)
+            tramos.append(t)
+        fin = max((t["inicio_ms"] + (t["duracion_ms"] or 0) for t in tramos), default=0.0)
+        return {
+            "ensayo": self.ensayo,
+            "inicio_epoch": self.inicio_epoch,
+            "duracion_ms": round(fin, 3),
+            "tramos": tramos,
+        }
+
+
+# Traza inerte para los helpers de medición llamados fuera de un ensayo
+TRAZA_INACTIVA = TrazaEnsayo("inactiva")
+TRAZA_INACTIVA.activa = False
+
+
+# ----------------------------
+# Exportación Chrome / Perfetto (Trace Event Format)
+# ----------------------------
+def eventos_chrome(traza, pid=1, tid=1, nombre=None):
+    """Eventos "X" (completos) de una traza resumida; cada ensayo va en su propio hilo (`tid`)."""
+    eventos = [{
+        "name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+        "args": {"name": nombre or traza["ensayo"]},
+    }]
+    for t in traza["tramos"]:
+        if t["duracion_ms"] is None:
+            continue
+        eventos.append({
+            "name": t["nombre"],
+            "cat": t["categoria"],
+            "ph": "X",
+            "ts": round(t["inicio_ms"] * 1000, 3),
+            "dur": round(t["duracion_ms"] * 1000, 3),
+            "pid": pid,
+            "tid": tid,
+            "args": t["args"],
+        })
+    return eventos
+
+
+def a_chrome(trazas, proceso="DZE Tester"):
+    """
+    Documento de traza para chrome://tracing o ui.perfetto.dev.
+    `trazas` es un dict {nombre: traza} o una lista de trazas; cada una se dibuja
+    en una fila propia con el tiempo relativo al inicio de su ensayo.
+    """
+    if isinstance(trazas, dict) and "tramos" in trazas:
+        trazas = [trazas]
+    items = trazas.items() if isinstance(trazas, dict) else ((None, t) for t in trazas)
+    eventos = [{"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": proceso}}]
+    for tid, (nombre, traza) in enumerate(items, start=1):
+        eventos += eventos_chrome(traza, pid=1, tid=tid, nombre=nombre)
+    return {"traceEvents": eventos, "displayTimeUnit": "ms"}
+
+
+def exportar_chrome(ruta, trazas, proceso="DZE Tester"):
+    with open(ruta, "w") as f:
+        json.dump(a_chrome(trazas, proceso), f, default=float)
+    return ruta
+
+
+def totales_por_tramo(trazas):
+    """{(categoria, nombre): {n, total_ms, media_ms, max_ms}} sumando los tramos de varias trazas."""
+    out = {}
+    for traza in trazas:
+        for t in traza["tramos"]:
+            if t["duracion_ms"] is None:
+                continue
+            acc = out.setdefault((t["categoria"], t["nombre"]), {"n": 0, "total_ms": 0.0, "max_ms": 0.0})
+            acc["n"] += 1
+            acc["total_ms"] += t["duracion_ms"]
+            acc["max_ms"] = max(acc["max_ms"], t["duracion_ms"])
+    for acc in out.values():
+        acc["media_ms"] = acc["total_ms"] / acc["n"]
+    return out
+
+
+def main():
+    """Convierte resultados guardados (JSON de /testregulator o de virtualRunner) en una traza Perfetto."""
+    parser = argparse.ArgumentParser(description="Traza por etapas de ensayos guardados")
+    parser.add_argument("resultados", nargs="+", help="JSON con 'traza' o un dict {nombre: resultados}")
+    parser.add_argument("-o", "--salida", default="traza_ensayos.json", help="Archivo de traza Chrome/Perfetto")
+    args = parser.parse_args()
+
+    trazas = {}
+    for ruta in args.resultados:
+        with open(ruta) as f:
+            datos = json.load(f)
+        datos = datos.get("resultado", datos)        # respuesta completa de /testregulator
+        if "traza" in datos:
+            datos = {os.path.basename(ruta): datos}
+        for nombre, resultados in datos.items():
+            if isinstance(resultados, dict) and "traza" in resultados:
+                trazas[nombre] = resultados["traza"]
+    if not trazas:
+        parser.error("ningún resultado contiene 'traza'")
+
+    exportar_chrome(args.salida, trazas)
+    print(f"{len(trazas)} ensayos -> {args.salida} (abrir en https://ui.perfetto.dev)")
+    for (categoria, nombre), acc in sorted(totales_por_tramo(trazas.values()).items(),
+                                           key=lambda kv: -kv[1]["total_ms"]):
+        print(f"  {categoria:<13} {nombre:<28} n={acc['n']:<3} media {acc['media_ms']:9.1f} ms  "
+              f"máx {acc['max_ms']:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
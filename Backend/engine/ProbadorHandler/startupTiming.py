@@ -0,0 +1,58 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# ----------------------------
+# Desglose del tiempo de arranque del servidor
+# ----------------------------
+# Las etapas secuenciales (imports, registro, bancos, Flask, placas) se marcan
+# con `marca`; lo que ocurre fuera de orden o en otros hilos (crear el tester
+# de un banco al conectarse la placa) se mide con `medir`. Para el detalle por
+# módulo de los imports: python -X importtime main.py
+
+
+class CronometroArranque:
+    """Tiempos de arranque relativos a `inicio` (time.perf_counter tomado antes de los imports)."""
+
+    def __init__(self, inicio=None):
+        self.inicio = time.perf_counter() if inicio is None else inicio
+        self._ultimo = self.inicio
+        self._etapas = []
+        self._lock = threading.Lock()
+
+    def _agregar(self, nombre, desde, hasta):
+        with self._lock:
+            self._etapas.append({
+                "nombre": nombre,
+                "inicio_ms": round((desde - self.inicio) * 1000, 1),
+                "ms": round((hasta - desde) * 1000, 1),
+            })
+
+    def marca(self, nombre):
+        """Cierra la etapa secuencial `nombre`: el tiempo desde la marca anterior."""
+        ahora = time.perf_counter()
+        with self._lock:
+            desde, self._ultimo = self._ultimo, ahora
+        self._agregar(nombre, desde, ahora)
+
+    @contextmanager
+    def medir(self, nombre):
+        """Mide el bloque como etapa propia, sin mover la marca secuencial."""
+        desde = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._agregar(nombre, desde, time.perf_counter())
+
+    def total_ms(self):
+        return round((self._ultimo - self.inicio) * 1000, 1)
+
+    def resumen(self):
+        """Dict serializable: {total_ms, etapas: [{nombre, inicio_ms, ms}]} (total hasta la última marca)."""
+        with self._lock:
+            etapas = list(self._etapas)
+        return {"total_ms": self.total_ms(), "etapas": etapas}
+
+    def texto(self):
+        etapas = ", ".join(f"{e['nombre']} {e['ms']:.0f} ms" for e in self.resumen()["etapas"])
+        return f"Arranque en {self.total_ms():.0f} ms ({etapas})"
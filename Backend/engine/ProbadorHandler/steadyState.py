@@ -0,0 +1,83 @@
+from collections import deque
+
+import numpy as np
+
+CAMPOS_CORRIENTES = ("IaRMS", "IbRMS", "IcRMS", "IaAVG", "IbAVG", "IcAVG")
+CAMPOS_TENSION = ("TensionSalida",)
+
+
+class DetectorEstabilidad:
+    """
+    Detecta régimen permanente sobre una ventana deslizante de mediciones.
+
+    Una señal se considera estable cuando, dentro de la ventana, su desvío
+    estándar y la deriva de la recta de ajuste (pendiente * duración de la
+    ventana) quedan por debajo de la tolerancia: max(tolerancia_rel * |media|,
+    tolerancia_abs). Tienen que cumplirlo todos los `campos` a la vez, y la
+    ventana tiene que abarcar al menos `duracion_minima` segundos para que una
+    tasa de tramas alta no acorte la observación.
+    """
+
+    def __init__(self, campos, ventana=10, tolerancia_rel=0.02, tolerancia_abs=5.0, duracion_minima=0.2):
+        self.campos = campos
+        self.ventana = ventana
+        self.duracion_minima = duracion_minima
+        self.tolerancia_rel = tolerancia_rel
+        self.tolerancia_abs = tolerancia_abs
+        # Sin límite fijo: se descarta lo que quede fuera de la ventana al agregar
+        self._t = deque()
+        self._valores = deque()
+
+    def reset(self):
+        self._t.clear()
+        self._valores.clear()
+
+    def agregar(self, medicion):
+        self._t.append(medicion.t_rx)
+        self._valores.append([getattr(medicion, campo) for campo in self.campos])
+        # Se conservan al menos `ventana` mediciones y las necesarias para cubrir duracion_minima
+        while len(self._t) > self.ventana and self._t[-1] - self._t[1] >= self.duracion_minima:
+            self._t.popleft()
+            self._valores.popleft()
+
+    def estable(self):
+        if len(self._valores) < self.ventana or self._t[-1] - self._t[0] < self.duracion_minima:
+            return False
+        t = np.fromiter(self._t, dtype=np.float64)
+        t -= t.mean()
+        valores = np.array(self._valores, dtype=np.float64)     # (ventana, campos)
+        media = valores.mean(axis=0)
+        tolerancia = np.maximum(self.tolerancia_rel * np.abs(media), self.tolerancia_abs)
+
+        if np.any(valores.std(axis=0) > tolerancia):
+            return False
+        denominador = float(np.dot(t, t))
+        if denominador > 0:
+            pendiente = t @ (valores - media) / denominador
+            deriva = np.abs(pendiente) * (t[-1] - t[0])
+            if np.any(deriva > tolerancia):
+                return False
+        return True
+
+
+def esperar_estabilidad(canal, detector, timeout):
+    """
+    Consume mediciones nuevas de `canal` (CanalMediciones) hasta que `detector`
+    indique régimen permanente o venza `timeout`. Devuelve (estable, segundos).
+    """
+    reloj = canal.reloj
+    inicio = reloj.monotonic()
+    limite = inicio + timeout
+    detector.reset()
+    while True:
+        restante = limite - reloj.monotonic()
+        if restante <= 0:
+            return False, reloj.monotonic() - inicio
+        nuevas = canal.esperar(1, timeout=restante)
+        if not nuevas:
+            # Venció el tiempo o se cerró el canal (placa retirada)
+            return False, reloj.monotonic() - inicio
+        for medicion in nuevas:
+            detector.agregar(medicion)
+        if detector.estable():
+            return True, reloj.monotonic() - inicio
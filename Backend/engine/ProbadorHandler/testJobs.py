@@ -0,0 +1,179 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from engine.ProbadorHandler.eventLog import registro
+from engine.ProbadorHandler.fixtureRegistry import LISTO
+
+log = registro("ensayos")
+
+# Estados de un trabajo de ensayo
+EN_COLA = "en_cola"
+EJECUTANDO = "ejecutando"
+TERMINADO = "terminado"
+FALLIDO = "error"
+
+# Trabajos terminados que se conservan para consultar su resultado
+HISTORIAL_TRABAJOS = 100
+
+# Un ensayo pedido durante el arranque espera a que su banco termine de conectarse y configurarse
+ESPERA_PREPARACION = 10.0
+
+
+class TrabajoEnsayo:
+    """Un ensayo pedido por HTTP: se encola en su banco y se consulta por id hasta que termina."""
+
+    def __init__(self, fixture):
+        self.id = uuid.uuid4().hex[:12]
+        self.fixture = fixture
+        self.estado = EN_COLA
+        self.creado = time.time()
+        self.inicio = None
+        self.fin = None
+        self.resultado = None
+        self.error = None
+        self._hecho = threading.Event()
+
+    @property
+    def activo(self):
+        return self.estado in (EN_COLA, EJECUTANDO)
+
+    def esperar(self, timeout=None):
+        """Bloquea hasta que el trabajo termina; devuelve True si terminó."""
+        return self._hecho.wait(timeout)
+
+    def _terminar(self, estado, resultado=None, error=None):
+        self.resultado = resultado
+        self.error = error
+        self.fin = time.time()
+        self.estado = estado
+        self._hecho.set()
+
+    def a_dict(self):
+        out = {
+            "id": self.id,
+            "fixture": self.fixture.id,
+            "estado": self.estado,
+            "creado": self.creado,
+            "inicio": self.inicio,
+            "fin": self.fin,
+        }
+        if self.estado == EN_COLA:
+            out["preparacion"] = self.fixture.preparacion
+        if self.estado == EJECUTANDO:
+            # Progreso: etapa de la traza del ensayo en curso y mensaje para la GUI
+            tester = self.fixture.tester
+            out["progreso"] = {"etapa": tester.traza.etapa_actual, "msg_gui": tester.msg_gui}
+        if self.estado == TERMINADO:
+            out["resultado"] = self.resultado
+        if self.error is not None:
+            out["error"] = self.error
+        return out
+
+
+class ColaEnsayos:
+    """
+    Cola de ensayos de un banco con un hilo trabajador persistente.
+
+    Los ensayos del mismo banco se ejecutan de a uno (además se toma
+    `fixture.ensayo`, así tampoco se solapan con otros caminos que ensayen el
+    banco). Pedir un ensayo mientras hay uno en cola o en curso devuelve ese
+    mismo trabajo: un doble clic o un reintento del navegador no lanza un segundo
+    ensayo sobre el mismo puerto.
+    """
+
+    def __init__(self, fixture, al_terminar=None, espera_preparacion=ESPERA_PREPARACION):
+        self.fixture = fixture
+        self.espera_preparacion = espera_preparacion
+        self._al_terminar = al_terminar
+        self._cola = queue.Queue()
+        self._activo = None
+        self._lock = threading.Lock()
+        self._hilo = threading.Thread(target=self._trabajar, daemon=True)
+        self._hilo.start()
+
+    def enviar(self):
+        """Devuelve (trabajo, nuevo). Si ya hay uno activo se devuelve ese con nuevo=False."""
+        with self._lock:
+            if self._activo is not None and self._activo.activo:
+                return self._activo, False
+            trabajo = TrabajoEnsayo(self.fixture)
+            self._activo = trabajo
+            self._cola.put(trabajo)
+            return trabajo, True
+
+    def _trabajar(self):
+        while True:
+            trabajo = self._cola.get()
+            self._ejecutar(trabajo)
+            if self._al_terminar is not None:
+                self._al_terminar(trabajo)
+
+    def _registrar(self, mensaje, nivel=logging.INFO):
+        log.log(nivel, mensaje, extra={"fixture": self.fixture.id})
+
+    def _ejecutar(self, trabajo):
+        fixture = self.fixture
+        with fixture.ensayo:
+            preparacion = fixture.esperar_listo(self.espera_preparacion)
+            if preparacion != LISTO and fixture.conectado:
+                self._registrar(f"Ensayo {trabajo.id}: la placa no confirmó la configuración ({preparacion})",
+                                logging.WARNING)
+            if not fixture.conectado:
+                trabajo._terminar(FALLIDO, error=f"Banco {fixture.id} sin placa conectada")
+                self._registrar(f"Ensayo {trabajo.id}: {trabajo.error}", logging.ERROR)
+                return
+            trabajo.inicio = time.time()
+            trabajo.estado = EJECUTANDO
+            self._registrar(f"Ensayo {trabajo.id} iniciado")
+            try:
+                resultado = fixture.tester.ProbarReguladorParalelo()
+            except Exception as e:
+                fixture.tester.metricas.ensayo_abortado()
+                trabajo._terminar(FALLIDO, error=str(e))
+                self._registrar(f"Ensayo {trabajo.id} abortado: {e}", logging.ERROR)
+                return
+            trabajo._terminar(TERMINADO, resultado=resultado)
+            self._registrar(f"Ensayo {trabajo.id} terminado: {fixture.tester.msg_gui}")
+
+
+class GestorTrabajos:
+    """
+    Colas de ensayo por banco y registro de trabajos por id (los terminados se acotan a `historial`).
+    El inicio y el fin de cada ensayo se registran en `dze.ensayos` (ver eventLog).
+    """
+
+    def __init__(self, historial=HISTORIAL_TRABAJOS):
+        self.historial = historial
+        self._colas = {}
+        self._trabajos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def enviar(self, fixture):
+        """Encola un ensayo en `fixture`; devuelve (trabajo, nuevo)."""
+        with self._lock:
+            cola = self._colas.get(fixture.id)
+            if cola is None:
+                cola = self._colas[fixture.id] = ColaEnsayos(fixture, self._podar)
+        trabajo, nuevo = cola.enviar()
+        if nuevo:
+            with self._lock:
+                self._trabajos[trabajo.id] = trabajo
+        return trabajo, nuevo
+
+    def obtener(self, trabajo_id):
+        with self._lock:
+            return self._trabajos.get(trabajo_id)
+
+    def listar(self):
+        with self._lock:
+            return list(self._trabajos.values())
+
+    def _podar(self, _trabajo):
+        with self._lock:
+            terminados = [t for t in self._trabajos.values() if not t.activo]
+            for trabajo in terminados[:max(0, len(terminados) - self.historial)]:
+                del self._trabajos[trabajo.id]
@@ -0,0 +1,302 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from engine.ProbadorHandler.ackTracker import resolver
+from engine.ProbadorHandler.virtualClock import RELOJ_REAL
+from engine.ProbadorHandler.eventLog import registro
+
+log = registro("tx")
+
+# Prioridades (menor número = sale antes)
+PRIORIDAD_ENSAYO = 0        # Comandos de la secuencia de ensayo y configuración
+PRIORIDAD_KEEP_ALIVE = 9    # Lectura periódica de status
+
+# Separación mínima entre comandos consecutivos en el puerto
+PAUSA_ENTRE_COMANDOS = 0.01
+
+
+class ComandoTX:
+    """Comando pendiente de transmisión. Si tiene `clave`, un comando posterior con la misma clave lo reemplaza mientras no haya salido."""
+
+    __slots__ = ("cmd", "descripcion", "prioridad", "clave", "ack", "ack_timeout",
+                 "t_encolado", "t_enviado", "ok", "enviado", "hecho", "reloj", "_callbacks")
+
+    def __init__(self, cmd, descripcion="", prioridad=PRIORIDAD_ENSAYO, clave=None, ack=None, ack_timeout=1.0,
+                 reloj=RELOJ_REAL):
+        self.reloj = reloj
+        self.cmd = cmd
+        self.descripcion = descripcion
+        self.prioridad = prioridad
+        self.clave = clave
+        self.ack = ack                  # Future resuelto por ACKTracker (o None)
+        self.ack_timeout = ack_timeout
+        self.t_encolado = reloj.perf_counter()
+        self.t_enviado = None
+        self.ok = None
+        self.enviado = False
+        self.hecho = threading.Event()
+        self._callbacks = []
+
+    def al_completar(self, callback):
+        """Registra callback(ok) a llamar cuando el comando sale por el puerto."""
+        self._callbacks.append(callback)
+
+    def completar(self, ok):
+        self.ok = ok
+        self.t_enviado = self.reloj.perf_counter()
+        self.hecho.set()
+        for callback in self._callbacks:
+            callback(ok)
+
+    def esperar(self, timeout=None):
+        """Bloquea hasta que el comando fue escrito. Devuelve True/False según el envío."""
+        if self.reloj.virtual:
+            self.reloj.esperar(None, self.hecho.is_set, timeout)
+        if not self.hecho.wait(0 if self.reloj.virtual else timeout):
+            return False
+        return self.ok
+
+
+def unir_acks(previo, nuevo):
+    """
+    Futuro de ACK de un comando coalescido: lo resuelve el ACK de la única
+    escritura y reparte el resultado a `previo` y `nuevo`, que siguen siendo de
+    quienes los pidieron (cancelar uno no afecta al otro).
+    """
+    if nuevo is None:
+        return previo
+    if previo is None or previo.done():
+        return nuevo
+    compartido = Future()
+
+    def repartir(futuro):
+        ok = not futuro.cancelled() and futuro.result()
+        resolver(previo, ok)
+        resolver(nuevo, ok)
+
+    def abandonado(_):
+        # Si ambos se cansaron, la entrada del ACKTracker también se abandona
+        if previo.cancelled() and nuevo.cancelled():
+            compartido.cancel()
+
+    compartido.add_done_callback(repartir)
+    previo.add_done_callback(abandonado)
+    nuevo.add_done_callback(abandonado)
+    return compartido
+
+
+class ColaTX:
+    """
+    Cola de prioridad de comandos con coalescencia por clave (thread-safe, sin hilos propios).
+    Entre comandos de igual prioridad se respeta el orden de llegada.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._por_clave = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.coalescidos = 0
+
+    def encolar(self, comando):
+        """
+        Encola `comando`. Si hay uno pendiente con la misma clave, se actualiza su
+        contenido (gana el último valor) y se devuelve ese comando en su lugar.
+        El ACK de esa escritura resuelve los futuros de ambos (ver unir_acks);
+        quien encoló debe usar su propio futuro, no `.ack` del devuelto.
+        """
+        with self._lock:
+            if comando.clave is not None:
+                previo = self._por_clave.get(comando.clave)
+                if previo is not None and not previo.enviado:
+                    previo.cmd = comando.cmd
+                    previo.descripcion = comando.descripcion
+                    previo.ack = unir_acks(previo.ack, comando.ack)
+                    previo.ack_timeout = max(previo.ack_timeout, comando.ack_timeout)
+                    if comando.prioridad < previo.prioridad:
+                        # No se puede reordenar en el heap: se reinserta con la nueva prioridad
+                        previo.prioridad = comando.prioridad
+                        heapq.heappush(self._heap, (previo.prioridad, next(self._seq), previo))
+                    self.coalescidos += 1
+                    return previo
+                self._por_clave[comando.clave] = comando
+            heapq.heappush(self._heap, (comando.prioridad, next(self._seq), comando))
+            return comando
+
+    def sacar(self):
+        """Devuelve el próximo comando a transmitir (o None si la cola está vacía)."""
+        with self._lock:
+            while self._heap:
+                _, _, comando = heapq.heappop(self._heap)
+                if comando.enviado:
+                    continue  # entrada duplicada por cambio de prioridad
+                comando.enviado = True
+                if comando.clave is not None and self._por_clave.get(comando.clave) is comando:
+                    del self._por_clave[comando.clave]
+                return comando
+            return None
+
+    def __len__(self):
+        with self._lock:
+            return sum(1 for _, _, c in self._heap if not c.enviado)
+
+
+class EstadisticasTX:
+    """Latencia encolado→puerto por tipo de comando (clave o cabecera)."""
+
+    def __init__(self, max_muestras=256):
+        self._latencias = {}
+        self._max = max_muestras
+        self.enviados = 0
+        self.fallidos = 0
+        self.bytes_enviados = 0
+
+    def registrar(self, comando):
+        etiqueta = comando.clave or comando.cmd[0:8].upper()
+        muestras = self._latencias.setdefault(etiqueta, deque(maxlen=self._max))
+        muestras.append(comando.t_enviado - comando.t_encolado)
+        if comando.ok:
+            self.enviados += 1
+            self.bytes_enviados += len(comando.cmd) // 2
+        else:
+            self.fallidos += 1
+
+    def resumen(self):
+        """Dict {etiqueta: {n, media_ms, p50_ms, p95_ms, max_ms}} con las últimas muestras."""
+        out = {}
+        for etiqueta, muestras in list(self._latencias.items()):
+            ordenadas = sorted(muestras)
+            if not ordenadas:
+                continue
+            n = len(ordenadas)
+            out[etiqueta] = {
+                "n": n,
+                "media_ms": round(sum(ordenadas) / n * 1000, 3),
+                "p50_ms": round(ordenadas[n // 2] * 1000, 3),
+                "p95_ms": round(ordenadas[min(n - 1, int(n * 0.95))] * 1000, 3),
+                "max_ms": round(ordenadas[-1] * 1000, 3),
+            }
+        return out
+
+
+class TXScheduler:
+    """
+    Escritor único del puerto serie.
+
+    Un hilo dedicado toma comandos de una ColaTX (los de ensayo antes que el
+    keep-alive, los setpoints superados se coalescen) y los escribe con
+    `escribir(cmd, descripcion) -> bool`, registrando la latencia de cada uno.
+    Los comandos que esperan ACK se registran en `acks` (ACKTracker) justo antes
+    de escribirse, para que el ACK no pueda llegar antes que el registro.
+
+    Con un reloj virtual no hay hilo: el escritor es un evento del reloj que se
+    reprograma mientras haya comandos, respetando la misma pausa y prioridades.
+    """
+
+    def __init__(self, escribir, pausa=PAUSA_ENTRE_COMANDOS, acks=None, reloj=RELOJ_REAL):
+        self._escribir = escribir
+        self.pausa = pausa
+        self.acks = acks
+        self.reloj = reloj
+        self.cola = ColaTX()
+        self.stats = EstadisticasTX()
+        self._hay_datos = threading.Condition()
+        self._corriendo = False
+        self._hilo = None
+        # Reloj virtual: escritor ocupado, evento de escritura pendiente y fin de la pausa
+        self._drenando = False
+        self._drenaje_programado = False
+        self._libre_en = 0.0
+
+    def start(self):
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._corriendo = True
+        if self.reloj.virtual:
+            return
+        self._hilo = threading.Thread(target=self._ejecutar, daemon=True)
+        self._hilo.start()
+
+    def stop(self):
+        self._corriendo = False
+        with self._hay_datos:
+            self._hay_datos.notify_all()
+        if self._hilo is not None and self._hilo.is_alive():
+            self._hilo.join(timeout=1)
+
+    def encolar(self, cmd, descripcion="", prioridad=PRIORIDAD_ENSAYO, clave=None, ack=None, ack_timeout=1.0):
+        comando = self.cola.encolar(ComandoTX(cmd, descripcion, prioridad, clave, ack, ack_timeout, self.reloj))
+        if self.reloj.virtual:
+            self._programar_drenaje()
+            return comando
+        with self._hay_datos:
+            self._hay_datos.notify()
+        return comando
+
+    def preparar(self, comando):
+        """Previo a escribir `comando`: registra la espera de ACK si corresponde."""
+        if comando.ack is not None and self.acks is not None:
+            self.acks.registrar(comando.ack, comando.ack_timeout)
+
+    def finalizar(self, comando, ok):
+        """Posterior a escribir `comando`: notifica a quien espera y registra estadísticas."""
+        if not ok and comando.ack is not None:
+            resolver(comando.ack, False)
+        comando.completar(ok)
+        self.stats.registrar(comando)
+
+    def _transmitir(self, comando):
+        self.preparar(comando)
+        try:
+            ok = bool(self._escribir(comando.cmd, comando.descripcion))
+        except Exception as e:
+            log.error("Error en escritor TX: %s", e, extra={"comando": comando.descripcion, "payload": comando.cmd})
+            ok = False
+        self.finalizar(comando, ok)
+
+    def _programar_drenaje(self):
+        if self._drenando or self._drenaje_programado:
+            return      # al terminar la escritura en curso se reprograma si quedan comandos
+        self._drenaje_programado = True
+        self.reloj.programar(max(self.reloj.monotonic(), self._libre_en), self._drenar)
+
+    def _drenar(self):
+        """Reloj virtual: escribe el próximo comando (el de mayor prioridad al terminar la pausa)."""
+        self._drenaje_programado = False
+        comando = self.cola.sacar()
+        if comando is None:
+            return
+        if not self._corriendo:
+            self.finalizar(comando, False)
+        else:
+            self._drenando = True
+            try:
+                self._transmitir(comando)
+            finally:
+                self._drenando = False
+            self._libre_en = self.reloj.monotonic() + self.pausa
+        if len(self.cola):
+            self._programar_drenaje()
+
+    def _ejecutar(self):
+        while self._corriendo:
+            comando = self.cola.sacar()
+            if comando is None:
+                with self._hay_datos:
+                    if len(self.cola) == 0 and self._corriendo:
+                        self._hay_datos.wait(timeout=0.5)
+                continue
+            self._transmitir(comando)
+            if self.pausa:
+                time.sleep(self.pausa)
+
+        # Liberar a quien esté esperando comandos que ya no van a salir
+        while True:
+            comando = self.cola.sacar()
+            if comando is None:
+                break
+            self.finalizar(comando, False)
@@ -0,0 +1,116 @@
+import heapq
+import itertools
+import time
+from concurrent.futures import Future
+
+# Horizonte de las esperas sin timeout en tiempo virtual (las fuentes periódicas no se agotan nunca)
+ESPERA_MAXIMA_VIRTUAL = 3600.0
+
+
+class RelojReal:
+    """Fuente de tiempo por defecto del tester: el reloj del sistema y esperas en el SO."""
+
+    virtual = False
+
+    @staticmethod
+    def monotonic():
+        return time.monotonic()
+
+    @staticmethod
+    def perf_counter():
+        return time.perf_counter()
+
+    @staticmethod
+    def sleep(segundos):
+        time.sleep(segundos)
+
+    @staticmethod
+    def esperar(cond, predicado, timeout):
+        """Espera en `cond` (tomada por el llamador) a que `predicado()` sea verdadero o venza `timeout`."""
+        return cond.wait_for(predicado, timeout)
+
+
+RELOJ_REAL = RelojReal()
+
+
+class RelojVirtual:
+    """
+    Reloj simulado de eventos discretos, para correr el ensayo en un solo hilo.
+
+    El tiempo solo avanza cuando el tester duerme o espera: en ese momento se
+    ejecutan, en orden, los eventos programados hasta el vencimiento (llegada de
+    bytes de la placa virtual o de una captura, keep-alive, etc.) y la espera
+    termina apenas se cumple su condición. Así una secuencia de decenas de
+    segundos se resuelve en lo que tarda la CPU en procesar las tramas.
+    """
+
+    virtual = True
+
+    def __init__(self, t0=0.0):
+        self._t = t0
+        self._eventos = []
+        self._seq = itertools.count()
+        self.eventos_ejecutados = 0
+
+    def monotonic(self):
+        return self._t
+
+    perf_counter = monotonic
+
+    def programar(self, t, callback):
+        """Ejecuta `callback()` cuando el tiempo virtual llegue a `t`."""
+        heapq.heappush(self._eventos, (t, next(self._seq), callback))
+
+    def programar_en(self, demora, callback):
+        self.programar(self._t + demora, callback)
+
+    def cada(self, periodo, callback, demora=0.0):
+        """Ejecuta `callback()` cada `periodo` segundos virtuales mientras devuelva algo distinto de False."""
+        def tick():
+            if callback() is not False:
+                self.programar_en(periodo, tick)
+        self.programar_en(demora, tick)
+
+    def avanzar_hasta(self, limite, predicado=None):
+        """Ejecuta los eventos hasta `limite` o hasta que `predicado()` sea verdadero."""
+        eventos = self._eventos
+        while eventos and eventos[0][0] <= limite:
+            if predicado is not None and predicado():
+                return True
+            t, _, callback = heapq.heappop(eventos)
+            if t > self._t:
+                self._t = t
+            self.eventos_ejecutados += 1
+            callback()
+        if predicado is not None and predicado():
+            return True
+        if limite > self._t:
+            self._t = limite
+        return predicado is None
+
+    def sleep(self, segundos):
+        self.avanzar_hasta(self._t + max(0.0, segundos))
+
+    def esperar(self, cond, predicado, timeout):
+        if timeout is None:
+            timeout = ESPERA_MAXIMA_VIRTUAL
+        if predicado():
+            return True
+        limite = self._t + max(0.0, timeout)
+        if self.avanzar_hasta(limite, predicado):
+            return True
+        # Sin eventos pendientes el tiempo salta directo al vencimiento
+        return predicado()
+
+
+class FuturoACK(Future):
+    """Future cuya espera con timeout corre sobre un reloj virtual (ver ACKTracker.nuevo_futuro)."""
+
+    def __init__(self, reloj):
+        super().__init__()
+        self._reloj = reloj
+
+    def result(self, timeout=None):
+        if not self.done():
+            self._reloj.esperar(None, self.done, timeout)
+        return super().result(timeout=0)
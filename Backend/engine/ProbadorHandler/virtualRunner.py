@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Ejecución del ensayo ProbarReguladorParalelo con reloj virtual.
+
+El tester corre en un solo hilo sobre un RelojVirtual: los sleeps y las esperas
+de ACK y de mediciones avanzan el tiempo simulado y entregan en orden los bytes
+de la fuente, así la secuencia completa (rampas, mediciones, evaluación de
+fases y de tensión) tarda lo que tarda la CPU en procesar las tramas.
+
+Fuentes:
+- PlacaVirtual: el protocolo del emulador de placa (boardEmulator) a lazo
+  cerrado, con tiempos de transmisión a 1.8432 Mbaud e inyección de fallas.
+- ReproduccionCaptura: los bytes RX de una captura .dzecap (captureRecorder)
+  en sus instantes originales, alineados con el comando que inicia el ensayo.
+
+Uso (desde Backend/):
+    python -m engine.ProbadorHandler.virtualRunner capturas/*.dzecap --guardar base.json
+    python -m engine.ProbadorHandler.virtualRunner capturas/*.dzecap --comparar base.json
+    python -m engine.ProbadorHandler.virtualRunner --emulador 50 --falla fase_abierta:B
+"""
+import io
+import sys
+import json
+import math
+import time
+import argparse
+import importlib
+import contextlib
+
+from engine.ProbadorHandler.virtualClock import RelojVirtual
+from engine.ProbadorHandler.eventLog import configurar_registro
+from engine.ProbadorHandler.captureRecorder import CaptureReader, CABECERA_CAPTURA, DIR_RX, DIR_TX
+from engine.ProbadorHandler.txScheduler import PRIORIDAD_KEEP_ALIVE
+from engine.ProbadorHandler.mainOLD import MENSAJE_KEEP_ALIVE
+from engine.ProbadorHandler.stageTrace import exportar_chrome
+from engine.serialUtils.boardEmulator import ProtocoloPlaca, ModeloRegulador
+
+# Primer comando de ProbarReguladorParalelo ("ACK Error previo"): marca el inicio de cada ensayo en una captura
+CMD_INICIO_ENSAYO = bytes.fromhex("290000E03900")
+CMD_KEEP_ALIVE = bytes.fromhex(MENSAJE_KEEP_ALIVE[:8])
+PERIODO_KEEP_ALIVE = 0.2
+BAUDIOS = 1843200
+
+# Módulo de cada núcleo de tester
+NUCLEOS = {
+    "old": "engine.ProbadorHandler.mainOLD",
+    "main": "engine.ProbadorHandler.main",
+}
+
+
+def clase_tester(nucleo):
+    return importlib.import_module(NUCLEOS[nucleo]).DZETester
+
+
+class PuertoVirtual:
+    """Sustituto de serial.Serial: lo que escribe el tester va a `destino(datos)`."""
+
+    def __init__(self, destino):
+        self._destino = destino
+        self.is_open = True
+        self.in_waiting = 0
+
+    def write(self, datos):
+        self._destino(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+class PlacaVirtual:
+    """
+    Placa emulada sobre el reloj virtual. Las respuestas y las tramas de muestras
+    comparten la línea serie: cada una llega cuando termina de transmitirse.
+    """
+
+    def __init__(self, reloj, protocolo=None, tramas_por_segundo=40.0, latencia=0.0002, baudios=BAUDIOS):
+        self.reloj = reloj
+        self.protocolo = protocolo if protocolo is not None else ProtocoloPlaca()
+        self.tramas_por_segundo = tramas_por_segundo
+        self.latencia = latencia
+        self.segundos_por_byte = 10.0 / baudios
+        # Los conecta preparar_tester: entregar(datos, t_rx) y keep_alive() (pedido de status del tester)
+        self.entregar = None
+        self.keep_alive = None
+        self._linea_libre = reloj.monotonic()
+        self._anterior = reloj.monotonic()
+
+    def start(self):
+        self._anterior = self.reloj.monotonic()
+        self.reloj.cada(1.0 / self.tramas_por_segundo, self._muestras)
+        self.reloj.cada(PERIODO_KEEP_ALIVE, lambda: self.keep_alive(), demora=PERIODO_KEEP_ALIVE)
+
+    def recibir(self, datos):
+        for respuesta in self.protocolo.recibir(datos):
+            self._transmitir(respuesta, self.latencia)
+
+    def _muestras(self):
+        ahora = self.reloj.monotonic()
+        trama = self.protocolo.trama_muestras(ahora - self._anterior)
+        self._anterior = ahora
+        if trama is not None:
+            self._transmitir(trama, 0.0)
+
+    def _transmitir(self, datos, demora):
+        inicio = max(self.reloj.monotonic() + demora, self._linea_libre)
+        fin = inicio + len(datos) * self.segundos_por_byte
+        self._linea_libre = fin
+        self.reloj.programar(fin, lambda: self.entregar(datos, fin))
+
+
+class ReproduccionCaptura:
+    """
+    Entrega los registros RX de una captura desde `t_desde`, cada uno en su instante
+    original. El keep-alive del tester se dispara en los instantes en que se grabó
+    el original, así compite por el puerto con la secuencia igual que entonces.
+    """
+
+    def __init__(self, reloj, lector, t_desde):
+        self.reloj = reloj
+        self.lector = lector
+        self.t_desde = t_desde
+        self.entregar = None
+        self.keep_alive = None
+        self.bytes_tx = 0
+        self._registros = None
+
+    def start(self):
+        # El índice de tramas da el offset de un registro cercano sin recorrer toda la captura
+        i = self.lector.buscar(self.t_desde)
+        offset = int(self.lector.indice["offset"][i]) if i < len(self.lector) else CABECERA_CAPTURA.size
+        self._registros = (
+            (direccion, t, bytes(datos)) for direccion, t, _, datos in self.lector.registros(offset)
+            if t >= self.t_desde and (direccion == DIR_RX or bytes(datos[:4]) == CMD_KEEP_ALIVE)
+        )
+        self._programar_siguiente()
+
+    def stop(self):
+        """Libera la lectura en curso (las vistas del mmap impiden cerrar el CaptureReader)."""
+        if self._registros is not None:
+            self._registros.close()
+            self._registros = None
+
+    def _programar_siguiente(self):
+        if self._registros is None:
+            return
+        siguiente = next(self._registros, None)
+        if siguiente is None:
+            return
+        direccion, t, datos = siguiente
+
+        def llegada():
+            if direccion == DIR_RX:
+                self.entregar(datos, t)
+            else:
+                self.keep_alive()
+            self._programar_siguiente()
+        self.reloj.programar(t, llegada)
+
+    def recibir(self, datos):
+        # Las respuestas ya están en la captura; lo que envía el tester solo se contabiliza
+        self.bytes_tx += len(datos)
+
+
+def inicios_ensayo(lector):
+    """Instantes (monotónicos de la captura) en que el tester envió el primer comando de un ensayo."""
+    return [t for direccion, t, _, datos in lector.registros()
+            if direccion == DIR_TX and bytes(datos[:len(CMD_INICIO_ENSAYO)]) == CMD_INICIO_ENSAYO]
+
+
+def preparar_tester(clase, reloj, fuente):
+    """Crea un tester sobre `reloj` conectado a `fuente` sin puerto ni hilos (el keep-alive lo dispara la fuente)."""
+    tester = clase(reloj=reloj)
+    tester.ser = PuertoVirtual(fuente.recibir)
+    tester.PuertoSerie = "virtual"
+    tester.running = True
+    tester.tx.start()
+
+    def keep_alive():
+        if not tester.running:
+            return False
+        tester.send(MENSAJE_KEEP_ALIVE, "NP:Lectura status",
+                    prioridad=PRIORIDAD_KEEP_ALIVE, clave="keep_alive", esperar=False)
+    fuente.entregar = tester._alimentar
+    fuente.keep_alive = keep_alive
+    return tester
+
+
+def ejecutar_ensayo(tester, reloj, verbose=False):
+    """Corre ProbarReguladorParalelo y devuelve resultados y tiempos (virtual y real)."""
+    t_virtual = reloj.monotonic()
+    eventos = reloj.eventos_ejecutados
+    t_real = time.perf_counter()
+    salida = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with salida:
+        tester.ProbarReguladorParalelo()
+    tester.running = False
+    tester.tx.stop()
+    tester.acks.cancelar_todos()
+    return {
+        "resultados": tester.resultados,
+        "segundos_virtuales": round(reloj.monotonic() - t_virtual, 6),
+        "segundos_reales": round(time.perf_counter() - t_real, 6),
+        "eventos": reloj.eventos_ejecutados - eventos,
+    }
+
+
+def ensayo_emulado(nucleo="old", fallas=(), seed=0, verbose=False, **modelo):
+    """Ensayo completo contra la placa emulada: conexión, configuración y ProbarReguladorParalelo."""
+    reloj = RelojVirtual()
+    placa = PlacaVirtual(reloj, ProtocoloPlaca(ModeloRegulador(seed=seed, **modelo)))
+    for tipo, fase in fallas:
+        placa.protocolo.inyectar_falla(tipo, fase)
+    tester = preparar_tester(clase_tester(nucleo), reloj, placa)
+    placa.start()
+    with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+        tester.configurar_placa()
+    reloj.sleep(2)      # placa conectada y en reposo antes del ensayo
+    return ejecutar_ensayo(tester, reloj, verbose)
+
+
+def ensayos_captura(ruta, nucleo="old", precarga=0.5, verbose=False):
+    """Reproduce cada ensayo registrado en la captura `ruta`; devuelve una lista de resultados."""
+    lector = CaptureReader(ruta)
+    try:
+        salidas = []
+        for t_inicio in inicios_ensayo(lector):
+            reloj = RelojVirtual(t_inicio - precarga)
+            fuente = ReproduccionCaptura(reloj, lector, t_inicio - precarga)
+            tester = preparar_tester(clase_tester(nucleo), reloj, fuente)
+            fuente.start()
+            reloj.avanzar_hasta(t_inicio)
+            try:
+                salida = ejecutar_ensayo(tester, reloj, verbose)
+            finally:
+                fuente.stop()
+            salida["t_inicio"] = t_inicio
+            salidas.append(salida)
+        return salidas
+    finally:
+        lector.close()
+
+
+# ----------------------------
+# Comparación contra una base guardada
+# ----------------------------
+# Diagnóstico que no forma parte del veredicto del ensayo
+CAMPOS_SIN_COMPARAR = ("traza",)
+
+
+def veredicto(resultados):
+    return {k: v for k, v in resultados.items() if k not in CAMPOS_SIN_COMPARAR}
+
+
+def diferencias(esperado, obtenido, tolerancia, ruta=""):
+    """Lista de (ruta, esperado, obtenido) que difieren; los números se comparan con tolerancia relativa."""
+    if isinstance(esperado, dict) and isinstance(obtenido, dict):
+        out = []
+        for clave in sorted(set(esperado) | set(obtenido)):
+            out += diferencias(esperado.get(clave), obtenido.get(clave), tolerancia, f"{ruta}.{clave}" if ruta else clave)
+        return out
+    numericos = (int, float)
+    if isinstance(esperado, numericos) and isinstance(obtenido, numericos) \
+            and not isinstance(esperado, bool) and not isinstance(obtenido, bool):
+        if math.isclose(esperado, obtenido, rel_tol=tolerancia, abs_tol=tolerancia):
+            return []
+        return [(ruta, esperado, obtenido)]
+    return [] if esperado == obtenido else [(ruta, esperado, obtenido)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ensayo del regulador paralelo con reloj virtual")
+    parser.add_argument("capturas", nargs="*", help="Capturas .dzecap a reproducir")
+    parser.add_argument("--emulador", type=int, default=0, help="Cantidad de ensayos contra la placa emulada")
+    parser.add_argument("--falla", action="append", default=[], help="Falla del emulador: tipo[:fase]")
+    parser.add_argument("--nucleo", choices=sorted(NUCLEOS), default="old", help="Tester a ejecutar")
+    parser.add_argument("--guardar", help="Guardar los resultados como base (JSON)")
+    parser.add_argument("--comparar", help="Comparar contra una base guardada; sale con 1 si hay diferencias")
+    parser.add_argument("--tolerancia", type=float, default=1e-9, help="Tolerancia relativa de la comparación")
+    parser.add_argument("--traza", help="Exportar los tramos de cada ensayo como traza Chrome/Perfetto (JSON)")
+    parser.add_argument("--json", action="store_true", help="Imprimir los resultados completos en JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mostrar la salida del tester")
+    args = parser.parse_args()
+    # El tester registra por eventLog: con -v a la consola, si no a ningún destino
+    configurar_registro(consola=args.verbose)
+
+    fallas = [(f.partition(":")[0], f.partition(":")[2] or None) for f in args.falla]
+    corridas = {}
+    inicio = time.perf_counter()
+    for ruta in args.capturas:
+        for salida in ensayos_captura(ruta, args.nucleo, verbose=args.verbose):
+            corridas[f"{ruta}@{salida['t_inicio']:.6f}"] = salida
+    for i in range(args.emulador):
+        corridas[f"emulador#{i}" + "".join(f"+{t}:{f or ''}" for t, f in fallas)] = \
+            ensayo_emulado(args.nucleo, fallas, seed=i, verbose=args.verbose)
+    total = time.perf_counter() - inicio
+
+    for nombre, salida in corridas.items():
+        r = salida["resultados"]
+        print(f"{nombre}: estado={r.get('general_state')} Vout={r.get('Vout')} "
+              f"({salida['segundos_virtuales']:.1f} s simulados en {salida['segundos_reales'] * 1000:.0f} ms)")
+    print(f"{len(corridas)} ensayos en {total:.2f} s")
+    if args.json:
+        print(json.dumps(corridas, indent=2, default=float))
+
+    if args.traza:
+        exportar_chrome(args.traza, {n: s["resultados"]["traza"] for n, s in corridas.items()
+                                     if "traza" in s["resultados"]})
+        print(f"Traza por etapas: {args.traza}")
+
+    if args.guardar:
+        with open(args.guardar, "w") as f:
+            json.dump({n: s["resultados"] for n, s in corridas.items()}, f, indent=2, default=float)
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            base = json.load(f)
+        fallidas = 0
+        for nombre, esperado in base.items():
+            if nombre not in corridas:
+                print(f"FALTA {nombre}")
+                fallidas += 1
+                continue
+            obtenido = json.loads(json.dumps(corridas[nombre]["resultados"], default=float))
+            difs = diferencias(veredicto(esperado), veredicto(obtenido), args.tolerancia)
+            if difs:
+                fallidas += 1
+                print(f"DIFIERE {nombre}")
+                for campo, a, b in difs:
+                    print(f"    {campo}: {a} -> {b}")
+        print(f"Comparación: {len(base) - fallidas}/{len(base)} iguales a la base")
+        sys.exit(1 if fallidas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,29 +2,214 @@ import os
 import sys
 import signal
 import subprocess
-from flask import jsonify, send_from_directory
-from concurrent.futures import ThreadPoolExecutor
+from flask import jsonify, send_from_directory, Response, request
 import threading
 from engine.ProbadorHandler.restartSerial import reiniciar_serial
+from engine.ProbadorHandler.engineMetrics import ExportadorMetricas
+from engine.ProbadorHandler.liveStream import DifusoresEnVivo, flujo_sse, HZ_POR_DEFECTO
+from engine.ProbadorHandler.testJobs import GestorTrabajos, TERMINADO
+from engine.ProbadorHandler.logRing import LIMITE_RESPUESTA
+from engine.ProbadorHandler.fixtureRegistry import LISTO
+
+# GET /muestras: ventana por defecto (muestras por fase) y tope de puntos por fase en la respuesta
+MUESTRAS_POR_DEFECTO = 10000
+PUNTOS_POR_DEFECTO = 1000
+MAX_PUNTOS = 10000
+LECTURAS_POR_DEFECTO = 50
+
+def register_routes(app, frontend_dist_path, fixtures, log_buffer, arranque=None):
+    difusores = DifusoresEnVivo(fixtures)
+    metricas = ExportadorMetricas(fixtures, difusores)
+    # Un ensayo a la vez por banco (cola con trabajador persistente); otros bancos ensayan en paralelo
+    trabajos = GestorTrabajos()
+
+    def validar_banco(fixture):
+        if fixture is None:
+            return jsonify({"status": "error", "message": "DZETester no inicializado"})
+        # Durante el primer escaneo el ensayo se encola y espera a que la placa esté lista
+        if not fixture.conectado and not fixtures.descubriendo:
+            return jsonify({"status": "error", "message": f"Banco {fixture.id} sin placa conectada"})
+        return None
+
+    def ejecutar_ensayo(fixture):
+        """Compatibilidad: encola el ensayo y mantiene la conexión hasta que termina."""
+        error = validar_banco(fixture)
+        if error is not None:
+            return error
+        # Un pedido repetido mientras hay un ensayo en curso espera y devuelve ese mismo ensayo
+        trabajo, _ = trabajos.enviar(fixture)
+        trabajo.esperar()
+        if trabajo.estado != TERMINADO:
+            return jsonify({"status": "error", "message": trabajo.error})
+        return jsonify({"status": "ok", "fixture": fixture.id, "resultado": trabajo.resultado})
+
+    def encolar_ensayo(fixture):
+        error = validar_banco(fixture)
+        if error is not None:
+            return error
+        trabajo, nuevo = trabajos.enviar(fixture)
+        return jsonify({"status": "ok", "nuevo": nuevo, "job": trabajo.a_dict()}), 202 if nuevo else 200
+
+    def reiniciar_banco(fixture):
+        def reconectar(timeout):
+            # La placa sigue enchufada: no habrá evento de hot-plug, se reabre ya. Si se
+            # desenchufó, el vigilante la conecta al reaparecer (puede cambiar de puerto).
+            fixtures.descubrir()
+            return fixture.esperar_listo(timeout) == LISTO
+        resultado = reiniciar_serial(fixture.tester if fixture.creado else None, reconectar)
+        return jsonify(resultado), 200 if resultado["status"] == "ok" else 503
 
-def register_routes(app, frontend_dist_path, dze_tester, log_buffer, inicializar_serial):
-    
     @app.route('/testregulator', methods=['POST'])
     def test_regulator():
-        if not dze_tester:
-            return jsonify({"status": "error", "message": "DZETester no inicializado"})
-        try:
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                futuro = executor.submit(dze_tester.ProbarReguladorParalelo)
-                resultado = futuro.result()
-            return jsonify({"status": "ok", "resultado": resultado})
-        except Exception as e:
-            return jsonify({"status": "error", "message": str(e)})
+        return ejecutar_ensayo(fixtures.por_defecto())
     
     @app.route("/reiniciar-serial", methods=["POST"])
     def route_reiniciar_serial():
-        resultado = reiniciar_serial(dze_tester, inicializar_serial)
-        return jsonify(resultado)
+        fixture = fixtures.por_defecto()
+        if fixture is None:
+            # Sin bancos registrados (DZE_SERIALES=*): se busca una placa y se reinicia esa
+            fixtures.descubrir()
+            fixture = fixtures.por_defecto()
+        if fixture is None:
+            return jsonify({"status": "error", "message": "No se encontró ninguna placa habilitada"}), 503
+        return reiniciar_banco(fixture)
+
+    # ------------------------
+    # Bancos (una placa ST-Link y un DZETester cada uno)
+    # ------------------------
+    @app.route("/fixtures", methods=["GET"])
+    def listar_fixtures():
+        return jsonify({"status": "ok", "fixtures": fixtures.estado()})
+
+    @app.route("/fixtures/<fixture_id>/testregulator", methods=["POST"])
+    def test_regulator_fixture(fixture_id):
+        fixture = fixtures.obtener(fixture_id)
+        if fixture is None:
+            return jsonify({"status": "error", "message": f"Banco {fixture_id} inexistente"}), 404
+        return ejecutar_ensayo(fixture)
+
+    # ------------------------
+    # Trabajos de ensayo (POST devuelve el id; el resultado se consulta en /jobs/<id>)
+    # ------------------------
+    @app.route("/jobs", methods=["POST"])
+    def route_encolar_ensayo():
+        return encolar_ensayo(fixtures.por_defecto())
+
+    @app.route("/fixtures/<fixture_id>/jobs", methods=["POST"])
+    def route_encolar_ensayo_fixture(fixture_id):
+        fixture = fixtures.obtener(fixture_id)
+        if fixture is None:
+            return jsonify({"status": "error", "message": f"Banco {fixture_id} inexistente"}), 404
+        return encolar_ensayo(fixture)
+
+    @app.route("/jobs", methods=["GET"])
+    def route_listar_trabajos():
+        return jsonify({"status": "ok", "jobs": [t.a_dict() for t in trabajos.listar()]})
+
+    @app.route("/jobs/<job_id>", methods=["GET"])
+    def route_trabajo(job_id):
+        trabajo = trabajos.obtener(job_id)
+        if trabajo is None:
+            return jsonify({"status": "error", "message": f"Trabajo {job_id} inexistente"}), 404
+        return jsonify({"status": "ok", "job": trabajo.a_dict()})
+
+    @app.route("/fixtures/<fixture_id>/reiniciar-serial", methods=["POST"])
+    def route_reiniciar_serial_fixture(fixture_id):
+        fixture = fixtures.obtener(fixture_id)
+        if fixture is None:
+            return jsonify({"status": "error", "message": f"Banco {fixture_id} inexistente"}), 404
+        return reiniciar_banco(fixture)
+
+    # ------------------------
+    # Mediciones en vivo (Server-Sent Events)
+    # ------------------------
+    def transmitir(fixture):
+        if fixture is None:
+            return jsonify({"status": "error", "message": "Banco inexistente"}), 404
+        try:
+            hz = float(request.args.get("hz", HZ_POR_DEFECTO))
+        except ValueError:
+            return jsonify({"status": "error", "message": "hz inválido"}), 400
+        return Response(flujo_sse(difusores.para(fixture), hz), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @app.route("/stream", methods=["GET"])
+    def route_stream():
+        return transmitir(fixtures.por_defecto())
+
+    @app.route("/fixtures/<fixture_id>/stream", methods=["GET"])
+    def route_stream_fixture(fixture_id):
+        return transmitir(fixtures.obtener(fixture_id))
+
+    # ------------------------
+    # Forma de onda reciente: GET /muestras?n=<muestras>&puntos=<max>&tension=<lecturas>
+    # ------------------------
+    def forma_de_onda(fixture):
+        if fixture is None:
+            return jsonify({"status": "error", "message": "Banco inexistente"}), 404
+        if not fixture.creado:
+            return jsonify({"status": "error", "message": f"Banco {fixture.id} sin tester"}), 409
+        tester = fixture.tester
+        n = min(max(request.args.get("n", MUESTRAS_POR_DEFECTO, type=int), 1), tester.muestras.capacidad)
+        puntos = min(max(request.args.get("puntos", PUNTOS_POR_DEFECTO, type=int), 1), MAX_PUNTOS)
+        lecturas = min(max(request.args.get("tension", LECTURAS_POR_DEFECTO, type=int), 0), tester.tensiones.capacidad)
+        paso = -(-n // puntos)      # decimación: una de cada `paso` muestras
+        copia = tester.muestras.copiar_ultimas(n, paso)
+        if copia is None:
+            return jsonify({"status": "error", "message": "Ventana sobrescrita durante la lectura"}), 503
+        total, seq, (ia, ib, ic) = copia
+        t_tension, tension = tester.tensiones.copiar_ultimos(lecturas)
+        return jsonify({
+            "status": "ok",
+            "fixture": fixture.id,
+            "total": total,
+            "seq": seq,
+            "paso": paso,
+            "Ia": ia.tolist(), "Ib": ib.tolist(), "Ic": ic.tolist(),
+            "tension": {"t": t_tension.tolist(), "valor": tension.tolist()},
+        })
+
+    @app.route("/muestras", methods=["GET"])
+    def route_muestras():
+        return forma_de_onda(fixtures.por_defecto())
+
+    @app.route("/fixtures/<fixture_id>/muestras", methods=["GET"])
+    def route_muestras_fixture(fixture_id):
+        return forma_de_onda(fixtures.obtener(fixture_id))
+
+    # ------------------------
+    # Log de eventos incremental: GET /logs?since=<seq>[&wait=<s>][&limit=<n>]
+    # ------------------------
+    @app.route("/logs", methods=["GET"])
+    def route_logs():
+        since = request.args.get("since", type=int)
+        espera = request.args.get("wait", 0.0, type=float)
+        limite = min(max(request.args.get("limit", LIMITE_RESPUESTA, type=int), 1), LIMITE_RESPUESTA)
+        if since is not None and espera > 0:
+            log_buffer.esperar(since, espera)     # long-poll hasta que haya algo nuevo
+        entradas, perdidas = log_buffer.desde(since, limite)
+        return jsonify({"status": "ok", "entries": entradas, "ultimo": log_buffer.ultimo, "perdidas": perdidas})
+
+    # ------------------------
+    # Preparación: descubriendo -> configurando -> listo (o sin_placa)
+    # ------------------------
+    @app.route("/ready", methods=["GET"])
+    def route_ready():
+        estado = fixtures.preparacion()
+        return jsonify({
+            "status": "ok",
+            "estado": estado,
+            "listo": estado == LISTO,
+            "fixtures": [{"id": f.id, "preparacion": f.preparacion} for f in fixtures.todos()],
+            "arranque": arranque.resumen() if arranque is not None else None,
+        })
+
+    # ------------------------
+    # Métricas operativas (formato de texto Prometheus)
+    # ------------------------
+    @app.route("/metrics", methods=["GET"])
+    def route_metrics():
+        return Response(metricas.exponer(), mimetype="text/plain; version=0.0.4; charset=utf-8")
 
     # ------------------------
     # Servir frontend
@@ -43,9 +228,8 @@ def register_routes(app, frontend_dist_path, dze_tester, log_buffer, inicializar
     @app.route("/shutdown-system", methods=["POST"])
     def shutdown_system():
         try:
-            # Detener DZETester
-            if dze_tester:
-                dze_tester.stop()
+            # Detener todos los DZETester
+            fixtures.detener_todos()
 
             # Cerrar navegador Chrome (Windows)
             if sys.platform.startswith("win"):
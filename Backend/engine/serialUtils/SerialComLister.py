@@ -9,7 +9,13 @@ Uso:
     python find_board.py --vid 0x1A86 --pid 0x7523  # busca por VID/PID
     python find_board.py --serial ABC123   # busca por serial (recomendado)
     python find_board.py --watch --serial ABC123  # se queda viendo y reporta cambios
+    python find_board.py --json            # salida JSON (con --watch, una línea por cambio)
+
+Como librería: scan() devuelve puertos y dispositivos USB, y watch() es un
+generador de cambios. Ambos usan una caché de enumeración: los descriptores
+USB (fabricante, producto, serie) solo se leen para dispositivos nuevos.
 """
+import json
 import time
 import argparse
 
@@ -23,51 +29,111 @@ try:
 except Exception:
     HAS_PYUSB = False
 
+def _info_puerto(p):
+    return {
+        "device": p.device,                # ej. /dev/ttyUSB0 o COM3
+        "name": p.name,
+        "description": p.description,
+        "hwid": p.hwid,
+        "vid": hex(p.vid) if p.vid is not None else None,
+        "pid": hex(p.pid) if p.pid is not None else None,
+        "serial_number": p.serial_number,
+        "manufacturer": p.manufacturer,
+        "product": p.product,
+        "interface": getattr(p, "interface", None),
+    }
+
+def _info_usb(dev):
+    try:
+        # intento de leer strings (puede fallar si permisos insuficientes)
+        manufacturer = usb.util.get_string(dev, dev.iManufacturer) if dev.iManufacturer else None
+        product = usb.util.get_string(dev, dev.iProduct) if dev.iProduct else None
+        serial = usb.util.get_string(dev, dev.iSerialNumber) if dev.iSerialNumber else None
+    except Exception:
+        manufacturer = product = serial = None
+    return {
+        "bus": dev.bus if hasattr(dev, "bus") else None,
+        "address": dev.address if hasattr(dev, "address") else None,
+        "vid": hex(dev.idVendor),
+        "pid": hex(dev.idProduct),
+        "manufacturer": manufacturer,
+        "product": product,
+        "serial": serial,
+    }
+
+class EnumeracionCache:
+    """
+    Caché de enumeración de puertos serie y dispositivos USB.
+
+    Los puertos se identifican por (device, hwid) y los dispositivos USB por
+    (bus, address, vid, pid): mientras la clave no cambie se reutiliza la
+    información ya armada, y los descriptores de texto USB (lentos y que pueden
+    bloquearse por permisos) solo se leen para dispositivos nuevos. Al volver
+    a enchufar un dispositivo cambia su address, así que se relee.
+    """
+
+    def __init__(self):
+        self._puertos = {}
+        self._usb = {}
+        self.lecturas_descriptores = 0
+
+    def puertos(self):
+        actuales = {}
+        for p in list_ports.comports():
+            clave = (p.device, p.hwid)
+            info = self._puertos.get(clave)
+            actuales[clave] = info if info is not None else _info_puerto(p)
+        self._puertos = actuales
+        return list(actuales.values())
+
+    def usb(self):
+        if not HAS_PYUSB:
+            return None
+        actuales = {}
+        for dev in usb.core.find(find_all=True):
+            clave = (getattr(dev, "bus", None), getattr(dev, "address", None), dev.idVendor, dev.idProduct)
+            info = self._usb.get(clave)
+            if info is None:
+                info = _info_usb(dev)
+                self.lecturas_descriptores += 1
+            actuales[clave] = info
+        self._usb = actuales
+        return list(actuales.values())
+
+# Caché compartida por las funciones de módulo (CLI, SerialFinder)
+_CACHE = EnumeracionCache()
+
 def list_serial_ports():
     """Lista puertos serie (pyserial) con propiedades útiles."""
-    ports = list_ports.comports()
-    out = []
-    for p in ports:
-        info = {
-            "device": p.device,                # ej. /dev/ttyUSB0 o COM3
-            "name": p.name,
-            "description": p.description,
-            "hwid": p.hwid,
-            "vid": hex(p.vid) if p.vid is not None else None,
-            "pid": hex(p.pid) if p.pid is not None else None,
-            "serial_number": p.serial_number,
-            "manufacturer": p.manufacturer,
-            "product": p.product,
-            "interface": getattr(p, "interface", None),
-        }
-        out.append(info)
-    return out
+    return _CACHE.puertos()
 
 def list_usb_devices():
     """Lista dispositivos USB usando pyusb (si está disponible)."""
-    if not HAS_PYUSB:
-        return None
-    devices = []
-    for dev in usb.core.find(find_all=True):
-        try:
-            vid = dev.idVendor
-            pid = dev.idProduct
-            # intento de leer strings (puede fallar si permisos insuficientes)
-            manufacturer = usb.util.get_string(dev, dev.iManufacturer) if dev.iManufacturer else None
-            product = usb.util.get_string(dev, dev.iProduct) if dev.iProduct else None
-            serial = usb.util.get_string(dev, dev.iSerialNumber) if dev.iSerialNumber else None
-        except Exception:
-            manufacturer = product = serial = None
-        devices.append({
-            "bus": dev.bus if hasattr(dev, "bus") else None,
-            "address": dev.address if hasattr(dev, "address") else None,
-            "vid": hex(vid),
-            "pid": hex(pid),
-            "manufacturer": manufacturer,
-            "product": product,
-            "serial": serial,
-        })
-    return devices
+    return _CACHE.usb()
+
+def scan(incluir_usb=True):
+    """Una enumeración: {"ports": [...], "usb": [...] o None si no hay pyusb (o no se pidió)}."""
+    return {
+        "ports": list_serial_ports(),
+        "usb": list_usb_devices() if incluir_usb else None,
+    }
+
+def watch(interval=2.0, incluir_usb=False):
+    """
+    Generador de cambios en los puertos serie. Cada vez que aparece o desaparece
+    un puerto entrega {"added": [...], "removed": [...], "ports": [...]}; la primera
+    entrega lista como añadidos los puertos ya presentes.
+    """
+    previous = {}
+    while True:
+        resultado = scan(incluir_usb)
+        current_map = {p["device"]: p for p in resultado["ports"]}
+        added = [p for dev, p in current_map.items() if previous.get(dev) is not p]
+        removed = [p for dev, p in previous.items() if current_map.get(dev) is not p]
+        if added or removed:
+            yield {"added": added, "removed": removed, "ports": resultado["ports"], "usb": resultado["usb"]}
+        previous = current_map
+        time.sleep(interval)
 
 def pretty_print_ports(ports):
     if not ports:
@@ -117,57 +183,54 @@ def main():
     parser.add_argument("--serial", help="Serial number (substring allowed)")
     parser.add_argument("--watch", action="store_true", help="Queda observando cambios y reporta cuando aparece/desaparece")
     parser.add_argument("--interval", type=float, default=2.0, help="Intervalo watch en segundos")
+    parser.add_argument("--json", action="store_true", help="Salida JSON (con --watch, una línea por cambio)")
     args = parser.parse_args()
 
-    def scan_once():
-        ports = list_serial_ports()
-        usb = list_usb_devices()
+    # normalizar hex para comparar
+    vid_norm = args.vid.lower() if args.vid else None
+    pid_norm = args.pid.lower() if args.pid else None
+    buscando = args.vid or args.pid or args.serial
+
+    def buscar(ports):
+        return match_board(ports, vid=vid_norm, pid=pid_norm, serial=args.serial) if buscando else None
+
+    if not args.watch:
+        resultado = scan()
+        matches = buscar(resultado["ports"])
+        if args.json:
+            resultado["matches"] = matches
+            print(json.dumps(resultado, indent=2))
+            return
         print("\n=== Puertos serie encontrados ===")
-        pretty_print_ports(ports)
+        pretty_print_ports(resultado["ports"])
         print("\n=== Dispositivos USB (pyusb) ===")
-        pretty_print_usb(usb)
-        if args.vid or args.pid or args.serial:
-            # normalizar hex para comparar
-            vid_norm = args.vid.lower() if args.vid else None
-            pid_norm = args.pid.lower() if args.pid else None
-            matches = match_board(ports, vid=vid_norm, pid=pid_norm, serial=args.serial)
+        pretty_print_usb(resultado["usb"])
+        if buscando:
             if matches:
                 print("\n>>> MATCH(es) encontrados:")
                 pretty_print_ports(matches)
             else:
                 print("\n>>> No se encontró la placa buscada.")
-        return ports
-
-    if not args.watch:
-        scan_once()
         return
 
     # modo watch: detectar apariciones/desapariciones
-    previous = {}
     try:
-        while True:
-            ports = list_serial_ports()
-            # construir set de device names
-            current_map = {p["device"]: p for p in ports}
-            # detect added
-            added = [p for dev,p in current_map.items() if dev not in previous]
-            removed = [p for dev,p in previous.items() if dev not in current_map]
-            if added:
-                print(f"\n[+] Añadidos ({len(added)}):")
-                pretty_print_ports(added)
-            if removed:
-                print(f"\n[-] Retirados ({len(removed)}):")
-                pretty_print_ports(removed)
+        for cambio in watch(args.interval):
+            matches = buscar(cambio["ports"])
+            if args.json:
+                print(json.dumps({"t": time.time(), "added": cambio["added"],
+                                  "removed": cambio["removed"], "matches": matches}), flush=True)
+                continue
+            if cambio["added"]:
+                print(f"\n[+] Añadidos ({len(cambio['added'])}):")
+                pretty_print_ports(cambio["added"])
+            if cambio["removed"]:
+                print(f"\n[-] Retirados ({len(cambio['removed'])}):")
+                pretty_print_ports(cambio["removed"])
             # si se busca una placa específica, avisar si aparece
-            if args.vid or args.pid or args.serial:
-                vid_norm = args.vid.lower() if args.vid else None
-                pid_norm = args.pid.lower() if args.pid else None
-                matches = match_board(ports, vid=vid_norm, pid=pid_norm, serial=args.serial)
-                if matches:
-                    print("\n>>> Placa objetivo DETECTADA:")
-                    pretty_print_ports(matches)
-            previous = current_map
-            time.sleep(args.interval)
+            if matches:
+                print("\n>>> Placa objetivo DETECTADA:")
+                pretty_print_ports(matches)
     except KeyboardInterrupt:
         print("\nObservación interrumpida por usuario. Saliendo.")
 
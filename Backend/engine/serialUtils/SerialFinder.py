@@ -1,24 +1,76 @@
-from serial.tools import list_ports
+import os
+
+from engine.serialUtils.SerialComLister import list_serial_ports
+from engine.ProbadorHandler.eventLog import registro
+
+log = registro("serie")
 
 TARGET_VID = "0483"  # solo números hex
 TARGET_PID = "374B"  # solo números hex
 TARGET_SERIAL = "066DFF313358353143085514"
 
+# Lista de números de serie habilitados, separados por coma ("*" acepta cualquier ST-Link).
+# Ej.: DZE_SERIALES="066DFF313358353143085514,0670FF485550755187034646"
+VARIABLE_SERIALES = "DZE_SERIALES"
+
+# Puerto fijo sin enumeración USB (p. ej. el emulador de placa): "ruta" o "serial=ruta".
+# Ej.: DZE_PUERTO=/tmp/dze0  (ver engine/serialUtils/boardEmulator.py)
+VARIABLE_PUERTO = "DZE_PUERTO"
+SERIAL_EMULADOR = "EMULADOR"
+
 def normalize_hex(value):
-    """Convierte a string hex sin 0x y en mayúsculas."""
+    """Convierte a string hex sin 0x y en mayúsculas (acepta int o "0x483")."""
     if value is None:
         return None
+    if isinstance(value, str):
+        value = int(value, 16)
     return format(value, '04X')
 
+def puerto_fijo():
+    """(serial, ruta) configurado en DZE_PUERTO, o None."""
+    valor = os.environ.get(VARIABLE_PUERTO, "").strip()
+    if not valor:
+        return None
+    serial, _, ruta = valor.rpartition("=")
+    return (serial.strip() or SERIAL_EMULADOR), ruta.strip()
+
+def seriales_permitidos():
+    """Números de serie habilitados: DZE_SERIALES, el serial de DZE_PUERTO o TARGET_SERIAL."""
+    valor = os.environ.get(VARIABLE_SERIALES, "")
+    seriales = [s.strip() for s in valor.split(",") if s.strip()]
+    if not seriales and puerto_fijo():
+        seriales = [puerto_fijo()[0]]
+    return seriales or [TARGET_SERIAL]
+
+def find_stlinks(seriales=None):
+    """
+    Devuelve [(serial, puerto)] de todas las placas ST-Link conectadas cuyo número
+    de serie esté en `seriales` (por defecto seriales_permitidos()), en ese orden.
+    """
+    if seriales is None:
+        seriales = seriales_permitidos()
+    cualquiera = "*" in seriales
+    encontradas = []
+    # Enumeración con caché compartida con SerialComLister
+    for p in list_serial_ports():
+        vid = normalize_hex(p["vid"])
+        pid = normalize_hex(p["pid"])
+        serial = p["serial_number"].strip() if p["serial_number"] else None
+        if vid == TARGET_VID and pid == TARGET_PID and serial and (cualquiera or serial in seriales):
+            encontradas.append((serial, p["device"]))
+    fijo = puerto_fijo()
+    if fijo and os.path.exists(fijo[1]) and (cualquiera or fijo[0] in seriales):
+        encontradas.append(fijo)
+    orden = {s: i for i, s in enumerate(seriales)}
+    encontradas.sort(key=lambda e: (orden.get(e[0], len(orden)), e[0]))
+    return encontradas
+
 def find_stlink():
-    ports = list_ports.comports()
-    for p in ports:
-        vid = normalize_hex(p.vid)
-        pid = normalize_hex(p.pid)
-        serial = p.serial_number.strip() if p.serial_number else None
-        if vid == TARGET_VID and pid == TARGET_PID and serial == TARGET_SERIAL:
-            print(f"Placa encontrada en: {p.device}")
-            return True, p.device
+    """Compatibilidad: primera placa habilitada encontrada -> (True, puerto) o (False, None)."""
+    encontradas = find_stlinks()
+    if encontradas:
+        log.info("Placa encontrada en: %s", encontradas[0][1])
+        return True, encontradas[0][1]
     return False, None
 
 if __name__ == "__main__":
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Emulador de la placa DZE sobre un pseudo-terminal (Linux).
+
+Habla el protocolo real: responde ACK (1a00002000) a cada comando, contesta el
+keep-alive con tramas de status (2a050040) y, entre los comandos Start y Stop,
+transmite tramas de muestras Ia/Ib (a93f0050) a ritmo constante. Un modelo
+simple del regulador paralelo sigue los setpoints de corriente de carga y de
+ensayo, y se pueden inyectar fallas (fase abierta, MOS abierto, MOS en corto,
+sobretensión) para ejercitar las ramas de error del ensayo.
+
+Uso (desde Backend/):
+    python -m engine.serialUtils.boardEmulator
+    python -m engine.serialUtils.boardEmulator --falla fase_abierta:B --enlace /tmp/dze0
+    DZE_PUERTO=/tmp/dze0 python main.py      # el backend toma el emulador como banco
+"""
+import os
+import math
+import time
+import struct
+import argparse
+import threading
+
+import numpy as np
+
+from engine.ProbadorHandler.frameParser import (
+    HEADER_ACK, HEADER_ESTADO, HEADER_MUESTRAS, longitud_trama,
+)
+
+# ----------------------------
+# Protocolo (lado placa)
+# ----------------------------
+TRAMA_ACK = HEADER_ACK + b"\x00"
+LARGO_ESTADO = longitud_trama(HEADER_ESTADO)
+LARGO_MUESTRAS = longitud_trama(HEADER_MUESTRAS)
+OFFSET_TENSION = 44
+OFFSET_MUESTRAS = 8
+PARES_POR_TRAMA = (LARGO_MUESTRAS - OFFSET_MUESTRAS) // 4
+
+CMD_CORRIENTE_CARGA = bytes.fromhex("6900000008009100")
+CMD_CORRIENTE_ENSAYO = bytes.fromhex("6900000008009109")
+CMD_START = bytes.fromhex("290000E01900")
+CMD_STOP = bytes.fromhex("290000E02100")
+CMD_KEEP_ALIVE = bytes.fromhex("A9040070")
+
+# Escala del comando de corriente de ensayo (ver SetearCorrientePruebaRegParalelo)
+AMPER_POR_CUENTA_ENSAYO = 0.0006715014773
+
+FALLAS = ("fase_abierta", "mos_abierto", "mos_en_corto", "sobretension")
+FASES = ("A", "B", "C")
+
+
+def largo_mensaje_host(cabecera):
+    """Los mensajes de configuración de 4 bytes (nibble bajo 5 o 6) no codifican largo."""
+    if cabecera[0] & 0x0F in (5, 6):
+        return 4
+    return longitud_trama(cabecera)
+
+
+class ModeloRegulador:
+    """
+    Modelo simple de un regulador paralelo trifásico en el banco.
+
+    - La amplitud de las corrientes de fase sigue a la corriente de ensayo con
+      una constante de tiempo; Ic = -(Ia + Ib).
+    - La tensión de salida tiende a 14.45 V (con una leve caída con la carga)
+      mientras el inversor está en marcha, y a 0 V detenido.
+    Las fallas modifican la fase indicada y/o la tensión.
+    """
+
+    CUENTAS_POR_AMPER = 1400.0      # cuentas ADC de corriente de fase por A de ensayo
+    TENSION_REGULADA = 14.45
+
+    def __init__(self, frecuencia=100.0, muestreo=10000.0, tau_corriente=0.15, tau_tension=0.25,
+                 ruido_corriente=8.0, ruido_tension=0.005, seed=None):
+        self.frecuencia = frecuencia
+        self.muestreo = muestreo
+        self.tau_corriente = tau_corriente
+        self.tau_tension = tau_tension
+        self.ruido_corriente = ruido_corriente
+        self.ruido_tension = ruido_tension
+        self._rng = np.random.default_rng(seed)
+
+        self.corriente_carga = 0.0      # A
+        self.corriente_ensayo = 0.0     # A
+        self.en_marcha = False
+        self.amplitud = 0.0             # cuentas
+        self.tension = 0.0              # V
+        self.fallas = {}                # tipo -> fase (o True)
+        self._fase_electrica = 0.0
+        self._lock = threading.Lock()
+
+    def avanzar(self, dt):
+        with self._lock:
+            objetivo = self.CUENTAS_POR_AMPER * self.corriente_ensayo if self.en_marcha else 0.0
+            self.amplitud += (objetivo - self.amplitud) * (1 - math.exp(-dt / self.tau_corriente))
+
+            if not self.en_marcha:
+                objetivo_v = 0.0
+            elif "mos_en_corto" in self.fallas:
+                objetivo_v = 0.8
+            elif "sobretension" in self.fallas:
+                objetivo_v = 15.3
+            else:
+                objetivo_v = self.TENSION_REGULADA - 0.05 * self.corriente_carga
+            self.tension += (objetivo_v - self.tension) * (1 - math.exp(-dt / self.tau_tension))
+
+    def tension_medida(self):
+        return self.tension + self._rng.normal(0, self.ruido_tension)
+
+    def muestras(self, n=PARES_POR_TRAMA):
+        """Devuelve un arreglo int16 intercalado Ia, Ib de `n` pares."""
+        with self._lock:
+            t = np.arange(n) / self.muestreo
+            w = 2 * np.pi * self.frecuencia
+            fase0 = self._fase_electrica
+            self._fase_electrica = (fase0 + w * n / self.muestreo) % (2 * np.pi)
+            amplitud = self.amplitud
+            fallas = dict(self.fallas)
+
+        corrientes = {}
+        for k, fase in enumerate(FASES):
+            corrientes[fase] = amplitud * np.sin(w * t + fase0 - k * 2 * np.pi / 3)
+
+        afectadas = set()
+        abierta = fallas.get("fase_abierta")
+        if abierta in corrientes:
+            corrientes[abierta] = np.zeros(n)
+            afectadas.add(abierta)
+        mos_abierto = fallas.get("mos_abierto")
+        if mos_abierto in corrientes:
+            # Sin el MOS solo conduce el semiciclo negativo
+            corrientes[mos_abierto] = np.minimum(corrientes[mos_abierto], 0.0)
+            afectadas.add(mos_abierto)
+        mos_en_corto = fallas.get("mos_en_corto")
+        if mos_en_corto in corrientes:
+            corrientes[mos_en_corto] = corrientes[mos_en_corto] * 1.5
+            afectadas.add(mos_en_corto)
+
+        # Las fases sanas absorben el residuo para que Ia + Ib + Ic = 0
+        sanas = [f for f in FASES if f not in afectadas] or list(FASES)
+        residuo = sum(corrientes.values())
+        for fase in sanas:
+            corrientes[fase] = corrientes[fase] - residuo / len(sanas)
+
+        salida = np.empty(2 * n + 1, dtype="<i2")
+        salida[0:2 * n:2] = np.clip(corrientes["A"] + self._rng.normal(0, self.ruido_corriente, n), -32768, 32767)
+        salida[1:2 * n:2] = np.clip(corrientes["B"] + self._rng.normal(0, self.ruido_corriente, n), -32768, 32767)
+        salida[-1] = 0
+        return salida
+
+
+class ProtocoloPlaca:
+    """
+    Lado placa del protocolo, sin E/S: recibe los bytes que escribe el host y
+    devuelve las respuestas; arma las tramas de muestras del modelo. Lo usan el
+    emulador sobre pty y el banco virtual (virtualRunner) con reloj simulado.
+    """
+
+    def __init__(self, modelo=None):
+        self.modelo = modelo if modelo is not None else ModeloRegulador()
+        self._buf = bytearray()
+        self._secuencia = 0
+
+        # Estadísticas
+        self.comandos = 0
+        self.acks = 0
+        self.estados = 0
+        self.tramas_muestras = 0
+        self.configuracion = []
+
+    def inyectar_falla(self, tipo, fase=None):
+        if tipo not in FALLAS:
+            raise ValueError(f"Falla desconocida: {tipo} (opciones: {', '.join(FALLAS)})")
+        with self.modelo._lock:
+            self.modelo.fallas[tipo] = fase.upper() if fase else True
+
+    def limpiar_fallas(self):
+        with self.modelo._lock:
+            self.modelo.fallas.clear()
+
+    def recibir(self, datos):
+        """Agrega bytes del host y devuelve la lista de respuestas a los mensajes completos."""
+        self._buf.extend(datos)
+        respuestas = []
+        while len(self._buf) >= 4:
+            largo = largo_mensaje_host(self._buf)
+            if len(self._buf) < largo:
+                break
+            mensaje = bytes(self._buf[:largo])
+            del self._buf[:largo]
+            respuestas.append(self.atender(mensaje))
+        return respuestas
+
+    def atender(self, mensaje):
+        self.comandos += 1
+        if mensaje.startswith(CMD_KEEP_ALIVE):
+            self.estados += 1
+            return self.trama_estado()
+
+        modelo = self.modelo
+        if mensaje.startswith(CMD_CORRIENTE_CARGA) and len(mensaje) >= 10:
+            modelo.corriente_carga = struct.unpack_from("<h", mensaje, 8)[0] / 1000.0
+        elif mensaje.startswith(CMD_CORRIENTE_ENSAYO) and len(mensaje) >= 10:
+            modelo.corriente_ensayo = struct.unpack_from("<h", mensaje, 8)[0] * AMPER_POR_CUENTA_ENSAYO
+        elif mensaje == CMD_START:
+            modelo.en_marcha = True
+        elif mensaje == CMD_STOP:
+            modelo.en_marcha = False
+        elif len(mensaje) == 4 or mensaje.startswith(b"\x49") or mensaje.startswith(b"\xd9"):
+            self.configuracion.append(mensaje.hex().upper())
+
+        self.acks += 1
+        return TRAMA_ACK
+
+    def trama_estado(self):
+        trama = bytearray(LARGO_ESTADO)
+        trama[0:4] = HEADER_ESTADO
+        # La placa informa mV antes del divisor (ver procesar_trama: *14.7/15)
+        mv = int(round(self.modelo.tension_medida() * 1000.0 * 15.0 / 14.7))
+        struct.pack_into("<h", trama, OFFSET_TENSION, max(-32768, min(32767, mv)))
+        return bytes(trama)
+
+    def trama_muestras(self, dt):
+        """Avanza el modelo `dt` segundos; devuelve una trama de muestras si el inversor está en marcha, si no None."""
+        self.modelo.avanzar(dt)
+        if not self.modelo.en_marcha:
+            return None
+        trama = bytearray(LARGO_MUESTRAS)
+        trama[0:4] = HEADER_MUESTRAS
+        struct.pack_into("<I", trama, 4, self._secuencia & 0xFFFFFFFF)
+        trama[OFFSET_MUESTRAS:] = self.modelo.muestras().tobytes()
+        self._secuencia += 1
+        self.tramas_muestras += 1
+        return bytes(trama)
+
+
+class BoardEmulator:
+    """
+    Placa DZE emulada en un pseudo-terminal.
+
+    `start()` devuelve la ruta del lado esclavo (p. ej. /dev/pts/5), que se abre
+    con pyserial como cualquier puerto. `latencia_ack` agrega una demora fija a
+    cada respuesta para estudiar latencias extremo a extremo.
+    """
+
+    def __init__(self, tramas_por_segundo=40.0, latencia_ack=0.0, enlace=None, **modelo):
+        self.tramas_por_segundo = tramas_por_segundo
+        self.latencia_ack = latencia_ack
+        self.enlace = enlace
+        self.protocolo = ProtocoloPlaca(ModeloRegulador(**modelo))
+        self.modelo = self.protocolo.modelo
+        self.inyectar_falla = self.protocolo.inyectar_falla
+        self.limpiar_fallas = self.protocolo.limpiar_fallas
+        self.puerto = None
+        self._maestro = None
+        self._esclavo = None
+        self._lock_tx = threading.Lock()
+        self._corriendo = False
+        self._hilos = []
+
+    # ------------------------
+    # Ciclo de vida
+    # ------------------------
+    def start(self):
+        import pty
+        import tty
+        self._maestro, self._esclavo = pty.openpty()
+        tty.setraw(self._esclavo)
+        tty.setraw(self._maestro)
+        self.puerto = os.ttyname(self._esclavo)
+        if self.enlace:
+            if os.path.lexists(self.enlace):
+                os.remove(self.enlace)
+            os.symlink(self.puerto, self.enlace)
+        self._corriendo = True
+        self._hilos = [
+            threading.Thread(target=self._recibir, daemon=True),
+            threading.Thread(target=self._transmitir_muestras, daemon=True),
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+        return self.enlace or self.puerto
+
+    def stop(self):
+        self._corriendo = False
+        for fd in (self._maestro, self._esclavo):
+            try:
+                os.close(fd)
+            except (OSError, TypeError):
+                pass
+        for hilo in self._hilos:
+            hilo.join(timeout=1)
+        if self.enlace and os.path.islink(self.enlace):
+            os.remove(self.enlace)
+
+    # ------------------------
+    # E/S sobre el pty
+    # ------------------------
+    def _escribir(self, datos):
+        with self._lock_tx:
+            os.write(self._maestro, datos)
+
+    def _recibir(self):
+        while self._corriendo:
+            try:
+                datos = os.read(self._maestro, 4096)
+            except OSError:
+                return
+            if not datos:
+                return
+            for respuesta in self.protocolo.recibir(datos):
+                if self.latencia_ack:
+                    time.sleep(self.latencia_ack)
+                self._escribir(respuesta)
+
+    def _transmitir_muestras(self):
+        periodo = 1.0 / self.tramas_por_segundo
+        anterior = time.monotonic()
+        proximo = anterior
+        while self._corriendo:
+            ahora = time.monotonic()
+            trama = self.protocolo.trama_muestras(ahora - anterior)
+            anterior = ahora
+            if trama is not None:
+                try:
+                    self._escribir(trama)
+                except OSError:
+                    return
+            proximo += periodo
+            time.sleep(max(0.0, proximo - time.monotonic()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulador de placa DZE en un pseudo-terminal")
+    parser.add_argument("--tps", type=float, default=40.0, help="Tramas de muestras por segundo")
+    parser.add_argument("--frecuencia", type=float, default=100.0, help="Frecuencia eléctrica de las corrientes (Hz)")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Demora agregada a cada respuesta (s)")
+    parser.add_argument("--falla", action="append", default=[],
+                        help=f"Falla a inyectar: tipo[:fase], tipo en {', '.join(FALLAS)}")
+    parser.add_argument("--enlace", help="Crear un enlace simbólico estable al puerto (p. ej. /tmp/dze0)")
+    parser.add_argument("--seed", type=int, help="Semilla del ruido (reproducible)")
+    args = parser.parse_args()
+
+    emulador = BoardEmulator(args.tps, args.latencia, args.enlace, frecuencia=args.frecuencia, seed=args.seed)
+    for falla in args.falla:
+        tipo, _, fase = falla.partition(":")
+        emulador.inyectar_falla(tipo, fase or None)
+    puerto = emulador.start()
+    print(f"Emulador DZE escuchando en {puerto}  (fallas: {emulador.modelo.fallas or 'ninguna'})")
+    try:
+        while True:
+            time.sleep(5)
+            p = emulador.protocolo
+            print(f"comandos={p.comandos} acks={p.acks} status={p.estados} "
+                  f"muestras={p.tramas_muestras} Vout={emulador.modelo.tension:.2f} V")
+    except KeyboardInterrupt:
+        print("\nEmulador detenido.")
+    finally:
+        emulador.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import select
+import threading
+
+from engine.serialUtils.SerialFinder import find_stlinks
+from engine.ProbadorHandler.eventLog import registro
+
+log = registro("hotplug")
+
+EVENTO_CONECTADA = "conectada"
+EVENTO_RETIRADA = "retirada"
+
+# Directorios donde aparecen/desaparecen los nodos de puerto serie en Linux
+DIRECTORIOS_VIGILADOS = ("/dev", "/dev/serial/by-id")
+
+# Máscaras de inotify (linux/inotify.h)
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+MASCARA = IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+class _Inotify:
+    """Acceso mínimo a inotify por ctypes (sin dependencias externas)."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        self._vigilados = set()
+
+    def vigilar(self, ruta):
+        if not os.path.isdir(ruta):
+            self._vigilados.discard(ruta)   # el kernel descarta la vigilancia si se borra el directorio
+            return
+        if ruta in self._vigilados:
+            return
+        if self._libc.inotify_add_watch(self.fd, os.fsencode(ruta), MASCARA) >= 0:
+            self._vigilados.add(ruta)
+
+    def esperar(self, timeout):
+        """Bloquea hasta que haya eventos o venza `timeout`. Descarta su contenido."""
+        listos, _, _ = select.select([self.fd], [], [], timeout)
+        if not listos:
+            return False
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class HotplugWatcher:
+    """
+    Vigila la conexión y desconexión de placas ST-Link habilitadas.
+
+    En Linux se bloquea en inotify sobre /dev y /dev/serial/by-id y solo vuelve a
+    enumerar puertos cuando el kernel/udev crea o borra un nodo; en otras
+    plataformas (o si inotify no está disponible) enumera cada `intervalo` segundos.
+    Por cada diferencia respecto del escaneo anterior llama a
+    `callback(evento, serial, puerto)` con EVENTO_CONECTADA o EVENTO_RETIRADA.
+    """
+
+    def __init__(self, callback, seriales=None, intervalo=1.0, rescan_seguridad=10.0, antirrebote=0.03):
+        self._callback = callback
+        self.seriales = seriales
+        self.intervalo = intervalo
+        self.rescan_seguridad = rescan_seguridad    # escaneo periódico aun con inotify
+        self.antirrebote = antirrebote              # agrupa la ráfaga de eventos de un mismo enchufe
+        self.presentes = {}                         # serial -> puerto
+        self.modo = None
+        self._corriendo = False
+        self._hilo = None
+        self._inotify = None
+        self.escaneado = threading.Event()          # terminó el primer escaneo (placas ya enchufadas)
+
+    def start(self):
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._corriendo = True
+        if sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+                self.modo = "inotify"
+            except (OSError, AttributeError) as e:
+                log.warning("inotify no disponible (%s), usando sondeo periódico.", e)
+                self._inotify = None
+        if self._inotify is None:
+            self.modo = "sondeo"
+        self._hilo = threading.Thread(target=self._ejecutar, daemon=True)
+        self._hilo.start()
+
+    def stop(self):
+        self._corriendo = False
+        if self._hilo is not None and self._hilo.is_alive():
+            self._hilo.join(timeout=max(self.intervalo, 1.0) + 0.5)
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    @property
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def escanear(self):
+        """Enumera una vez y emite los eventos correspondientes a los cambios."""
+        actuales = dict(find_stlinks(self.seriales))
+        for serial, puerto in list(self.presentes.items()):
+            if actuales.get(serial) != puerto:
+                del self.presentes[serial]
+                self._emitir(EVENTO_RETIRADA, serial, puerto)
+        for serial, puerto in actuales.items():
+            if serial not in self.presentes:
+                self.presentes[serial] = puerto
+                self._emitir(EVENTO_CONECTADA, serial, puerto)
+
+    def _emitir(self, evento, serial, puerto):
+        try:
+            self._callback(evento, serial, puerto)
+        except Exception:
+            log.exception("Error atendiendo evento %s de %s", evento, serial, extra={"fixture": serial})
+
+    def _ejecutar(self):
+        self.escanear()
+        self.escaneado.set()
+        ultimo_escaneo = time.monotonic()
+        while self._corriendo:
+            if self._inotify is not None:
+                # /dev/serial/by-id solo existe con algún puerto conectado: se reintenta agregarlo
+                for ruta in DIRECTORIOS_VIGILADOS:
+                    self._inotify.vigilar(ruta)
+                # El timeout solo sirve para poder detener el hilo y para el escaneo de seguridad
+                if self._inotify.esperar(self.intervalo):
+                    time.sleep(self.antirrebote)
+                    self._inotify.esperar(0)
+                elif time.monotonic() - ultimo_escaneo < self.rescan_seguridad:
+                    continue
+            else:
+                time.sleep(self.intervalo)
+            if not self._corriendo:
+                break
+            ultimo_escaneo = time.monotonic()
+            try:
+                self.escanear()
+            except Exception as e:
+                log.error("Error enumerando puertos: %s", e)
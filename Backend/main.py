@@ -1,17 +1,25 @@
-import os
 import time
+INICIO = time.perf_counter()    # antes del resto de los imports: el desglose de arranque los incluye
+
+import os
 import threading
 from flask import Flask
-from concurrent.futures import ThreadPoolExecutor
 from flask_cors import CORS
 import webbrowser
 import subprocess
 import sys
 
-from engine.ProbadorHandler.mainOLD import DZETester
-from engine.serialUtils.SerialFinder import find_stlink
+# El núcleo del tester (numpy, pyserial) se importa al crear el primer banco, ver nucleo()
+from engine.ProbadorHandler.fixtureRegistry import FixtureRegistry
+from engine.ProbadorHandler.logRing import AnilloLog
+from engine.ProbadorHandler.eventLog import configurar_registro, registro
+from engine.ProbadorHandler.startupTiming import CronometroArranque
+from engine.serialUtils.hotplugWatcher import HotplugWatcher, EVENTO_CONECTADA
 from engine.routes.routes import register_routes
 
+arranque = CronometroArranque(INICIO)
+arranque.marca("imports")
+
 # ------------------------
 # Configuración
 # ------------------------
@@ -19,51 +27,83 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FRONTEND_DIST_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "Frontend", "dist"))
 
 BAUDRATE = 1843200  # Velocidad del DZE Tester
-log_buffer = []
+NUCLEO = os.environ.get("DZE_NUCLEO", "hilos")  # "hilos" o "asyncio"
+CAPTURAS_DIR = os.environ.get("DZE_CAPTURAS")   # si se define, graba RX/TX crudo de cada banco ahí
+REGISTRO_ARCHIVO = os.environ.get("DZE_REGISTRO", os.path.join(BASE_DIR, "logs", "dze.log"))
+REGISTRO_CONSOLA = os.environ.get("DZE_REGISTRO_CONSOLA", "DEBUG").upper()   # DEBUG muestra cada TX
+log_buffer = AnilloLog()     # capacidad fija, servido incrementalmente en GET /logs?since=<seq>
 
-# ------------------------
-# Callback de eventos serie
-# ------------------------
-def serial_callback(message):
-    log_buffer.append(message)
-    print(message)
+# Registro de eventos: los hilos del puerto solo encolan; consola, archivo
+# rotativo comprimido y log_buffer (INFO en adelante) los atiende otro hilo
+configurar_registro(nivel_consola=REGISTRO_CONSOLA, archivo=REGISTRO_ARCHIVO, anillo=log_buffer)
+log = registro("servidor")
+arranque.marca("registro")
 
 # ------------------------
-# Inicializar DZE Tester
+# Inicializar bancos (un DZE Tester por placa ST-Link habilitada, ver DZE_SERIALES)
 # ------------------------
-dze_tester = DZETester()
-
-def inicializar_serial():
-    print("Inicializando interfaz serial...")
-    while True:
-        found, PuertoSerie = find_stlink()
-        if found:
-            print(f"Placa encontrada en: {PuertoSerie}")
-            dze_tester.start(PuertoSerie)
-            break
-        else:
-            print("No se encontró la placa STLink, reintentando en 1 segundo...")
-            time.sleep(1)
+def nucleo():
+    """Clase del tester según DZE_NUCLEO; importar su módulo es lo más pesado del arranque."""
+    if NUCLEO == "asyncio":
+        from engine.ProbadorHandler.asyncCore import DZETesterAsync
+        return DZETesterAsync
+    from engine.ProbadorHandler.mainOLD import DZETester
+    return DZETester
 
-def on_stop():
-    if dze_tester:
-        dze_tester.stop()
+def crear_tester(fixture_id):
+    # Lo llama el banco la primera vez que se usa (normalmente al conectarse su placa)
+    with arranque.medir(f"tester {fixture_id}"):
+        tester = nucleo()()
+    if CAPTURAS_DIR:
+        tester.iniciar_grabacion(os.path.join(CAPTURAS_DIR, fixture_id))
+    return tester
+
+def precargar_nucleo():
+    # En paralelo con el escaneo de placas y Flask: el primer banco ya no paga el import
+    with arranque.medir("nucleo"):
+        nucleo()
+
+# DESCUBRIENDO hasta que termina el primer escaneo de placas (GET /ready)
+fixtures = FixtureRegistry(crear_tester, descubriendo=True)
+placa_lista = threading.Event()     # hay al menos un banco conectado
+arranque.marca("bancos")
 
 # ------------------------
-# Ejecución de ensayo
+# Hot-plug: conexión/desconexión de placas sin sondeo
 # ------------------------
-def run_shunt_test():
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        futuro = executor.submit(dze_tester.ProbarReguladorParalelo)
-        resultado = futuro.result()
-    return resultado
+def evento_hotplug(evento, serial, puerto):
+    if evento == EVENTO_CONECTADA:
+        if fixtures.placa_conectada(serial, puerto):
+            placa_lista.set()
+    else:
+        log.warning("Placa %s retirada", serial, extra={"fixture": serial})
+        fixtures.placa_retirada(serial)
+        if not fixtures.conectados():
+            placa_lista.clear()
+
+vigilante = HotplugWatcher(evento_hotplug, fixtures.seriales)
+
+def fin_primer_escaneo():
+    with arranque.medir("escaneo"):
+        vigilante.escaneado.wait()
+    fixtures.fin_descubrimiento()
+
+def descubrir_placas():
+    """Arranca el vigilante sin esperar: su primer escaneo conecta las placas ya presentes."""
+    vigilante.start()
+    threading.Thread(target=fin_primer_escaneo, daemon=True).start()
+
+def on_stop():
+    vigilante.stop()
+    fixtures.detener_todos()
 
 # ------------------------
 # Configurar Flask
 # ------------------------
 app = Flask(__name__, static_folder=FRONTEND_DIST_PATH, static_url_path="")
 CORS(app, supports_credentials=True, resources={r"/*": {"origins": "*"}})
-register_routes(app, FRONTEND_DIST_PATH, dze_tester, log_buffer, inicializar_serial)
+register_routes(app, FRONTEND_DIST_PATH, fixtures, log_buffer, arranque)
+arranque.marca("flask")
 
 # ------------------------
 # Servidor Flask
@@ -83,7 +123,7 @@ def abrir_navegador_fullscreen(url="http://localhost:5000"):
             if os.path.exists(chrome_path):
                 os.system(f'start "" "{chrome_path}" --start-fullscreen "{url}"')
             else:
-                print("Chrome no encontrado, abriendo navegador por defecto...")
+                log.warning("Chrome no encontrado, abriendo navegador por defecto...")
                 webbrowser.open(url)
         elif sys.platform.startswith("darwin"):
             subprocess.Popen([
@@ -94,25 +134,34 @@ def abrir_navegador_fullscreen(url="http://localhost:5000"):
         else:
             subprocess.Popen(["google-chrome", "--start-fullscreen", url])
     except Exception as e:
-        print("No se pudo abrir el navegador en fullscreen:", e)
+        log.warning("No se pudo abrir el navegador en fullscreen: %s", e)
         webbrowser.open(url)
 
 if __name__ == "__main__":
-    # Iniciar hilo Flask
+    # Las etapas independientes arrancan juntas: import del núcleo, escaneo de
+    # placas (conecta y configura las presentes), servidor Flask y navegador.
+    # La GUI sigue el avance en GET /ready.
+    log.info("Inicializando interfaz serial...")
+    threading.Thread(target=precargar_nucleo, daemon=True).start()
+    descubrir_placas()
+
     flask_thread = threading.Thread(target=start_flask, daemon=True)
     flask_thread.start()
-    print("Servidor Flask iniciado.")
+    log.info("Servidor Flask iniciado.")
+    arranque.marca("servidor")
 
     # Abrir navegador en pantalla completa
-    abrir_navegador_fullscreen("http://localhost:5000")
+    threading.Thread(target=abrir_navegador_fullscreen, args=("http://localhost:5000",), daemon=True).start()
 
-    # Inicializar comunicación serie
-    inicializar_serial()
+    while not placa_lista.wait(timeout=5):
+        log.warning("No se encontró ninguna placa STLink habilitada, esperando conexión...")
+    arranque.marca("placas")
 
-    print("Comunicación con DZETester activa.")
+    log.info("Comunicación con DZETester activa.")
+    log.info(arranque.texto())
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
-        print("Cerrando servidor Flask y comunicación serie...")
+        log.info("Cerrando servidor Flask y comunicación serie...")
         on_stop()
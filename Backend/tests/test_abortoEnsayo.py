@@ -0,0 +1,43 @@
+import pytest
+
+from engine.ProbadorHandler.mainOLD import DZETester, EnsayoAbortado
+from engine.ProbadorHandler.virtualClock import RelojVirtual
+from engine.ProbadorHandler.virtualRunner import PlacaVirtual, preparar_tester
+
+
+def banco():
+    reloj = RelojVirtual()
+    placa = PlacaVirtual(reloj)
+    tester = preparar_tester(DZETester, reloj, placa)
+    placa.start()
+    tester.configurar_placa()
+    return tester, reloj, placa
+
+
+def test_abortar_detiene_y_limpia_el_pedido():
+    tester, reloj, placa = banco()
+    reloj.programar_en(1.0, tester.abortar_ensayo)
+    with pytest.raises(EnsayoAbortado):
+        tester.ProbarReguladorParalelo()
+    assert tester.EstadoEnsayo == 3
+    assert not placa.protocolo.modelo.en_marcha     # se envió el Stop
+    # Sin ensayo en curso, las esperas de otros llamadores no ven el pedido viejo
+    assert not tester.abortado.is_set()
+    assert len(tester.wait_for_frames(1, timeout=0.5)) == 0
+
+
+def test_abortar_sin_ensayo_no_hace_nada():
+    tester, _, _ = banco()
+    assert tester.abortar_ensayo() is False
+    assert not tester.abortado.is_set()
+    assert tester.ProbarReguladorParalelo()["general_state"] == 2
+
+
+def test_abortar_antes_de_que_arranque_la_secuencia():
+    # Como el timeout de probar_regulador_paralelo_async antes de que arranque el ejecutor
+    tester, _, _ = banco()
+    tester._iniciar_ensayo()
+    assert tester.abortar_ensayo() is True
+    with pytest.raises(EnsayoAbortado):
+        tester._correr_ensayo()
+    assert not tester.abortado.is_set()
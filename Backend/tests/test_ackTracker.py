@@ -0,0 +1,130 @@
+from engine.ProbadorHandler.ackTracker import ACKTracker, esperar_ack
+from engine.ProbadorHandler.mainOLD import DZETester, MENSAJES_CONFIGURACION
+from engine.ProbadorHandler.virtualClock import RelojVirtual
+from engine.ProbadorHandler.virtualRunner import PlacaVirtual, preparar_tester
+from engine.serialUtils.boardEmulator import ProtocoloPlaca, TRAMA_ACK
+
+
+def test_ack_en_orden():
+    acks = ACKTracker()
+    a, b = acks.nuevo_futuro(), acks.nuevo_futuro()
+    acks.registrar(a, 1.0)
+    acks.registrar(b, 1.0)
+    acks.recibido()
+    assert a.result(0) is True and not b.done()
+    acks.recibido()
+    assert b.result(0) is True
+    assert acks.sin_correlacion == 0
+
+
+def acks_con_rtt(reloj, rtt=0.001):
+    """ACKTracker sobre `reloj` con un RTT medido de `rtt` segundos."""
+    acks = ACKTracker(reloj)
+    f = acks.nuevo_futuro()
+    acks.registrar(f, 1.0)
+    reloj.sleep(rtt)
+    acks.recibido()
+    assert f.result(0) is True
+    return acks
+
+
+def test_ack_tardio_dentro_de_la_gracia_es_del_abandonado():
+    reloj = RelojVirtual()
+    acks = acks_con_rtt(reloj)
+    a = acks.nuevo_futuro()
+    acks.registrar(a, 1.0)
+    assert esperar_ack(a, 0.01) is False        # quien esperaba `a` se cansa
+    b = acks.nuevo_futuro()
+    acks.registrar(b, 1.0)
+    acks.recibido()                             # antes de que `b` pueda tener respuesta: es de `a`
+    assert not b.done()
+    assert acks.tardios == 1
+    reloj.sleep(0.001)
+    acks.recibido()
+    assert esperar_ack(b, 0) is True
+
+
+def test_abandonado_no_retiene_el_ack_siguiente():
+    # Un ACK perdido cuesta un solo comando: el del siguiente no lo consume el abandonado
+    reloj = RelojVirtual()
+    acks = acks_con_rtt(reloj)
+    a = acks.nuevo_futuro()
+    acks.registrar(a, 1.0)
+    assert esperar_ack(a, 0.01) is False
+    b = acks.nuevo_futuro()
+    acks.registrar(b, 1.0)
+    reloj.sleep(0.001)
+    acks.recibido()
+    assert esperar_ack(b, 0) is True
+    assert acks.vencidos == 1 and acks.tardios == 0
+
+
+def test_entrada_vencida_no_retiene_acks():
+    # La placa nunca respondió a `a` y nadie lo esperaba: pasado su timeout el ACK es de `b`
+    reloj = RelojVirtual()
+    acks = ACKTracker(reloj)
+    a, b = acks.nuevo_futuro(), acks.nuevo_futuro()
+    acks.registrar(a, 0.01)
+    reloj.sleep(0.02)
+    acks.registrar(b, 1.0)
+    acks.recibido()
+    assert b.result(0) is True
+    assert acks.vencidos == 1
+
+
+class ProtocoloSinUnACK(ProtocoloPlaca):
+    """Placa que pierde el ACK número `perdido` (contando desde 1)."""
+
+    def __init__(self, perdido):
+        super().__init__()
+        self.perdido = perdido
+
+    def atender(self, mensaje):
+        respuesta = super().atender(mensaje)
+        if respuesta == TRAMA_ACK and self.acks == self.perdido:
+            return b""
+        return respuesta
+
+
+def configurar_perdiendo(perdido):
+    reloj = RelojVirtual()
+    tester = preparar_tester(DZETester, reloj, PlacaVirtual(reloj, ProtocoloSinUnACK(perdido)))
+    t0 = reloj.monotonic()
+    tester.configurar_placa()
+    return tester, reloj.monotonic() - t0
+
+
+def test_configuracion_pierde_solo_el_ack_perdido():
+    tester, _ = configurar_perdiendo(3)
+    # Sondeo + 14 mensajes con ACK; el tercero se perdió y nadie se quedó con el de otro
+    assert len(tester.acks.rtt) == len(MENSAJES_CONFIGURACION) - 1
+    assert tester.acks.tardios == 0
+
+
+def test_sondeo_sin_respuesta_no_arrastra_acks():
+    # El primer sondeo sin respuesta es el caso normal de esperar_placa
+    tester, duracion = configurar_perdiendo(1)
+    assert len(tester.acks.rtt) == len(MENSAJES_CONFIGURACION)
+    assert tester.acks.tardios == 0
+    assert duracion < 0.5
+
+
+
+def test_sondeo_reenviado_cuenta_como_reintento():
+    tester, _ = configurar_perdiendo(1)
+    assert tester.metricas.reintentos_tx == 1
+    tester, _ = configurar_perdiendo(5)          # un mensaje sin ACK no se reenvía
+    assert tester.metricas.reintentos_tx == 0
+
+def test_ack_sin_pendientes():
+    acks = ACKTracker()
+    acks.recibido()
+    assert acks.sin_correlacion == 1
+
+
+def test_cancelar_todos_resuelve_false():
+    acks = ACKTracker()
+    a = acks.nuevo_futuro()
+    acks.registrar(a, 1.0)
+    acks.cancelar_todos()
+    assert esperar_ack(a, 0) is False
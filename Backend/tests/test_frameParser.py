@@ -0,0 +1,60 @@
+from engine.ProbadorHandler.frameParser import (
+    FrameParser, HEADER_ACK, HEADER_ESTADO, HEADER_MUESTRAS, longitud_trama,
+)
+
+TRAMA_ACK = HEADER_ACK + b"\x00"
+
+
+def trama(header, relleno=0x55):
+    return header + bytes([relleno]) * (longitud_trama(header) - len(header))
+
+
+def test_longitudes():
+    assert longitud_trama(HEADER_ACK) == 5
+    assert longitud_trama(HEADER_ESTADO) == 4 + 0x052     # 0x4000052A: bits 4..15
+
+
+def test_varias_tramas_en_una_lectura():
+    parser = FrameParser()
+    tramas = parser.feed(TRAMA_ACK + trama(HEADER_ESTADO) + TRAMA_ACK)
+    assert [h for h, _ in tramas] == [HEADER_ACK, HEADER_ESTADO, HEADER_ACK]
+    assert parser.pendientes() == 0
+
+
+def test_trama_partida_en_trozos():
+    parser = FrameParser()
+    datos = trama(HEADER_MUESTRAS)
+    recibidas = []
+    for i in range(0, len(datos), 7):
+        recibidas += parser.feed(datos[i:i + 7])
+    assert recibidas == [(HEADER_MUESTRAS, datos)]
+
+
+def test_resincroniza_tras_basura():
+    parser = FrameParser()
+    tramas = parser.feed(b"\x00\xff\x13" + TRAMA_ACK + b"\x99\x98" + TRAMA_ACK)
+    assert tramas == [(HEADER_ACK, TRAMA_ACK), (HEADER_ACK, TRAMA_ACK)]
+    assert parser.bytes_descartados == 5
+
+
+def test_cabecera_partida_entre_lecturas_con_basura():
+    # Sin cabecera a la vista se descarta la basura pero se conservan los últimos 3 bytes
+    parser = FrameParser()
+    assert parser.feed(b"\x01\x02\x03\x04" + HEADER_ACK[:3]) == []
+    assert parser.feed(HEADER_ACK[3:] + b"\x00") == [(HEADER_ACK, TRAMA_ACK)]
+    assert parser.bytes_descartados == 4
+
+
+def test_reset_descarta_parcial():
+    parser = FrameParser()
+    parser.feed(trama(HEADER_ESTADO)[:10])
+    parser.reset()
+    assert parser.pendientes() == 0
+    assert parser.feed(TRAMA_ACK) == [(HEADER_ACK, TRAMA_ACK)]
+
+
+def test_buffer_crece_y_compacta():
+    parser = FrameParser(capacidad=16)
+    datos = trama(HEADER_MUESTRAS) * 3
+    assert len(parser.feed(datos)) == 3
+    assert parser.tramas == 3
@@ -0,0 +1,57 @@
+import copy
+
+from engine.ProbadorHandler.mainOLD import DZETester
+from engine.ProbadorHandler.virtualClock import RelojVirtual
+from engine.ProbadorHandler.virtualRunner import PlacaVirtual, preparar_tester
+from engine.serialUtils.boardEmulator import ProtocoloPlaca
+
+
+def test_cada_ensayo_devuelve_sus_propios_resultados():
+    # Los trabajos guardan el dict devuelto: el ensayo siguiente no debe modificarlo
+    reloj = RelojVirtual()
+    placa = PlacaVirtual(reloj)
+    tester = preparar_tester(DZETester, reloj, placa)
+    placa.start()
+    tester.configurar_placa()
+    r1 = tester.ProbarReguladorParalelo()
+    copia = copy.deepcopy(r1)
+    placa.protocolo.modelo.tension += 1.0
+    r2 = tester.ProbarReguladorParalelo()
+    assert r2 is not r1
+    assert r1 == copia
+    assert r2["Vout"] != r1["Vout"]
+
+
+class ProtocoloSinMuestras(ProtocoloPlaca):
+    """Placa que responde comandos y status pero nunca envía tramas de muestras."""
+
+    def trama_muestras(self, dt):
+        self.modelo.avanzar(dt)
+        return None
+
+
+def test_ventanas_vacias_dan_error():
+    reloj = RelojVirtual()
+    placa = PlacaVirtual(reloj, ProtocoloSinMuestras())
+    tester = preparar_tester(DZETester, reloj, placa)
+    placa.start()
+    tester.configurar_placa()
+    r = tester.ProbarReguladorParalelo()
+    assert r["general_state"] == 3
+    assert r["mediciones_incompletas"] == ["corrientes_1", "corrientes_2"]
+    assert set(r["state_corrientes_1"].values()) == {"Sin medición"}
+    assert set(r["state_corrientes_2"].values()) == {"Sin medición"}
+
+
+def test_sin_lecturas_de_tension_no_usa_la_anterior():
+    reloj = RelojVirtual()
+    placa = PlacaVirtual(reloj)
+    tester = preparar_tester(DZETester, reloj, placa)
+    placa.start()
+    tester.configurar_placa()
+    tester.TensionSalida = 14.45                # lectura vieja, de antes del ensayo
+    placa.keep_alive = lambda: None             # no hay más tramas de status
+    r = tester.ProbarReguladorParalelo()
+    assert r["general_state"] == 3
+    assert r["Vout"] is None
+    assert r["mediciones_incompletas"] == ["tension"]
@@ -0,0 +1,84 @@
+import numpy as np
+
+from engine.ProbadorHandler.sampleRing import SampleRing, ValueRing
+
+
+def trama(inicio, n):
+    ia = np.arange(inicio, inicio + n, dtype=np.int32)
+    return ia, -ia, 2 * ia
+
+
+def test_vuelta_completa_conserva_las_ultimas():
+    anillo = SampleRing(capacidad=8, capacidad_tramas=4)
+    for k in range(5):                              # 15 muestras en un anillo de 8
+        anillo.agregar(*trama(3 * k, 3), t_rx=float(k))
+    ia, ib, ic = anillo.ultimas_muestras(8)
+    assert ia.tolist() == list(range(7, 15))
+    assert ib.tolist() == [-x for x in range(7, 15)]
+    assert ic.tolist() == [2 * x for x in range(7, 15)]
+    assert anillo.total == 15 and anillo.seq == 4
+
+
+def test_vistas_contiguas_sin_copia():
+    # La copia espejo hace contigua la ventana que cruza el final del arreglo
+    anillo = SampleRing(capacidad=8)
+    anillo.agregar(*trama(0, 6), t_rx=0.0)
+    anillo.agregar(*trama(6, 5), t_rx=1.0)          # cruza el final: posiciones 6..7 y 0..2
+    ia, _, _ = anillo.ultimas_muestras(5)
+    assert ia.tolist() == [6, 7, 8, 9, 10]
+    assert ia.base is not None and ia.flags["C_CONTIGUOUS"]
+
+
+def test_trama_que_cruza_el_final():
+    anillo = SampleRing(capacidad=8)
+    anillo.agregar(*trama(0, 6), t_rx=0.0)
+    seq = anillo.agregar(*trama(6, 5), t_rx=1.0)
+    t_rx, ia, ib, _ = anillo.trama(seq)
+    assert t_rx == 1.0
+    assert ia.tolist() == [6, 7, 8, 9, 10]
+    assert ib.tolist() == [-6, -7, -8, -9, -10]
+
+
+def test_trama_sobrescrita_devuelve_none():
+    anillo = SampleRing(capacidad=8, capacidad_tramas=2)
+    primera = anillo.agregar(*trama(0, 4), t_rx=0.0)
+    anillo.agregar(*trama(4, 4), t_rx=1.0)
+    assert anillo.trama(primera) is not None
+    anillo.agregar(*trama(8, 4), t_rx=2.0)          # pisa muestras y metadatos de la primera
+    assert anillo.trama(primera) is None
+    assert anillo.tramas_desde(1.0) == [1, 2]
+
+
+def test_muestras_desde_acotado_a_la_capacidad():
+    anillo = SampleRing(capacidad=8)
+    for k in range(4):
+        anillo.agregar(*trama(4 * k, 4), t_rx=float(k))
+    ia, _, _ = anillo.muestras_desde(2)             # ya sobrescritas: desde la más vieja disponible
+    assert ia.tolist() == list(range(8, 16))
+    ia, _, _ = anillo.muestras_desde(13)
+    assert ia.tolist() == [13, 14, 15]
+
+
+def test_copiar_ultimas_decima_incluyendo_la_ultima():
+    anillo = SampleRing(capacidad=16)
+    anillo.agregar(*trama(0, 10), t_rx=0.0)
+    total, seq, (ia, ib, _) = anillo.copiar_ultimas(10, paso=3)
+    assert (total, seq) == (10, 0)
+    assert ia.tolist() == [0, 3, 6, 9]
+    assert ib.tolist() == [0, -3, -6, -9]
+    anillo.agregar(*trama(10, 4), t_rx=1.0)
+    assert ia.tolist() == [0, 3, 6, 9]              # es una copia, no una vista
+
+
+def test_value_ring_vuelta_y_desde():
+    anillo = ValueRing(capacidad=4)
+    for k in range(6):
+        anillo.agregar(10.0 + k, t_rx=float(k))
+    t, v = anillo.ultimos(4)
+    assert t.tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert v.tolist() == [12.0, 13.0, 14.0, 15.0]
+    t, v = anillo.desde(3.5)
+    assert v.tolist() == [14.0, 15.0]
+    t, v = anillo.copiar_ultimos(2)
+    anillo.agregar(99.0, t_rx=6.0)
+    assert v.tolist() == [14.0, 15.0]
@@ -0,0 +1,95 @@
+from engine.ProbadorHandler.ackTracker import ACKTracker, esperar_ack, resolver
+from engine.ProbadorHandler.txScheduler import ColaTX, ComandoTX, TXScheduler, PRIORIDAD_ENSAYO, PRIORIDAD_KEEP_ALIVE
+
+
+def test_prioridad_y_orden_de_llegada():
+    cola = ColaTX()
+    cola.encolar(ComandoTX("AA", prioridad=PRIORIDAD_KEEP_ALIVE))
+    cola.encolar(ComandoTX("01"))
+    cola.encolar(ComandoTX("02"))
+    assert [cola.sacar().cmd for _ in range(3)] == ["01", "02", "AA"]
+    assert cola.sacar() is None
+
+
+def test_coalescencia_gana_el_ultimo_valor():
+    cola = ColaTX()
+    primero = cola.encolar(ComandoTX("01", clave="rampa"))
+    segundo = cola.encolar(ComandoTX("02", clave="rampa"))
+    assert segundo is primero
+    assert len(cola) == 1 and cola.coalescidos == 1
+    assert cola.sacar().cmd == "02"
+    # Ya enviado: el siguiente con la misma clave es un comando nuevo
+    assert cola.encolar(ComandoTX("03", clave="rampa")) is not primero
+
+
+def test_coalescencia_sube_la_prioridad():
+    cola = ColaTX()
+    cola.encolar(ComandoTX("AA", prioridad=PRIORIDAD_KEEP_ALIVE, clave="k"))
+    cola.encolar(ComandoTX("01"))
+    cola.encolar(ComandoTX("AB", prioridad=PRIORIDAD_ENSAYO, clave="k"))
+    assert [cola.sacar().cmd for _ in range(2)] == ["01", "AB"]
+    assert cola.sacar() is None
+
+
+def test_coalescencia_reparte_el_ack_a_ambos():
+    acks = ACKTracker()
+    a, b = acks.nuevo_futuro(), acks.nuevo_futuro()
+    cola = ColaTX()
+    cola.encolar(ComandoTX("01", clave="rampa", ack=a))
+    comando = cola.encolar(ComandoTX("02", clave="rampa", ack=b))
+    assert comando.ack is not a and comando.ack is not b
+    resolver(comando.ack, True)
+    assert a.result(0) is True and b.result(0) is True
+
+
+def test_coalescencia_con_futuro_previo_cancelado():
+    # El que encoló primero se cansó de esperar: el segundo no hereda su futuro cancelado
+    acks = ACKTracker()
+    a, b = acks.nuevo_futuro(), acks.nuevo_futuro()
+    cola = ColaTX()
+    cola.encolar(ComandoTX("01", clave="rampa", ack=a))
+    assert esperar_ack(a, 0) is False
+    comando = cola.encolar(ComandoTX("02", clave="rampa", ack=b))
+    assert comando.ack is b
+    resolver(comando.ack, True)
+    assert esperar_ack(b, 0) is True
+
+
+def test_cancelar_uno_no_afecta_al_otro():
+    acks = ACKTracker()
+    a, b = acks.nuevo_futuro(), acks.nuevo_futuro()
+    cola = ColaTX()
+    cola.encolar(ComandoTX("01", clave="rampa", ack=a))
+    comando = cola.encolar(ComandoTX("02", clave="rampa", ack=b))
+    acks.registrar(comando.ack, 1.0)
+    assert esperar_ack(a, 0) is False
+    acks.recibido()
+    assert esperar_ack(b, 0) is True
+
+
+
+def test_cancelar_ambos_abandona_el_compartido():
+    # Si los dos se cansan, la entrada del ACKTracker no debe quedarse con el ACK siguiente
+    acks = ACKTracker()
+    a, b = acks.nuevo_futuro(), acks.nuevo_futuro()
+    cola = ColaTX()
+    cola.encolar(ComandoTX("01", clave="rampa", ack=a))
+    comando = cola.encolar(ComandoTX("02", clave="rampa", ack=b))
+    assert esperar_ack(a, 0) is False and not comando.ack.cancelled()
+    assert esperar_ack(b, 0) is False
+    assert comando.ack.cancelled()
+
+def test_scheduler_escribe_y_registra_el_ack():
+    escritos = []
+    acks = ACKTracker()
+    tx = TXScheduler(lambda cmd, descripcion: escritos.append(cmd) or True, pausa=0, acks=acks)
+    tx.start()
+    try:
+        futuro = acks.nuevo_futuro()
+        comando = tx.encolar("01", ack=futuro)
+        assert comando.esperar(timeout=1) is True
+        acks.recibido()
+        assert esperar_ack(futuro, 1) is True
+        assert escritos == ["01"]
+    finally:
+        tx.stop()
@@ -0,0 +1,39 @@
+import { useEffect, useState } from "react";
+import { apiUrl } from "./apiUrl";
+
+const POLL_ARRANQUE_MS = 500;
+const POLL_LISTO_MS = 5000;
+
+// Estado de preparación del backend (GET /ready): "descubriendo", "sin_placa",
+// "configurando" o "listo". Null mientras el servidor no responde.
+export function useReadiness() {
+    const [ready, setReady] = useState(null);
+
+    useEffect(() => {
+        let activo = true;
+        let timer = null;
+
+        const consultar = async () => {
+            let listo = false;
+            try {
+                const res = await fetch(apiUrl("/ready"), { credentials: "include" });
+                if (res.ok) {
+                    const data = await res.json();
+                    listo = data.listo;
+                    if (activo) setReady(data);
+                }
+            } catch {
+                if (activo) setReady(null);
+            }
+            if (activo) timer = setTimeout(consultar, listo ? POLL_LISTO_MS : POLL_ARRANQUE_MS);
+        };
+
+        consultar();
+        return () => {
+            activo = false;
+            clearTimeout(timer);
+        };
+    }, []);
+
+    return ready;
+}
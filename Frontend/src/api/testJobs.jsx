@@ -0,0 +1,30 @@
+import { apiUrl } from "./apiUrl";
+
+const POLL_MS = 500;
+
+// Encola un ensayo (POST /jobs) y consulta GET /jobs/<id> hasta que termina.
+// Devuelve lo mismo que devolvía POST /testregulator: { status, fixture, resultado }.
+// Si ya había un ensayo en curso, el backend devuelve ese mismo trabajo.
+export async function runTestJob() {
+    const res = await fetch(apiUrl("/jobs"), {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        credentials: "include",
+    });
+    if (!res.ok) throw new Error(`Request failed (${res.status})`);
+
+    let data = await res.json();
+    if (data.status !== "ok") throw new Error(data.message);
+
+    let job = data.job;
+    while (job.estado === "en_cola" || job.estado === "ejecutando") {
+        await new Promise((resolve) => setTimeout(resolve, POLL_MS));
+        const poll = await fetch(apiUrl(`/jobs/${job.id}`), { credentials: "include" });
+        if (!poll.ok) throw new Error(`Request failed (${poll.status})`);
+        data = await poll.json();
+        job = data.job;
+    }
+
+    if (job.estado !== "terminado") throw new Error(job.error || "Ensayo fallido");
+    return { status: "ok", fixture: job.fixture, resultado: job.resultado };
+}
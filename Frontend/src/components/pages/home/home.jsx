@@ -2,9 +2,19 @@ import React, { useState } from "react";
 import { motion } from "framer-motion";
 import RegulatorTest from "../test/regulatorTest";
 import { apiUrl } from "../../../api/apiUrl";
+import { useReadiness } from "../../../api/readiness";
+
+const ESTADOS_PREPARACION = {
+    descubriendo: { texto: "Buscando placa…", clase: "text-yellow-400 animate-pulse" },
+    sin_placa: { texto: "Sin placa conectada", clase: "text-red-500" },
+    configurando: { texto: "Configurando placa…", clase: "text-yellow-400 animate-pulse" },
+    listo: { texto: "Placa lista", clase: "text-green-500" },
+};
 
 export default function Home() {
     const [blinkTarget, setBlinkTarget] = useState(null);
+    const ready = useReadiness();
+    const preparacion = ESTADOS_PREPARACION[ready?.estado] ?? { texto: "Conectando con el servidor…", clase: "text-gray-400 animate-pulse" };
 
     const handleHiddenClick = async (endpoint, target) => {
         try {
@@ -40,7 +50,7 @@ export default function Home() {
             transition={{ duration: 0.6, ease: "easeOut" }}
         >
             {/* Título centrado */}
-            <div className="w-full flex justify-center mb-8 relative">
+            <div className="w-full flex justify-center mb-2 relative">
                 <h1 className="text-5xl md:text-6xl tracking-tight text-red-600 drop-shadow-[0_2px_8px_rgba(255,0,0,0.5)] text-center select-none">
                     <span
                         className={`cursor-pointer ${blinkClass("dze")}`}
@@ -63,6 +73,11 @@ export default function Home() {
                 </h1>
             </div>
 
+            {/* Estado de preparación (GET /ready) */}
+            <p className={`text-center text-sm mb-6 select-none ${preparacion.clase}`}>
+                {preparacion.texto}
+            </p>
+
             {/* Contenedor principal */}
             <div>
                 <RegulatorTest />
@@ -2,7 +2,7 @@ import StatusCard from "../../tools/panels/statusPanel";
 import ProcessedVoltageCurrentPanel from "./gaugesProtector";
 import RunTestButton from "./RunTestButton";
 import DataProcessor from "./dataProccesor";
-import { apiUrl } from "../../../api/apiUrl";
+import { runTestJob } from "../../../api/testJobs";
 
 import { useState } from "react";
 
@@ -56,14 +56,7 @@ export default function RegulatorTest() {
             setResultadoProcesado(null);
 
             try {
-                const res = await fetch(apiUrl("/testregulator"), {
-                    method: "POST",
-                    headers: { "Content-Type": "application/json" },
-                    credentials: "include",
-                });
-
-                if (!res.ok) throw new Error("Request failed");
-                const data = await res.json();
+                const data = await runTestJob();
                 setResultado(data.resultado);
             } catch (err) {
                 console.error("Error reiniciando prueba:", err);
@@ -1,7 +1,7 @@
 import React, { useState } from "react";
 import { motion } from "framer-motion";
 import Loading from "../../utils/loading";
-import { apiUrl } from "../../../api/apiUrl";
+import { runTestJob } from "../../../api/testJobs";
 
 export default function RunTestButton({ onClick, onResult, onStart, onError }) {
     const [loading, setLoading] = useState(false);
@@ -15,19 +15,7 @@ export default function RunTestButton({ onClick, onResult, onStart, onError }) {
         if (onStart && !retry) onStart();
 
         try {
-            const res = await fetch(apiUrl("/testregulator"), {
-                method: "POST",
-                headers: { "Content-Type": "application/json" },
-                credentials: "include",
-            });
-
-            if (!res.ok) {
-                console.error("RunTestButton: request failed", res.status);
-                if (onError) onError();
-                return;
-            }
-
-            const data = await res.json();
+            const data = await runTestJob();
             console.log("RunTestButton: response", data);
 
             const resultado = data?.resultado;